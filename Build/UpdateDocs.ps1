@@ -43,7 +43,15 @@ if ($LastExitCode -ne 0) { popd; exit 1 }
 git checkout -fB master origin/master
 if ($LastExitCode -ne 0) { popd; exit 1 }
 Copy-Item -Force $root\ProtogameDocsTool\bin\Windows\AnyCPU\Debug\Protogame.combined.xml $root\Protogame.Docs\Protogame.combined.xml
-git add Protogame.combined.xml
+# Replace the per-assembly shards, which the documentation build reads in
+# preference to Protogame.combined.xml, so that none are left from removed
+# assemblies.
+if (Test-Path "$root\Protogame.Docs\Protogame.combined.d")
+{
+    Remove-Item -Recurse -Force $root\Protogame.Docs\Protogame.combined.d
+}
+Copy-Item -Recurse $root\ProtogameDocsTool\bin\Windows\AnyCPU\Debug\Protogame.combined.d $root\Protogame.Docs\Protogame.combined.d
+git add -A Protogame.combined.xml Protogame.combined.d
 git commit -m "Automatic update of generated documentation by build server"
 git push
 popd
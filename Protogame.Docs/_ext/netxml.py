@@ -5,16 +5,117 @@ from sphinx.util.docfields import Field, TypedField, GroupedField
 from sphinx.locale import l_, _
 from sphinx import addnodes
 from sphinx.util.nodes import clean_astext, make_refnode
-from sphinx.util import ws_re
-from docutils.parsers.rst import directives, states
+from sphinx.util import ws_re, docname_join
+from docutils.parsers.rst import Directive, directives, states
+from docutils.statemachine import StringList
 from docutils import nodes
 from sphinx.roles import XRefRole
+from sphinx.errors import ExtensionError
 import os
 import textwrap
 import json
 import sys
+import collections
+import traceback
+import hashlib
+import glob
+import pickle
+import time
+import re
+import subprocess
+import gzip
+import netxml_fetch
 
-dotnet_docs = None
+# Increment this whenever a change to the generator alters its output, so that
+# pages recorded in the manifest are regenerated.
+GENERATOR_VERSION = 6
+
+XML_PATH = '../Protogame.Docs/Protogame.combined.xml'
+
+# A directory of per-assembly XML, as written by ProtogameDocsTool, which
+# is read instead of the combined XML when present.  The shards are read
+# in name order.
+XML_SHARD_PATH = '../Protogame.Docs/Protogame.combined.d'
+
+# Present when the XML was fetched for an ancestor of the current commit,
+# because the current commit hadn't been built yet.
+ANCESTOR_MARKER_PATH = XML_PATH + '.ancestor'
+
+# The fetch that setup() starts when the XML is needed, so that it runs
+# while Sphinx loads the environment and initialises the builder; see
+# fetch_xml.
+pending_fetch = None
+
+MANIFEST_PATH = '.netxml-manifest.json'
+
+# Records what the pages were last generated from; see GenerationStamp.
+GENERATION_STAMP_PATH = '.netxml-generated.json'
+
+# The GenerationStamp data of the model currently held in the stores, so
+# that builds run in the same process, as by python -m netxml watch, don't
+# load it again.
+loaded_stamp = None
+
+# Increment this whenever the records stored in the model cache change.
+MODEL_CACHE_VERSION = 3
+
+MODEL_CACHE_PATH = '.netxml-model.cache'
+
+# Where the model of each shard is cached when reading XML_SHARD_PATH.
+MODEL_SHARD_CACHE_PATH = '.netxml-model.cache.d'
+
+# Where the model was loaded from, for exporting it after the build.
+model_source = None
+
+# Increment this whenever the tables written by export_sqlite change.
+SQLITE_SCHEMA_VERSION = 1
+
+# TypeInfo objects by anchor, for use by dotnet:autotype.  This is
+# only populated when netxml_autotype is enabled.
+type_store = {}
+
+# The generated page of every documented type, by anchor, as (name, kind,
+# namespace, docname) tuples.  dotnet:apiindex lists these.
+type_pages = {}
+
+# A hash of type_pages, recorded by each dotnet:apiindex so that it is read
+# again when the list of types changes.
+type_pages_digest = None
+
+# The labels and docnames of the types left out of the build by
+# netxml_modules, so that references to them resolve to placeholders.
+excluded_labels = set()
+excluded_docnames = set()
+
+# Where the build metrics report is written, relative to the output
+# directory, unless overridden by netxml_metrics_path.
+METRICS_PATH = 'netxml-metrics.json'
+
+# Static files shipped with the extension, such as the search script.
+STATIC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+# Where the sharded API search data is written, relative to the output
+# directory.
+SEARCH_SHARD_PATH = '_static/dotnet-search'
+
+# The most types listed on one page of a dotnet domain index, unless
+# overridden by netxml_index_page_size.
+INDEX_PAGE_SIZE = 250
+
+def get_node_id(anchor, ids):
+  """
+  Returns an HTML id for the object with anchor that isn't in ids yet.
+  Anchors contain characters like <, (, & and backticks, so only the
+  inventory keeps the anchor itself.  The prefix keeps the ids apart from
+  those docutils gives the labels of the same anchors.
+  """
+  base = 'dotnet-' + nodes.make_id(anchor)
+  node_id = base
+  count = 1
+  while node_id in ids:
+    count += 1
+    node_id = base + '-' + str(count)
+  return node_id
 
 class DotNetObject(ObjectDescription):
   
@@ -26,6 +127,7 @@ class DotNetObject(ObjectDescription):
     'namespace': directives.unchanged,
     'inherits': directives.unchanged,
     'implements': directives.unchanged,
+    'anchor': directives.unchanged,
   }
 
   def handle_signature(self, sig, signode):
@@ -36,8 +138,8 @@ class DotNetObject(ObjectDescription):
     name = self.options['name']
     namespace = self.options['namespace']
     fullname = self.options['fullname']
-    inherits = json.loads(self.options['inherits']) if 'inherits' in self.options else ("","")
-    implements = json.loads(self.options['implements']) if 'implements' in self.options else []
+    inherits = self.get_json_option('inherits', ("",""))
+    implements = self.get_json_option('implements', [])
       
     signode += addnodes.desc_name(name, name)
     
@@ -71,6 +173,47 @@ class DotNetObject(ObjectDescription):
         signode += a
     
     return name, namespace
+  
+  def run(self):
+    return run_timed_directive(self, lambda: ObjectDescription.run(self))
+  
+  def get_json_option(self, name, default):
+    # Options hold JSON when they are parsed from RST, but are passed already
+    # decoded when the directive is run by dotnet:autotype.
+    if not name in self.options:
+      return default
+    value = self.options[name]
+    if isinstance(value, (list, tuple)):
+      return value
+    return json.loads(value)
+  
+  def get_qualified_name(self, name):
+    if 'fullname' in self.options:
+      return self.options['fullname']
+    parent = self.env.ref_context.get('dotnet:type')
+    if parent == None:
+      return name
+    return parent + "." + name
+  
+  def add_target_and_index(self, name, sig, signode):
+    # Objects are recorded under the anchor that the generated :ref: labels
+    # use, falling back to the qualified name for handwritten directives.
+    anchor = self.options.get('anchor', self.get_qualified_name(name[0]))
+    node_id = get_node_id(anchor, self.state.document.ids)
+    signode['ids'].append(node_id)
+    self.state.document.ids[node_id] = signode
+    namespace = self.options.get('namespace', self.env.ref_context.get('dotnet:namespace', ''))
+    self.env.get_domain('dotnet').note_object(anchor, self.objtype, node_id, namespace)
+    
+  def before_content(self):
+    if 'fullname' in self.options:
+      self.env.ref_context['dotnet:type'] = self.options['fullname']
+      self.env.ref_context['dotnet:namespace'] = self.options.get('namespace', '')
+      
+  def after_content(self):
+    if 'fullname' in self.options:
+      self.env.ref_context.pop('dotnet:type', None)
+      self.env.ref_context.pop('dotnet:namespace', None)
 
 class DotNetClass(DotNetObject):
   display_prefix = 'class '
@@ -106,6 +249,8 @@ class DotNetMethod(DotNetObject):
     'prefix': directives.unchanged,
     'parameters': directives.unchanged,
     'return': directives.unchanged,
+    'anchor': directives.unchanged,
+    'namespace': directives.unchanged,
   }
   
   doc_field_types = [
@@ -118,8 +263,8 @@ class DotNetMethod(DotNetObject):
 
   def handle_signature(self, sig, signode):
     name = self.options['name']
-    parameters = json.loads(self.options['parameters']) if 'parameters' in self.options else []
-    return_v = json.loads(self.options['return']) if 'return' in self.options else ("","")
+    parameters = self.get_json_option('parameters', [])
+    return_v = self.get_json_option('return', ("",""))
     prefix = self.options['prefix'] if 'prefix' in self.options else ""
   
     if not ('parameters' in self.options) or not ('return' in self.options):
@@ -169,6 +314,8 @@ class DotNetProperty(DotNetObject):
     'name': directives.unchanged,
     'prefix': directives.unchanged,
     'type': directives.unchanged,
+    'anchor': directives.unchanged,
+    'namespace': directives.unchanged,
   }
   
   doc_field_types = [
@@ -179,7 +326,7 @@ class DotNetProperty(DotNetObject):
   def handle_signature(self, sig, signode):
     name = self.options['name']
     prefix = self.options['prefix']
-    type_v = json.loads(self.options['type'])
+    type_v = self.get_json_option('type', ("",""))
     
     if prefix != 'readwrite':
       signode += nodes.Text(prefix, prefix)
@@ -204,6 +351,8 @@ class DotNetField(DotNetObject):
   option_spec = {
     'name': directives.unchanged,
     'type': directives.unchanged,
+    'anchor': directives.unchanged,
+    'namespace': directives.unchanged,
   }
   
   doc_field_types = [
@@ -213,7 +362,7 @@ class DotNetField(DotNetObject):
 
   def handle_signature(self, sig, signode):
     name = self.options['name']
-    type_v = json.loads(self.options['type'])
+    type_v = self.get_json_option('type', ("",""))
     
     xref = addnodes.pending_xref(
       ':ref:`' + type_v[1] + '`',
@@ -229,15 +378,216 @@ class DotNetField(DotNetObject):
     
     return name, ""
   
+class DotNetAutoType(Directive):
+  """
+  Describes a type and all of its members straight from the loaded XML
+  documentation.  The dotnet object directives are run with their options
+  already decoded, so only the documentation text itself is parsed as RST.
+  For types split into member pages, :summary: lists the members in tables
+  instead, and :member: describes only the members with the given name.
+  """
+  
+  required_arguments = 1
+  # Anchors of generic types with several type parameters contain spaces.
+  final_argument_whitespace = True
+  option_spec = {
+    'digest': directives.unchanged,
+    'summary': directives.flag,
+    'member': directives.unchanged,
+  }
+  
+  def run(self):
+    return run_timed_directive(self, self.describe_type)
+    
+  def describe_type(self):
+    env = self.state.document.settings.env
+    anchor = self.arguments[0]
+    info = type_store.get(anchor)
+    if info == None:
+      return [self.state.document.reporter.warning(
+        "no .NET documentation loaded for " + anchor, line=self.lineno)]
+    
+    if 'member' in self.options:
+      members = [members for name, members, path in get_member_groups(info, get_type_doc_path(info))
+                 if name == self.options['member']]
+      if len(members) == 0:
+        return [self.state.document.reporter.warning(
+          "no .NET documentation loaded for " + anchor + "." + self.options['member'],
+          line=self.lineno)]
+      result = []
+      self.describe_members(env, info, members[0], result)
+      return result
+    
+    content = get_type_content(info, "", "    ")
+    if 'summary' in self.options:
+      content.extend(get_member_table_content(
+        get_member_groups(info, get_type_doc_path(info)), ""))
+    result = self.run_object(info.kind, info.full_name, get_type_options(info), content)
+    if not 'summary' in self.options:
+      self.describe_members(env, info, get_members(info), result[-1][-1])
+    return result
+    
+  def describe_members(self, env, info, members, parent):
+    env.ref_context['dotnet:type'] = info.full_name
+    env.ref_context['dotnet:namespace'] = info.namespace
+    try:
+      for directive, member, options, get_content in members:
+        parent.append(self.make_target(member.anchor))
+        parent.extend(self.run_object(directive, member.name,
+                                      options, get_content(member, "", "    ")))
+    finally:
+      env.ref_context.pop('dotnet:type', None)
+      env.ref_context.pop('dotnet:namespace', None)
+  
+  def make_target(self, anchor):
+    target = nodes.target('', '')
+    target['names'].append(nodes.fully_normalize_name(anchor))
+    self.state.document.note_explicit_target(target, self.state.parent)
+    return target
+  
+  def run_object(self, directive, argument, options, content):
+    source = self.state_machine.get_source_and_line(self.lineno)[0]
+    lines = "\n".join(content).split("\n")
+    obj = DotNetDomain.directives[directive](
+      'dotnet:' + directive, [argument], dict(options),
+      StringList(lines, source), self.lineno, self.content_offset,
+      self.block_text, self.state, self.state_machine)
+    return obj.run()
+
+class DotNetApiIndex(Directive):
+  """
+  Lists the generated type pages under the current document's directory,
+  grouped by kind, in place of a toctree over api/*.gen.  The type pages
+  are orphans, so they no longer appear in every page's navigation; in
+  HTML, the paginated dotnet domain indices link them together instead.
+  Other builders only include the pages that a toctree does, so for them
+  the pages are also listed in a hidden one.
+  """
+
+  has_content = False
+
+  def run(self):
+    env = self.state.document.settings.env
+    get_env_dependencies(env)["apiindex"][env.docname] = type_pages_digest
+    prefix = os.path.dirname(env.docname)
+    prefix = prefix + "/" if prefix != "" else ""
+
+    by_kind = collections.defaultdict(list)
+    namespaces = set()
+    for anchor, (name, kind, namespace, docname) in type_pages.items():
+      if docname.startswith(prefix) and "/api/" in "/" + docname[len(prefix):]:
+        by_kind[kind].append((name.lower(), name, docname))
+        namespaces.add(namespace)
+
+    result = []
+    if len(namespaces) > 0:
+      only = addnodes.only(expr='html')
+      para = nodes.paragraph()
+      para += nodes.Text("Browse the API ")
+      para += self.make_index_xref("api", "by name")
+      para += nodes.Text(" or by namespace: ")
+      for i, namespace in enumerate(sorted(namespaces)):
+        if i > 0:
+          para += nodes.Text(", ")
+        para += self.make_index_xref("ns:" + namespace, namespace)
+      only += para
+      result.append(only)
+    for kind, label in TYPE_KIND_LABELS:
+      if len(by_kind[kind]) == 0:
+        continue
+      result.append(nodes.rubric(label, label))
+      para = nodes.paragraph()
+      for i, (key, name, docname) in enumerate(sorted(by_kind[kind])):
+        if i > 0:
+          para += nodes.Text(", ")
+        xref = addnodes.pending_xref(
+          '',
+          refdomain='std',
+          reftype='doc',
+          reftarget='/' + docname,
+          refexplicit=True,
+          refdoc=env.docname)
+        xref += nodes.Text(name, name)
+        para += xref
+      result.append(para)
+    docnames = [docname for kind, label in TYPE_KIND_LABELS
+                for key, name, docname in sorted(by_kind[kind])]
+    if len(docnames) > 0:
+      toctree = addnodes.toctree()
+      toctree['parent'] = env.docname
+      toctree['entries'] = [(None, docname) for docname in docnames]
+      toctree['includefiles'] = docnames
+      toctree['maxdepth'] = -1
+      toctree['caption'] = None
+      toctree['glob'] = False
+      toctree['hidden'] = True
+      toctree['includehidden'] = False
+      toctree['numbered'] = 0
+      toctree['titlesonly'] = False
+      only = addnodes.only(expr='not html or singlehtml or epub')
+      only += nodes.compound('', toctree, classes=['toctree-wrapper'])
+      result.append(only)
+    return result
+
+  def make_index_xref(self, target, text):
+    xref = addnodes.pending_xref(
+      '',
+      refdomain='dotnet',
+      reftype='index',
+      reftarget=target,
+      refexplicit=True)
+    xref += nodes.Text(text, text)
+    return xref
+
+class DotNetRelatedTypes(Directive):
+  """
+  Lists the types deriving from and implementing a type, as looked up in
+  type_relations.  Generated pages use this in each type's description.
+  """
+  
+  required_arguments = 1
+  final_argument_whitespace = True
+  
+  def run(self):
+    env = self.state.document.settings.env
+    anchor = self.arguments[0]
+    derived, implementations = type_relations.get(anchor)
+    get_env_dependencies(env)["relations"].setdefault(env.docname, {})[anchor] = \
+      type_relations.get_digest(anchor)
+    
+    result = []
+    for label, entries in (("Derived types", derived), ("Known implementations", implementations)):
+      if len(entries) == 0:
+        continue
+      result.append(nodes.rubric(label, label))
+      para = nodes.paragraph()
+      for i, (name, target, internal) in enumerate(entries):
+        if i > 0:
+          para += nodes.Text(", ")
+        xref = addnodes.pending_xref(
+          ':ref:`' + target + '`',
+          refdomain='std',
+          reftype='ref',
+          reftarget=ws_re.sub(' ', target.lower()),
+          refexplicit=True)
+        xref += nodes.Text(name, name)
+        para += xref
+        if internal:
+          para += nodes.Text(" (internal)")
+      result.append(para)
+    return result
+
+# The dotnet roles keep the anchor as written, so that intersphinx can look
+# it up in another project's objects.inv; DotNetDomain.resolve_xref falls
+# back to the lower-cased std label.
+
 class DotNetMethodRole(XRefRole):
   def process_link(self, env, refnode, has_explicit_title, title, target):
     paren_start = target.index("(")
     dot_start = target.rindex(".", 0, paren_start)
     dot_start = target.rindex(".", 0, dot_start)
-    refnode['refdomain']='std'
-    refnode['reftype']='ref'
     refnode['refexplicit']=True
-    return (target[dot_start+1:paren_start], ws_re.sub(' ', target.lower()))
+    return (target[dot_start+1:paren_start], ws_re.sub(' ', target))
   
 class DotNetNonMethodRole(XRefRole):
   def process_link(self, env, refnode, has_explicit_title, title, target):
@@ -246,26 +596,41 @@ class DotNetNonMethodRole(XRefRole):
       dot_start = target.rindex(".", 0, dot_start)
     except ValueError:
       dot_start = -1
-    refnode['refdomain']='std'
-    refnode['reftype']='ref'
     refnode['refexplicit']=True
-    return (target[dot_start+1:], ws_re.sub(' ', target.lower()))
+    return (target[dot_start+1:], ws_re.sub(' ', target))
+
+class DotNetTypeIndex(Index):
+  """
+  One page of a dotnet domain index.  The pages are created as subclasses
+  by create_type_indices, since Sphinx instantiates each index class with
+  only the domain; groups holds the page's content and navigation the
+  links to the other index pages, both as (heading, entries) pairs.
+  """
+
+  groups = []
+  navigation = []
+
+  def generate(self, docnames=None):
+    return list(self.navigation) + list(self.groups), False
 
 class DotNetDomain(Domain):
   name = 'dotnet'
   label = 'dotnet'
 
+  # The roles are what intersphinx and the any role look objects up by, so
+  # they must match the roles below: methods are linked with dotnet:method,
+  # and everything else with dotnet:type.
   object_types = {
     #'package':     ObjType(l_('package'), 'package', 'ref'),
-    'class':        ObjType(l_('class'), 'class', 'ref'),
-    'enum':        ObjType(l_('enum'), 'enum', 'ref'),
-    'interface':        ObjType(l_('interface'), 'interface', 'ref'),
-    'struct':        ObjType(l_('struct'), 'struct', 'ref'),
+    'class':        ObjType(l_('class'), 'type', 'ref'),
+    'enum':        ObjType(l_('enum'), 'type', 'ref'),
+    'interface':        ObjType(l_('interface'), 'type', 'ref'),
+    'struct':        ObjType(l_('struct'), 'type', 'ref'),
     #'field':       ObjType(l_('field'), 'field', 'ref'),
     #'constructor': ObjType(l_('constructor'), 'construct', 'ref'),
     'method':      ObjType(l_('method'), 'method', 'ref'),
-    'nproperty':      ObjType(l_('property'), 'property', 'ref'),
-    'nfield':      ObjType(l_('field'), 'field', 'ref'),
+    'nproperty':      ObjType(l_('property'), 'type', 'ref'),
+    'nfield':      ObjType(l_('field'), 'type', 'ref'),
   }
 
   directives = {
@@ -279,6 +644,9 @@ class DotNetDomain(Domain):
     'method':         DotNetMethod,
     'nproperty':         DotNetProperty,
     'nfield':         DotNetField,
+    'autotype':       DotNetAutoType,
+    'apiindex':       DotNetApiIndex,
+    'relatedtypes':   DotNetRelatedTypes,
     #'import':         JavaImport
   }
 
@@ -292,82 +660,621 @@ class DotNetDomain(Domain):
     #'ref':       JavaXRefRole(),
   }
   
+  initial_data = {
+    'objects': {},  # anchor -> (docname, objtype, node id, namespace)
+  }
+  
+  data_version = 3
+  
+  # Search priorities by object type; types rank above their members.
+  search_priorities = {
+    'class': 0,
+    'struct': 0,
+    'interface': 0,
+    'enum': 0,
+  }
+  
+  # Lower-cased anchor -> anchor, for find_object.  Built on demand and
+  # dropped whenever the objects change.
+  lower_anchors = None
+  
+  def note_object(self, anchor, objtype, node_id, namespace):
+    self.data['objects'][anchor] = (self.env.docname, objtype, node_id, namespace)
+    self.lower_anchors = None
+  
+  def clear_doc(self, docname):
+    objects = self.data['objects']
+    for anchor, entry in list(objects.items()):
+      if entry[0] == docname:
+        del objects[anchor]
+    self.lower_anchors = None
+        
+  def merge_domaindata(self, docnames, otherdata):
+    objects = self.data['objects']
+    for anchor, entry in otherdata['objects'].items():
+      if entry[0] in docnames:
+        objects[anchor] = entry
+    self.lower_anchors = None
+        
+  def get_objects(self):
+    # When the API search data is sharded, the objects are left out of the
+    # main search index (priority -1), so Sphinx's own search results no
+    # longer list them; the search page lists them from the shards above
+    # those results instead.  They still go into objects.inv.
+    sharded = self.env.config.netxml_search_shards != None
+    for anchor, (docname, objtype, node_id, namespace) in self.data['objects'].items():
+      priority = -1 if sharded else self.search_priorities.get(objtype, 1)
+      yield anchor, anchor, objtype, docname, node_id, priority
+
+  def find_object(self, target):
+    """
+    Returns the anchor and entry of the object with an anchor of target,
+    or None.  The roles lower-case their targets for std labels, so
+    anchors are matched case-insensitively when there's no exact match.
+    """
+    objects = self.data['objects']
+    if target in objects:
+      return target, objects[target]
+    if self.lower_anchors == None:
+      self.lower_anchors = dict((anchor.lower(), anchor) for anchor in objects)
+    anchor = self.lower_anchors.get(target.lower())
+    if anchor == None:
+      return None
+    return anchor, objects[anchor]
+
+  def resolve_xref(self, env, fromdocname, builder, typ, target, node, contnode):
+    if typ == 'index':
+      # Links to the index pages, from dotnet:apiindex.  The pages only
+      # exist in HTML builds, see create_type_indices.
+      pagename = getattr(self, 'index_targets', {}).get(target)
+      if pagename == None:
+        return None
+      return make_refnode(builder, fromdocname, pagename, '', contnode)
+    found = self.find_object(target)
+    if found != None and typ in self.object_types[found[1][1]].roles:
+      anchor, (docname, objtype, node_id, namespace) = found
+      return make_refnode(builder, fromdocname, docname, node_id, contnode, anchor)
+    # Handwritten pages may label what they describe like generated ones.
+    label = env.domaindata['std']['labels'].get(ws_re.sub(' ', target.lower()))
+    if label == None:
+      return None
+    docname, labelid, sectname = label
+    return make_refnode(builder, fromdocname, docname, labelid, contnode)
+
+  def resolve_any_xref(self, env, fromdocname, builder, target, node, contnode):
+    found = self.find_object(target)
+    if found == None:
+      return []
+    anchor, (docname, objtype, node_id, namespace) = found
+    # Generated pages also label each object for the dotnet roles, and the
+    # any role finds those through the std domain already.
+    if ws_re.sub(' ', anchor.lower()) in env.domaindata['std']['labels']:
+      return []
+    role = 'dotnet:' + self.object_types[objtype].roles[0]
+    return [(role, make_refnode(builder, fromdocname, docname, node_id, contnode, anchor))]
+  
 def normalize_name_to_filename(basename):
   return basename.lower().replace(" ", "_").replace("`", "_").replace("<", "_").replace(">", "_")
+
+# The type kinds and the headings they are listed under in the API indices.
+TYPE_KIND_LABELS = [
+  ("class", "Classes"),
+  ("interface", "Interfaces"),
+  ("struct", "Structs"),
+  ("enum", "Enums"),
+]
+
+def get_index_types(domain):
+  """
+  Returns the types recorded in the domain as (display name, namespace,
+  kind, docname, node id) tuples, ordered by display name.
+  """
+  kinds = set(kind for kind, label in TYPE_KIND_LABELS)
+  types = []
+  for anchor, (docname, objtype, node_id, namespace) in domain.data['objects'].items():
+    if not objtype in kinds:
+      continue
+    name = anchor
+    if namespace and anchor.startswith(namespace + "."):
+      name = anchor[len(namespace) + 1:]
+    types.append((name, namespace, objtype, docname, node_id))
+  types.sort(key=lambda t: (t[0].lower(), t[1]))
+  return types
+
+def get_index_chunks(types, page_size):
+  return [types[i:i + page_size] for i in range(0, len(types), page_size)] or [[]]
+
+def get_index_entry(t, with_namespace):
+  name, namespace, kind, docname, node_id = t
+  return [name, 0, docname, node_id, kind if with_namespace else '', '',
+          namespace if with_namespace else '']
+
+def get_index_navigation(heading, pages, current):
+  """
+  Returns a navigation group linking index pages, given as (name, label)
+  pairs, or nothing if there is only one page.  The current page is
+  listed without a link.
+  """
+  if len(pages) < 2:
+    return []
+  return [(heading, [[label, 0, 'dotnet-' + name if name != current else '', '', '', '', '']
+                     for name, label in pages])]
+
+def is_index_enabled(config, name):
+  indices = config.html_domain_indices
+  if isinstance(indices, list):
+    return 'dotnet-' + name in indices
+  return bool(indices)
+
+def create_type_indices(app, env):
+  """
+  Replaces the dotnet domain's indices with the pages of an alphabetical
+  API index and of an index per namespace, each split into pages of at
+  most netxml_index_page_size types.  Only HTML builders write domain
+  indices as separate pages, so other builders get none of these.
+  """
+  domain = env.get_domain('dotnet')
+  domain.indices = list(DotNetDomain.indices)
+  domain.index_targets = {}
+  if app.builder.format != 'html':
+    return
+  page_size = max(int(app.config.netxml_index_page_size), 1)
+  types = get_index_types(domain)
+  indices = []
+
+  # The alphabetical index, grouped by first letter.
+  chunks = get_index_chunks(types, page_size)
+  pages = []
+  for i, chunk in enumerate(chunks):
+    label = "All"
+    if len(chunks) > 1:
+      label = chunk[0][0][:1].upper() + u" – " + chunk[-1][0][:1].upper()
+    pages.append(("api" if i == 0 else "api-" + str(i + 1), label))
+  for (name, label), chunk in zip(pages, chunks):
+    groups = []
+    for t in chunk:
+      letter = t[0][:1].upper()
+      if len(groups) == 0 or groups[-1][0] != letter:
+        groups.append((letter, []))
+      groups[-1][1].append(get_index_entry(t, True))
+    indices.append(type(str("DotNetApiIndex_" + name.replace("-", "_")), (DotNetTypeIndex,), {
+      "name": name,
+      "localname": "API Index" + (" (" + label + ")" if len(chunks) > 1 else ""),
+      "shortname": "api index" if name == "api" else None,
+      "groups": groups,
+      "navigation": get_index_navigation("Pages", pages, name),
+    }))
+  domain.index_targets["api"] = "dotnet-api"
+
+  # An index per namespace, grouped by kind.
+  by_namespace = collections.defaultdict(list)
+  for t in types:
+    by_namespace[t[1]].append(t)
+  slugs = {}
+  for namespace in sorted(by_namespace):
+    slugs[namespace] = "ns-" + (re.sub(r'[^a-z0-9]+', '-', namespace.lower()).strip('-') or "global")
+  namespace_pages = [(slugs[namespace], namespace or "(global)") for namespace in sorted(by_namespace)]
+  for namespace in sorted(by_namespace):
+    chunks = get_index_chunks(by_namespace[namespace], page_size)
+    pages = [(slugs[namespace] + ("-" + str(i + 1) if i > 0 else ""), "Page " + str(i + 1))
+             for i in range(len(chunks))]
+    for (name, label), chunk in zip(pages, chunks):
+      groups = []
+      for kind, heading in TYPE_KIND_LABELS:
+        entries = [get_index_entry(t, False) for t in chunk if t[2] == kind]
+        if len(entries) > 0:
+          groups.append((heading, entries))
+      navigation = get_index_navigation(
+        "Namespaces", namespace_pages, slugs[namespace] if name == pages[0][0] else None)
+      navigation.extend(get_index_navigation("Pages", pages, name))
+      indices.append(type(str("DotNetApiIndex_" + name.replace("-", "_")), (DotNetTypeIndex,), {
+        "name": name,
+        "localname": "Namespace " + (namespace or "(global)") + (" (" + label + ")" if len(chunks) > 1 else ""),
+        "shortname": None,
+        "groups": groups,
+        "navigation": navigation,
+      }))
+    domain.index_targets["ns:" + namespace] = "dotnet-" + slugs[namespace]
+
+  for indexcls in indices:
+    if is_index_enabled(app.config, indexcls.name):
+      domain.indices.append(indexcls)
+  for target, pagename in list(domain.index_targets.items()):
+    if not is_index_enabled(app.config, pagename[len('dotnet-'):]):
+      del domain.index_targets[target]
+
+# C# keywords for the System types they alias.
+KEYWORD_TYPES = {
+  "Boolean": "bool",
+  "Byte": "byte",
+  "Char": "char",
+  "Decimal": "decimal",
+  "Double": "double",
+  "Int16": "short",
+  "Int32": "int",
+  "Int64": "long",
+  "SByte": "sbyte",
+  "Single": "float",
+  "String": "string",
+  "UInt16": "ushort",
+  "UInt32": "uint",
+  "UInt64": "ulong",
+  "Void": "void",
+}
+
+type_suffix_re = re.compile(r'^(.*?)((?:\[,*\]|\*|&)*)$')
+
+if sys.version_info >= (3, 0):
+  intern_string = sys.intern
+else:
+  intern_string = intern
+
+def split_generic_arguments(text):
+  arguments = []
+  depth = 0
+  start = 0
+  for i, c in enumerate(text):
+    if c in "<[":
+      depth += 1
+    elif c in ">]":
+      depth -= 1
+    elif c == "," and depth == 0:
+      arguments.append(text[start:i].strip())
+      start = i + 1
+  arguments.append(text[start:].strip())
+  return arguments
+
+class TypeDisplayFormatter(object):
+  """
+  Formats type references the way they would be written in C#, using
+  keywords for System types and rendering generic arguments, nullables,
+  arrays, pointers and by-ref types recursively.  Results are memoized by
+  (TypeName, TypeAnchor) for the whole run, since every signature in the
+  API refers to the same few hundred types.
+  """
   
-def get_indented_rest(elem, name, indent = ""):
-  if name == None:
-    text = elem.text
-  else:
-    text = elem.find(name)
-    if text == None:
+  def __init__(self):
+    self.references = {}
+    self.hits = 0
+    self.misses = 0
+    
+  def get_reference(self, name, anchor):
+    """
+    Returns the shared (display name, anchor) pair for a type reference.
+    """
+    key = (name, anchor)
+    reference = self.references.get(key)
+    if reference != None:
+      self.hits += 1
+      return reference
+    self.misses += 1
+    display = self.format(name, anchor)
+    reference = (intern_string(display) if display != None else None,
+                 intern_string(anchor) if anchor != None else None)
+    self.references[key] = reference
+    return reference
+    
+  def format(self, name, anchor):
+    if anchor == None:
+      if name == None:
+        return None
+      return self.format_expression(name, False)
+    if name != None:
+      # Arrays of generic types lose both their arguments and their suffix
+      # in the anchor, so recover what we can from the type name.
+      name_base, name_suffix = type_suffix_re.match(name).groups()
+      if name_suffix != "" and not anchor.endswith(name_suffix):
+        anchor += ("<>" if "`" in name_base else "") + name_suffix
+    # Generic parameters have no namespace, leaving a leading dot.
+    if anchor.startswith("."):
+      anchor = anchor[1:]
+    return self.format_expression(anchor, True)
+    
+  def format_expression(self, text, qualified):
+    base, suffix = type_suffix_re.match(text).groups()
+    if base.endswith(">") and "<" in base:
+      start = base.index("<")
+      outer = base[:start]
+      arguments = [self.format_expression(argument, False)
+                   for argument in split_generic_arguments(base[start + 1:-1])]
+      if outer in ("System.Nullable", "Nullable") and len(arguments) == 1:
+        return arguments[0] + "?" + suffix
+      if arguments == [""]:
+        return outer + "<>" + suffix
+      return outer + "<" + ", ".join(arguments) + ">" + suffix
+    if "`" in base:
+      # A generic argument that is itself generic; only its name is known.
+      return base[:base.index("`")] + "<>" + suffix
+    if qualified:
+      if base.startswith("System.") and base[7:] in KEYWORD_TYPES:
+        return KEYWORD_TYPES[base[7:]] + suffix
+    elif base in KEYWORD_TYPES:
+      return KEYWORD_TYPES[base] + suffix
+    return base + suffix
+    
+  def describe_cache(self):
+    lookups = self.hits + self.misses
+    return ("type display cache: " + str(lookups) + " lookups, " + str(len(self.references)) +
+            " distinct, %.1f%% hits" % (100.0 * self.hits / lookups))
+
+type_display = TypeDisplayFormatter()
+
+# Documentation URLs for types outside Protogame, by namespace prefix,
+# unless overridden by netxml_external_urls.  {lower} is the anchor in
+# lower case with generic arity as -N, and {page} is the anchor with
+# underscores for dots.
+EXTERNAL_URLS = [
+  ("System.", "https://docs.microsoft.com/dotnet/api/{lower}"),
+  ("Microsoft.Xna.Framework.", "http://www.monogame.net/documentation/?page=T_{page}"),
+]
+
+class ExternalTypeTable(object):
+  """
+  Maps the types referenced by the API but not documented in it to
+  external documentation.  The table is filled in while the model is
+  loaded, so that references are resolved with a dictionary lookup by
+  the label they were made with (see resolve_external_xref).
+  """
+
+  def __init__(self, rules):
+    self.rules = rules
+    self.referenced = set()
+    self.documented = set()
+    self.urls = {}   # std label -> URL
+    self.names = {}  # short or keyword name -> URL, or None if ambiguous
+
+  def add_type(self, info):
+    self.documented.add(get_open_generic_anchor(info.anchor))
+    for reference in info.inherits + info.implements:
+      self.referenced.add(reference[1])
+    for member in info.fields + info.properties:
+      self.referenced.add(member.type[1])
+    for method in info.methods:
+      self.referenced.add(method.return_type[1])
+      for parameter in method.parameters:
+        self.referenced.add(parameter.type[1])
+
+  def get_url(self, anchor):
+    # Generic types are documented once, under their arity, e.g. List`1.
+    base = get_open_generic_anchor(type_suffix_re.match(anchor).group(1))
+    if base in self.documented:
+      return None
+    for prefix, template in self.rules:
+      if base.startswith(prefix):
+        return template.format(lower=base.lower().replace("`", "-"),
+                               page=base.replace(".", "_").replace("`", "-"))
+    return None
+
+  def add_url(self, anchor, url):
+    self.urls[ws_re.sub(' ', anchor.lower())] = url
+    base = type_suffix_re.match(anchor).group(1)
+    name = get_search_name(base)
+    if "`" in name:
+      name = name[:name.index("`")]
+    if self.names.get(name, url) != url:
+      url = None
+    self.names[name] = url
+
+  def build(self, overrides):
+    for anchor in self.referenced:
+      if anchor != None:
+        url = self.get_url(anchor)
+        if url != None:
+          self.add_url(anchor, url)
+    for anchor, url in overrides.items():
+      self.add_url(anchor, url)
+    for name, keyword in KEYWORD_TYPES.items():
+      url = self.urls.get("system." + name.lower())
+      if url == None and not "System." + name in self.documented:
+        url = self.get_url("System." + name)
+      if url != None:
+        self.names[keyword] = url
+    self.referenced = None
+    self.documented = None
+
+  def get_name_url(self, text):
+    base = type_suffix_re.match(text.rstrip("?")).group(1)
+    if "<" in base:
+      base = base[:base.index("<")]
+    return self.names.get(base)
+
+external_types = ExternalTypeTable(EXTERNAL_URLS)
+
+def read_type_reference(elem, prefix=""):
+  """
+  Returns the (display name, anchor) pair for a type referenced by an
+  element.
+  """
+  return type_display.get_reference(elem.get(prefix + "TypeName"), elem.get(prefix + "TypeAnchor"))
+  
+def read_doc(elem, name=None):
+  """
+  Returns documentation text with its common indentation and surrounding
+  whitespace removed, or None if there is none.
+  """
+  if name != None:
+    elem = elem.find(name)
+    if elem == None:
       return None
-    text = text.text
-  if text == None:
+  if elem.text == None:
     return None
-  norm = textwrap.dedent(text)
-  text = ("\n" + indent).join(norm.split("\n"))
-  return indent + text.strip()
-  
-def convert_to_keyword_if_possible(name, alt=None):
-  if name == "String":
-    return "string"
-  if name == "Single":
-    return "float"
-  if name == "Double":
-    return "double"
-  if name == "Int16":
-    return "short"
-  if name == "UInt16":
-    return "ushort"
-  if name == "Int32":
-    return "int"
-  if name == "UInt32":
-    return "uint"
-  if name == "Int64":
-    return "long"
-  if name == "UInt64":
-    return "ulong"
-  if name == "Decimal":
-    return "decimal"
-  if name == "Byte":
-    return "byte"
-  if name == "Char":
-    return "char"
-  if name == "Void":
-    return "void"
-  if name == "Boolean":
-    return "bool"
-  if alt != None:
-    return alt
-  return name
-  
-def generate_doc_at_path(app, elem, path):
-  class_name = elem.get("Name")
+  return textwrap.dedent(elem.text).strip()
+  
+class TypeParameterInfo(object):
+  __slots__ = ('name', 'doc')
+  
+  def __init__(self, elem):
+    self.name = elem.get("TypeName")
+    self.doc = read_doc(elem)
+    
+class ParameterInfo(object):
+  __slots__ = ('name', 'type', 'is_ref', 'is_out', 'doc')
+  
+  def __init__(self, elem):
+    self.name = elem.get("Name")
+    self.type = read_type_reference(elem)
+    self.is_ref = elem.get("IsRef") == "True"
+    self.is_out = elem.get("IsOut") == "True"
+    self.doc = read_doc(elem)
+    
+class FieldInfo(object):
+  __slots__ = ('name', 'anchor', 'is_public', 'type', 'summary', 'value')
+  
+  def __init__(self, elem):
+    self.name = elem.get("Name")
+    self.anchor = elem.get("Anchor")
+    self.is_public = elem.get("IsPublic") == "True"
+    self.type = read_type_reference(elem)
+    self.summary = read_doc(elem, "Summary")
+    self.value = read_doc(elem, "Value")
+    
+class PropertyInfo(object):
+  __slots__ = ('name', 'anchor', 'has_get', 'is_get_public', 'has_set', 'is_set_public',
+               'type', 'summary', 'value')
+  
+  def __init__(self, elem):
+    self.name = elem.get("Name")
+    self.anchor = elem.get("Anchor")
+    self.has_get = elem.get("HasGet") == "True"
+    self.is_get_public = elem.get("IsGetPublic") == "True"
+    self.has_set = elem.get("HasSet") == "True"
+    self.is_set_public = elem.get("IsSetPublic") == "True"
+    self.type = read_type_reference(elem)
+    self.summary = read_doc(elem, "Summary")
+    self.value = read_doc(elem, "Value")
+    
+class MethodInfo(object):
+  __slots__ = ('name', 'anchor', 'is_public', 'is_protected', 'is_private', 'is_abstract',
+               'return_type', 'returns_void', 'summary', 'returns', 'type_parameters',
+               'parameters')
+  
+  def __init__(self, elem):
+    self.name = elem.get("Name")
+    self.anchor = elem.get("Anchor")
+    self.is_public = elem.get("IsPublic") == "True"
+    self.is_protected = elem.get("IsProtected") == "True"
+    self.is_private = elem.get("IsPrivate") == "True"
+    self.is_abstract = elem.get("IsAbstract") == "True"
+    self.return_type = read_type_reference(elem, "Return")
+    self.returns_void = elem.get("ReturnTypeFullName") == "System.Void"
+    self.summary = read_doc(elem, "Summary")
+    self.returns = read_doc(elem, "Returns")
+    self.type_parameters = [TypeParameterInfo(e) for e in elem.findall("TypeParameter")]
+    self.parameters = [ParameterInfo(e) for e in elem.findall("Parameter")]
+    
+class TypeInfo(object):
+  """
+  The documentation of a single type, read once from its <Type> element.
+  Visibility flags are resolved to booleans, documentation text is already
+  normalized, and type references are shared (display name, anchor) pairs.
+  """
+  
+  __slots__ = ('name', 'namespace', 'full_name', 'module', 'anchor', 'kind', 'is_public',
+               'is_internal', 'interface_ref', 'summary', 'inherits', 'implements',
+               'type_parameters', 'fields', 'properties', 'methods', 'digest')
+  
+  def __init__(self, elem, digest=None):
+    self.name = elem.get("Name")
+    self.namespace = elem.get("Namespace")
+    self.full_name = elem.get("FullName")
+    self.module = elem.get("Module")
+    self.anchor = elem.get("Anchor")
+    self.kind = elem.get("Type").lower()
+    self.is_public = elem.get("IsPublic") == "True"
+    self.is_internal = elem.get("IsProtogameInternal") == "True"
+    self.interface_ref = elem.get("InterfaceRef")
+    self.summary = read_doc(elem, "Summary")
+    self.inherits = [read_type_reference(e) for e in elem.findall("Inherits")]
+    self.implements = [read_type_reference(e) for e in elem.findall("Implements")]
+    self.type_parameters = [TypeParameterInfo(e) for e in elem.findall("TypeParameter")]
+    self.fields = [FieldInfo(e) for e in elem.findall("Field")]
+    self.properties = [PropertyInfo(e) for e in elem.findall("Property")]
+    self.methods = [MethodInfo(e) for e in elem.findall("Method")]
+    self.digest = digest
   
+def get_open_generic_anchor(anchor):
+  """
+  Returns the anchor of a type with its type arguments replaced by their
+  count, e.g. Protogame.IFoo`1 for both IFoo<T> and IFoo<Int32>.
+  """
+  start = anchor.find("<")
+  if start < 0 or not anchor.endswith(">"):
+    return anchor
+  return anchor[:start] + "`" + str(len(split_generic_arguments(anchor[start + 1:-1])))
+  
+class TypeRelations(object):
+  """
+  Reverse indices over the type model: the types deriving from each type,
+  the types implementing each interface, and the internal classes that
+  implement each service through InterfaceRef, all as (name, anchor)
+  pairs.  They are filled in the single pass over the types that fills
+  type_pages, so listing the related types of a page is a lookup.  Generic
+  types are keyed by their open generic anchor, so implementing
+  IFoo<Int32> lists a type under IFoo<T>.
+  """
+  
+  def __init__(self):
+    self.derived = collections.defaultdict(list)
+    self.implementers = collections.defaultdict(list)
+    self.service_implementations = collections.defaultdict(list)
+    self.digests = {}
+    
+  def add(self, info):
+    entry = (info.name, info.anchor)
+    for name, anchor in info.inherits:
+      self.derived[get_open_generic_anchor(anchor)].append(entry)
+    for name, anchor in info.implements:
+      self.implementers[get_open_generic_anchor(anchor)].append(entry)
+    if info.is_internal and info.interface_ref != None:
+      self.service_implementations[get_open_generic_anchor(info.interface_ref)].append(entry)
+      
+  def get(self, anchor):
+    """
+    Returns the derived types and the known implementations of a type,
+    sorted by name, as (name, anchor, internal) tuples, where internal is
+    true for the internal implementations of a service.
+    """
+    anchor = get_open_generic_anchor(anchor)
+    derived = [(name, target, False) for name, target in self.derived.get(anchor, [])]
+    implementations = dict((target, (name, target, False))
+                           for name, target in self.implementers.get(anchor, []))
+    for name, target in self.service_implementations.get(anchor, []):
+      implementations[target] = (name, target, True)
+    sort_key = lambda entry: (entry[0].lower(), entry[1])
+    return sorted(derived, key=sort_key), sorted(implementations.values(), key=sort_key)
+    
+  def get_digest(self, anchor):
+    digest = self.digests.get(anchor)
+    if digest == None:
+      digest = hashlib.sha1(json.dumps(self.get(anchor)).encode('utf8')).hexdigest()
+      self.digests[anchor] = digest
+    return digest
+    
+type_relations = TypeRelations()
+  
+def format_doc(doc, indent):
+  return indent + ("\n" + indent).join(doc.split("\n"))
+  
+def format_doc_field_value(doc, sub_indent):
+  if doc != None and "\n" in doc:
+    return "\n" + format_doc(doc, sub_indent)
+  return doc
+  
+def get_page_header(info):
   content = []
   
-  content.append(".. _`" + elem.get("Anchor") + "`:")
+  # Type pages are linked from dotnet:apiindex and the domain indices
+  # rather than from a toctree.
+  content.append(":orphan:")
   content.append("")
-  content.append(elem.get("Name"))
+  content.append(".. _`" + info.anchor + "`:")
+  content.append("")
+  content.append(info.name)
   content.append("=============================================================")
   content.append("")
-  content.append("""
-.. raw:: html
-
-    <style type="text/css">
-      td.field-body {
-        padding-top: 8px !important;
-      }
-      td.field-body > ul.first.last.simple {
-        margin-top: -3px;
-      }
-    </style>
-""")
-  
-  if elem.get("IsProtogameInternal") == "True":
-    interface_ref = elem.get("InterfaceRef")
-    if interface_ref == None:
+  
+  if info.is_internal:
+    if info.interface_ref == None:
       content.append(".. warning::")
       content.append("")
       content.append("    This documentation is for an internal class.  This class ")
@@ -381,249 +1288,2145 @@ def generate_doc_at_path(app, elem, path):
       content.append("")
       content.append("    This documentation is for an implementation of a service.")
       content.append("    This class is not meant to be used directly; instead use ")
-      content.append("    the :ref:`" + elem.get("InterfaceRef") + "` service via ")
+      content.append("    the :ref:`" + info.interface_ref + "` service via ")
       content.append("    dependency injection to access this functionality.")
       content.append("")
       content.append("    Information documented here may not be up to date.")
       content.append("")
+  
+  return content
+
+def get_type_options(info):
+  options = [
+    ("name", info.name),
+    ("fullname", info.full_name),
+    ("namespace", info.namespace),
+    ("anchor", info.anchor),
+  ]
+  for inherit in info.inherits:
+    options.append(("inherits", inherit))
+  options.append(("implements", info.implements))
+  return options
+
+def get_typeparam_content(type_parameters, indent, sub_indent):
+  content = []
+  for typeparam in type_parameters:
+    paramdoc = format_doc_field_value(typeparam.doc, sub_indent)
+    if paramdoc == None:
+      paramdoc = ""
+    content.append(indent + ":typeparam " + 
+                   "`" + typeparam.name + "`: " + paramdoc)
+  return content
+
+def get_type_content(info, indent, sub_indent):
+  content = []
+  if info.summary != None:
+    content.append(format_doc(info.summary, indent))
+    content.append(indent)
+  typeparams = get_typeparam_content(info.type_parameters, indent, sub_indent)
+  if len(typeparams) > 0:
+    content.extend(typeparams)
+    content.append(indent)
+  content.append(indent + ".. dotnet:relatedtypes:: " + info.anchor)
+  content.append(indent)
+  return content
+
+def get_public_fields(info):
+  return [field for field in info.fields if field.is_public]
+
+def get_field_options(field):
+  return [
+    ("name", field.name),
+    ("type", field.type),
+    ("anchor", field.anchor),
+  ]
+
+def get_value_content(member, indent, sub_indent):
+  content = []
+  if member.summary != None:
+    content.append(format_doc(member.summary, indent))
+    content.append(indent)
+  valuedoc = format_doc_field_value(member.value, sub_indent)
+  if valuedoc != None:
+    content.append(indent + ":value: " + valuedoc)
+  return content
+
+def get_public_properties(info):
+  properties = []
+  for prop in info.properties:
+    if ((not prop.has_get) or (prop.has_get and not prop.is_get_public) and
+        (not prop.has_set) or (prop.has_set and not prop.is_set_public)):
+      continue
+    properties.append(prop)
+  return properties
+
+def get_property_options(prop):
+  prefix = "readwrite"
+  if not prop.is_set_public:
+    prefix = "readonly"
+  if not prop.is_get_public:
+    prefix = "writeonly"
+  
+  return [
+    ("name", prop.name),
+    ("prefix", prefix),
+    ("type", prop.type),
+    ("anchor", prop.anchor),
+  ]
+
+def get_public_methods(info):
+  methods = []
+  for method in info.methods:
+    if method.is_private:
+      continue
+    if method.is_protected and not method.is_abstract:
+      continue
+    methods.append(method)
+  return methods
+
+def get_method_options(info, method):
+  prefix = []
+  if info.kind == "class":
+    if method.is_private:
+      prefix.append("private")
+    if method.is_protected:
+      prefix.append("protected")
+    if method.is_public:
+      prefix.append("public")
+    if method.is_abstract:
+      prefix.append("abstract")
+  
+  parameters = []
+  for parameter in method.parameters:
+    parameters.append((
+      parameter.type[0],
+      parameter.name,
+      parameter.type[1],
+      "True" if parameter.is_ref else "False",
+      "True" if parameter.is_out else "False"))
+  
+  return [
+    ("name", method.name),
+    ("prefix", " ".join(prefix)),
+    ("parameters", parameters),
+    ("return", method.return_type),
+    ("anchor", method.anchor),
+  ]
+
+def get_method_content(method, indent, sub_indent):
+  content = []
+  if method.summary != None:
+    content.append(format_doc(method.summary, indent))
+    content.append(indent)
+  
+  content.extend(get_typeparam_content(method.type_parameters, indent, sub_indent))
+  
+  for parameter in method.parameters:
+    paramdoc = format_doc_field_value(parameter.doc, sub_indent)
+    if paramdoc == None:
+      paramdoc = ""
+    prefix = ""
+    if parameter.is_ref:
+      prefix += "(ref) "
+    if parameter.is_out:
+      prefix += "(out) "
+    # The field name is split on whitespace, so generic arguments can't be
+    # separated by spaces here.
+    content.append(indent + ":param " + parameter.type[0].replace(", ", ",") + " " + 
+                   "`" + prefix + parameter.name + "`: " + paramdoc)
+  if not method.returns_void:
+    returndoc = format_doc_field_value(method.returns, sub_indent)
+    if returndoc != None:
+      content.append(indent + ":returns: " + returndoc)
+  
+  return content
+
+def get_members(info):
+  """
+  Returns the documented members of a type in page order, as tuples of
+  the directive name, the member, its directive options and a function
+  that builds its directive content.
+  """
+  members = []
+  for field in get_public_fields(info):
+    members.append(("nfield", field, get_field_options(field), get_value_content))
+  for prop in get_public_properties(info):
+    members.append(("nproperty", prop, get_property_options(prop), get_value_content))
+  for method in get_public_methods(info):
+    members.append(("method", method, get_method_options(info, method), get_method_content))
+  return members
+
+# The member directives and the headings they are listed under on the pages
+# of split types.
+MEMBER_KIND_LABELS = [
+  ("nfield", "Fields"),
+  ("nproperty", "Properties"),
+  ("method", "Methods"),
+]
+
+def get_member_groups(info, path):
+  """
+  Groups the members of the type whose page is at path by name, so that
+  overloads share a group, returning (name, members, page path) tuples in
+  page order.  Names that only differ in case are numbered, as page names
+  are lower case.
+  """
+  groups = collections.OrderedDict()
+  for member in get_members(info):
+    groups.setdefault(member[1].name, []).append(member)
+  pages = []
+  filenames = set()
+  base = path[:-len(".gen.rst")]
+  for name, members in groups.items():
+    filename = normalize_name_to_filename(name)
+    suffix = 1
+    while filename in filenames:
+      suffix += 1
+      filename = normalize_name_to_filename(name) + "_" + str(suffix)
+    filenames.add(filename)
+    # Type names can't contain '-', so this never collides with a type page.
+    pages.append((name, members, base + "-" + filename + ".gen.rst"))
+  return pages
+
+def get_member_pages(info, path, threshold):
+  """
+  Returns the member pages of a type, as get_member_groups does, if it has
+  more members than threshold, or an empty list if its members are all
+  described on its own page.
+  """
+  if threshold == None or len(get_members(info)) <= threshold:
+    return []
+  return get_member_groups(info, path)
+
+def get_member_summary(members):
+  """
+  Returns the first paragraph of the first summary in a member group, for
+  the member table of its type, or None if it has none that fits there.
+  """
+  for directive, member, options, get_content in members:
+    if member.summary != None:
+      summary = re.split(r"\n\s*\n", member.summary, 1)[0]
+      if not summary.startswith(".."):
+        return summary
+      return None
+  return None
+
+def get_member_table_content(pages, indent):
+  """
+  Returns the tables that list the members of a split type on its page,
+  linking to each member page with the member's summary.
+  """
+  content = []
+  for kind, label in MEMBER_KIND_LABELS:
+    rows = [(name, members, path) for name, members, path in pages if members[0][0] == kind]
+    if len(rows) == 0:
+      continue
+    content.append(indent + ".. rubric:: " + label)
+    content.append(indent)
+    content.append(indent + ".. list-table::")
+    content.append(indent + "    :widths: 30 70")
+    content.append(indent + "    :class: dotnet-members")
+    content.append(indent)
+    for name, members, path in rows:
+      link = ":doc:`" + name.replace("<", "\\<") + " </" + path[:-len(".rst")] + ">`"
+      if len(members) > 1:
+        link += " (" + str(len(members)) + " overloads)"
+      content.append(indent + "    * - " + link)
+      summary = get_member_summary(members)
+      if summary != None:
+        content.append(indent + "      - " + format_doc(summary, indent + "        ").lstrip())
+      else:
+        content.append(indent + "      -")
+    content.append(indent)
+  return content
+
+def get_member_page_header(info, name):
+  title = info.name + "." + name
+  return [
+    ":orphan:",
+    "",
+    title,
+    "=" * max(len(title), 61),
+    "",
+    "Member of :ref:`" + info.name.replace("<", "\\<") + " <" + info.anchor + ">`.",
+    "",
+  ]
+
+def format_directive(directive, argument, options, indent):
+  content = [indent + ".. dotnet:" + directive + ":: " + argument]
+  for name, value in options:
+    if not isinstance(value, (list, tuple)):
+      content.append(indent + "    :" + name + ": " + value)
+    else:
+      content.append(indent + "    :" + name + ": " + json.dumps(value))
+  return content
+  
+def generate_doc(info, pages=()):
+  """
+  Returns the page of a type.  If the type is split into member pages,
+  given by get_member_pages, its members are listed in tables instead of
+  being described on the page.
+  """
+  content = get_page_header(info)
     
   i1 = "    "
   i2 = "        "
   i3 = "            "
   
-  content.append(".. dotnet:" + elem.get("Type").lower() + ":: " + elem.get("FullName"))
-  content.append(i1 + ":name: " + elem.get("Name"))
-  content.append(i1 + ":fullname: " + elem.get("FullName"))
-  content.append(i1 + ":namespace: " + elem.get("Namespace"))
+  content.extend(format_directive(info.kind, info.full_name, get_type_options(info), ""))
+  content.append(i1)
+  content.extend(get_type_content(info, i1, i3))
   
-  for inherit in elem.findall("Inherits"):
-    content.append(i1 + ":inherits: " + json.dumps((
-      convert_to_keyword_if_possible(inherit.get("TypeName"), inherit.get("TypeAnchor")),
-      inherit.get("TypeAnchor"))))
-    
-  implements = []
-  for implement in elem.findall("Implements"):
-    implements.append((
-      convert_to_keyword_if_possible(implement.get("TypeName"), implement.get("TypeAnchor")),
-      implement.get("TypeAnchor")))
-    
-  content.append(i1 + ":implements: " + json.dumps(implements))
+  if len(pages) > 0:
+    content.extend(get_member_table_content(pages, i1))
+    return "\n".join(content)
   
-  content.append(i1)
-  summary = get_indented_rest(elem, "Summary", i1)
-  if summary != None:
-    content.append(summary)
-    content.append(i1)
-    
-  typeparams = elem.findall("TypeParameter")
-  for typeparam in typeparams:
-    paramdoc = get_indented_rest(typeparam, None, "")
-    if paramdoc != None:
-      if "\n" in paramdoc:
-        paramdoc = "\n" + get_indented_rest(typeparam, None, i3)
-    else:
-      paramdoc = ""
-    content.append(i1 + ":typeparam " + 
-                   "`" + typeparam.get("TypeName") + "`: " + paramdoc)
-  if len(typeparams) > 0:
-    content.append(i1)
-    
-  for field in elem.findall("Field"):
-    if field.get("IsPublic") != "True":
-      continue
-    
-    content.append(i1 + ".. _`" + field.get("Anchor") + "`:")
+  for directive, member, options, get_content in get_members(info):
+    content.append(i1 + ".. _`" + member.anchor + "`:")
     content.append(i1)
-    content.append(i1 + ".. dotnet:nfield:: " + field.get("Name"))
-    content.append(i2 + ":name: " + field.get("Name"))
-    content.append(i2 + ":type: " + json.dumps((
-      convert_to_keyword_if_possible(field.get("TypeName"), field.get("TypeAnchor")),
-      field.get("TypeAnchor"))))
+    content.extend(format_directive(directive, member.name, options, i1))
     content.append(i2)
-    summary = get_indented_rest(field, "Summary", i2)
-    if summary != None:
-      content.append(summary)
-      content.append(i2)
-    valuedoc = get_indented_rest(field, "Value", "")
-    if valuedoc != None:
-      if "\n" in valuedoc:
-        valuedoc = "\n" + get_indented_rest(field, "Value", i3)
-      content.append(i2 + ":value: " + valuedoc)
+    content.extend(get_content(member, i2, i3))
     content.append(i1)
+  
+  return "\n".join(content)
+  
+def generate_member_doc(info, name, members):
+  """
+  Returns the page of a member group of a split type.  The members aren't
+  nested in their type's directive, so their namespace is given directly.
+  """
+  content = get_member_page_header(info, name)
+  for directive, member, options, get_content in members:
+    content.append(".. _`" + member.anchor + "`:")
+    content.append("")
+    content.extend(format_directive(directive, member.name,
+                                    options + [("namespace", info.namespace)], ""))
+    content.append("    ")
+    content.extend(get_content(member, "    ", "        "))
+    content.append("")
+  return "\n".join(content)
+  
+def generate_autotype_doc(info, pages=()):
+  content = get_page_header(info)
+  # The digest changes the page whenever the type or the generator does, so
+  # that Sphinx knows to read it again.
+  content.append(".. dotnet:autotype:: " + info.anchor)
+  content.append("    :digest: " + info.digest + "-" + str(GENERATOR_VERSION))
+  if len(pages) > 0:
+    content.append("    :summary:")
+  content.append("")
+  return "\n".join(content)
+  
+def generate_autotype_member_doc(info, name, members):
+  content = get_member_page_header(info, name)
+  # Only a change to these members should make Sphinx read the page again,
+  # so the digest is of the page they would have without dotnet:autotype.
+  digest = hashlib.sha1(generate_member_doc(info, name, members).encode('utf8')).hexdigest()
+  content.append(".. dotnet:autotype:: " + info.anchor)
+  content.append("    :member: " + name)
+  content.append("    :digest: " + digest + "-" + str(GENERATOR_VERSION))
+  content.append("")
+  return "\n".join(content)
+
+class BuildMetrics(object):
+  """
+  Timings and counters for the work the extension does during a build,
+  written out as a JSON report when the build finishes.  What happens while
+  reading documents is kept per document on the environment instead (see
+  get_env_metrics), so that it survives parallel reads.
+  """
+  
+  def __init__(self):
+    self.start = time.time()
+    self.timings = collections.defaultdict(float)
+    self.counters = collections.defaultdict(int)
+    self.marks = {}
+    self.model = None
+    self.modules = None
+    self.fetch = None
+    self.read_docnames = set()
+    self.unresolved_xrefs = collections.defaultdict(int)
     
-  for prop in elem.findall("Property"):
-    if ((prop.get("HasGet") != "True") or (prop.get("HasGet") == "True" and prop.get("IsGetPublic") != "True") and
-        (prop.get("HasSet") != "True") or (prop.get("HasSet") == "True" and prop.get("IsSetPublic") != "True")):
-      continue
+  def add_time(self, name, seconds):
+    self.timings[name] += seconds
     
-    prefix = "readwrite"
-    readonly = prop.get("HasSet") == None or prop.get("IsSetPublic") != "True"
-    writeonly = prop.get("HasGet") == None or prop.get("IsGetPublic") != "True"
-    if readonly:
-      prefix = "readonly"
-    if writeonly:
-      prefix = "writeonly"
+  def count(self, name, value=1):
+    self.counters[name] += value
     
-    content.append(i1 + ".. _`" + prop.get("Anchor") + "`:")
-    content.append(i1)
-    content.append(i1 + ".. dotnet:nproperty:: " + prop.get("Name"))
-    content.append(i2 + ":name: " + prop.get("Name"))
-    content.append(i2 + ":prefix: " + prefix)
-    content.append(i2 + ":type: " + json.dumps((
-      convert_to_keyword_if_possible(prop.get("TypeName"), prop.get("TypeAnchor")),
-      prop.get("TypeAnchor"))))
-    content.append(i2)
-    summary = get_indented_rest(prop, "Summary", i2)
-    if summary != None:
-      content.append(summary)
-      content.append(i2)
-    valuedoc = get_indented_rest(prop, "Value", "")
-    if valuedoc != None:
-      if "\n" in valuedoc:
-        valuedoc = "\n" + get_indented_rest(prop, "Value", i3)
-      content.append(i2 + ":value: " + valuedoc)
-    content.append(i1)
+  def mark(self, name):
+    self.marks.setdefault(name, time.time())
     
-  for method in elem.findall("Method"):
-    if method.get("IsPrivate") == "True":
-      continue
-    if method.get("IsProtected") == "True" and method.get("IsAbstract") == "False":
-      continue
+  def record_page(self, path, changed):
+    if changed:
+      self.count("pages_written")
+      self.count("bytes_written", os.path.getsize(path))
+    else:
+      self.count("pages_unchanged")
+      
+  def get_read_metrics(self, env):
+    """
+    Totals the metrics of the documents read in this build.
+    """
+    directive_time = 0.0
+    directives = {}
+    pending_xrefs = collections.defaultdict(int)
+    for docname, metrics in getattr(env, 'netxml_metrics', {}).items():
+      if not docname in self.read_docnames:
+        continue
+      directive_time += metrics["directive_time"]
+      for name, (count, seconds) in metrics["directives"].items():
+        total = directives.setdefault(name, {"count": 0, "seconds": 0.0})
+        total["count"] += count
+        total["seconds"] += seconds
+      for role, count in metrics["pending_xrefs"].items():
+        pending_xrefs[role] += count
+    return directive_time, directives, dict(pending_xrefs)
     
-    prefix = []
-    if elem.get("Type").lower() == "class":
-      if method.get("IsPrivate") == "True":
-        prefix.append("private")
-      if method.get("IsProtected") == "True":
-        prefix.append("protected")
-      if method.get("IsPublic") == "True":
-        prefix.append("public")
-      if method.get("IsAbstract") == "True":
-        prefix.append("abstract")
-    
-    parameters = method.findall("Parameter")
-    
-    anchorparams = []
-    for parameter in parameters:
-      anchorparams.append(
-        convert_to_keyword_if_possible(parameter.get("TypeName"), parameter.get("TypeAnchor")))
-    anchorparams = ", ".join(anchorparams)
-    
-    content.append(i1 + ".. _`" + method.get("Anchor") + "`:")
-    content.append(i1)
-    content.append(i1 + ".. dotnet:method:: " + method.get("Name"))
-    content.append(i2 + ":name: " + method.get("Name"))
-    content.append(i2 + ":prefix: " + " ".join(prefix))
-    
-    parameters_for_json = []
-    for parameter in parameters:
-      parameters_for_json.append((
-        convert_to_keyword_if_possible(parameter.get("TypeName"), parameter.get("TypeAnchor")),
-        parameter.get("Name"),
-        parameter.get("TypeAnchor"),
-        parameter.get("IsRef"),
-        parameter.get("IsOut")))
-    
-    content.append(i2 + ":parameters: " + json.dumps(parameters_for_json))
-    content.append(i2 + ":return: " + json.dumps((
-      convert_to_keyword_if_possible(method.get("ReturnTypeName"), method.get("ReturnTypeAnchor")),
-      method.get("ReturnTypeAnchor"))))
-    
-    summary = get_indented_rest(method, "Summary", i2)
-    if summary != None:
-      content.append(i2)
-      content.append(summary)
-    content.append(i2)
+  def get_report(self, app, exception):
+    directive_time, directives, pending_xrefs = self.get_read_metrics(app.env)
+    timings = dict(self.timings)
+    timings["total"] = time.time() - self.start
+    if "read" in self.marks and "write" in self.marks:
+      timings["read"] = self.marks["write"] - self.marks["read"]
+      timings["write"] = time.time() - self.marks["write"]
+    timings["directives"] = directive_time
+    counters = self.counters
+    return {
+      "builder": app.builder.name,
+      "succeeded": exception == None,
+      "model": self.model,
+      "shards_parsed": counters["shards_parsed"],
+      "modules": self.modules,
+      "fetch": self.fetch,
+      "timings": timings,
+      "types": counters["types"],
+      "types_excluded": counters["types_excluded"],
+      "members": counters["members"],
+      "pages": {
+        "written": counters["pages_written"],
+        "unchanged": counters["pages_unchanged"],
+        "skipped": counters["pages_skipped"],
+        "removed": counters["pages_removed"],
+        "bytes_written": counters["bytes_written"],
+      },
+      "documents_read": len(self.read_docnames),
+      "dependent_documents": counters["dependent_documents"],
+      "directives": directives,
+      "pending_xrefs": pending_xrefs,
+      "unresolved_xrefs": dict(self.unresolved_xrefs),
+      "excluded_xrefs": counters["xrefs_excluded"],
+      "external_xrefs": counters["xrefs_external"],
+    }
     
-    typeparams = method.findall("TypeParameter")
-    for typeparam in typeparams:
-      paramdoc = get_indented_rest(typeparam, None, "")
-      if paramdoc != None:
-        if "\n" in paramdoc:
-          paramdoc = "\n" + get_indented_rest(typeparam, None, i3)
-      else:
-        paramdoc = ""
-      content.append(i2 + ":typeparam " + 
-                    "`" + typeparam.get("TypeName") + "`: " + paramdoc)
-    
-    for parameter in parameters:
-      paramdoc = get_indented_rest(parameter, None, "")
-      if paramdoc != None:
-        if "\n" in paramdoc:
-          paramdoc = "\n" + get_indented_rest(parameter, None, i3)
-      else:
-        paramdoc = ""
-      prefix = ""
-      if parameter.get("IsRef") == "True":
-        prefix += "(ref) "
-      if parameter.get("IsOut") == "True":
-        prefix += "(out) "
-      content.append(i2 + ":param " + 
-                     convert_to_keyword_if_possible(parameter.get("TypeName"), parameter.get("TypeAnchor")) + " " + 
-                     "`" + prefix + parameter.get("Name") + "`: " + paramdoc)
-    if method.get("ReturnTypeFullName") != "System.Void":
-      returndoc = get_indented_rest(method, "Returns", "")
-      if returndoc != None:
-        if "\n" in returndoc:
-          returndoc = "\n" + get_indented_rest(method, "Returns", i3)
-        content.append(i2 + ":returns: " + returndoc)
+build_metrics = BuildMetrics()
+
+def get_env_metrics(env):
+  """
+  Returns the metrics collected while reading the current document.
+  """
+  if not hasattr(env, 'netxml_metrics'):
+    env.netxml_metrics = {}
+  metrics = env.netxml_metrics.get(env.docname)
+  if metrics == None:
+    metrics = env.netxml_metrics[env.docname] = {
+      "directive_time": 0.0,
+      "directives": {},     # directive name -> [count, seconds]
+      "pending_xrefs": {},  # domain:role -> count
+    }
+  return metrics
+  
+def begin_reading(app, env, docnames):
+  build_metrics.mark("read")
+  build_metrics.read_docnames.update(docnames)
+  
+def end_reading(app, env):
+  build_metrics.mark("write")
+  
+def count_pending_xrefs(app, doctree):
+  env = app.env
+  pending_xrefs = get_env_metrics(env)["pending_xrefs"]
+  targets = set()
+  for node in doctree.traverse(addnodes.pending_xref):
+    role = node.get('refdomain', '') + ":" + node.get('reftype', '')
+    pending_xrefs[role] = pending_xrefs.get(role, 0) + 1
+    if role == "std:ref":
+      targets.add(node['reftarget'])
+    elif role in ("dotnet:type", "dotnet:method"):
+      # These resolve to the object's label when it isn't an object.
+      targets.add(ws_re.sub(' ', node['reftarget'].lower()))
+    elif role == "std:doc":
+      targets.add("doc:" + docname_join(env.docname, node['reftarget']))
+  title = env.titles.get(env.docname)
+  get_env_dependencies(env)["documents"][env.docname] = (
+    frozenset(targets), frozenset(doctree.nameids), title.astext() if title != None else None)
+    
+def resolve_missing_reference(app, env, node, contnode):
+  """
+  Handles every reference that Sphinx couldn't resolve: references to
+  types left out by netxml_modules become placeholders, references to
+  external types become links, and the rest are counted.
+  """
+  newnode = resolve_excluded_xref(app, env, node, contnode)
+  if newnode == None:
+    newnode = resolve_external_xref(app, env, node, contnode)
+  if newnode == None:
+    build_metrics.unresolved_xrefs[node.get('refdomain', '') + ":" + node.get('reftype', '')] += 1
+  return newnode
+  
+def purge_env_metrics(app, env, docname):
+  getattr(env, 'netxml_metrics', {}).pop(docname, None)
+  
+def merge_env_metrics(app, env, docnames, other):
+  if not hasattr(env, 'netxml_metrics'):
+    env.netxml_metrics = {}
+  for docname in docnames:
+    metrics = getattr(other, 'netxml_metrics', {}).get(docname)
+    if metrics != None:
+      env.netxml_metrics[docname] = metrics
       
-    content.append(i1)
+def get_env_dependencies(env):
+  """
+  Returns what each document links to and defines, which decides the
+  documents that have to be written again when another one changes.
+  """
+  if not hasattr(env, 'netxml_dependencies'):
+    env.netxml_dependencies = {
+      # docname -> (targets of std references, labels defined, title)
+      "documents": {},
+      "apiindex": {},   # docname -> type_pages_digest when it was read
+      "relations": {},  # docname -> {anchor: digest of its relations when read}
+      # What the labels and titles of the documents purged in this build
+      # resolved to before they were purged.
+      "purged_labels": {},
+      "purged_titles": {},
+    }
+  # Environments pickled before dotnet:relatedtypes existed lack this.
+  env.netxml_dependencies.setdefault("relations", {})
+  return env.netxml_dependencies
+  
+def purge_dependencies(app, env, docname):
+  # This runs before the document is cleared from the domains, but its
+  # title may already be gone.
+  dependencies = get_env_dependencies(env)
+  dependencies["apiindex"].pop(docname, None)
+  dependencies["relations"].pop(docname, None)
+  entry = dependencies["documents"].pop(docname, None)
+  if entry == None:
+    return
+  std = env.domaindata['std']
+  for label in entry[1]:
+    dependencies["purged_labels"].setdefault(
+      label, (std['labels'].get(label), std['anonlabels'].get(label)))
+  dependencies["purged_titles"].setdefault(docname, entry[2])
+  
+def merge_dependencies(app, env, docnames, other):
+  dependencies = get_env_dependencies(env)
+  other_dependencies = get_env_dependencies(other)
+  for name in ("documents", "apiindex", "relations"):
+    for docname in docnames:
+      if docname in other_dependencies[name]:
+        dependencies[name][docname] = other_dependencies[name][docname]
+        
+def find_outdated_api_indices(app, env, added, changed, removed):
+  """
+  Returns the documents using dotnet:apiindex or dotnet:relatedtypes, if
+  the types they list have changed since they were read.
+  """
+  dependencies = get_env_dependencies(env)
+  outdated = [docname for docname, digest in dependencies["apiindex"].items()
+              if digest != type_pages_digest]
+  for docname, digests in dependencies["relations"].items():
+    for anchor, digest in digests.items():
+      if digest != type_relations.get_digest(anchor):
+        outdated.append(docname)
+        break
+  return outdated
+  
+def find_dependent_docs(app, env):
+  """
+  Returns the documents that link to a label or document whose target or
+  title changed in this build, so that their links are resolved again.
+  Sphinx would otherwise only write the documents that were read.
+  """
+  dependencies = get_env_dependencies(env)
+  documents = dependencies["documents"]
+  purged_labels = dependencies["purged_labels"]
+  purged_titles = dependencies["purged_titles"]
+  std = env.domaindata['std']
+  changed = set()
+  for label, resolved in purged_labels.items():
+    if (std['labels'].get(label), std['anonlabels'].get(label)) != resolved:
+      changed.add(label)
+  for docname, title in purged_titles.items():
+    current = env.titles.get(docname)
+    if (current.astext() if current != None else None) != title:
+      changed.add("doc:" + docname)
+  for docname in build_metrics.read_docnames:
+    entry = documents.get(docname)
+    if entry == None:
+      continue
+    changed.update(label for label in entry[1] if not label in purged_labels)
+    if not docname in purged_titles:
+      changed.add("doc:" + docname)
+  purged_labels.clear()
+  purged_titles.clear()
+  
+  if len(changed) == 0:
+    return []
+  dependents = [docname for docname, entry in documents.items()
+                if not docname in build_metrics.read_docnames and not entry[0].isdisjoint(changed)]
+  build_metrics.count("dependent_documents", len(dependents))
+  if len(dependents) > 0:
+    app.info(str(len(dependents)) + " documents link to changed .net documentation")
+  return dependents
+  
+def write_metrics(app, exception):
+  path = app.config.netxml_metrics_path
+  if path == None:
+    return
+  path = os.path.join(app.outdir, path)
+  report = build_metrics.get_report(app, exception)
+  with open(path, 'w') as f:
+    json.dump(report, f, indent=1, sort_keys=True)
+  app.info("wrote .net documentation build metrics to " + path)
+  
+SQLITE_SCHEMA = """
+CREATE TABLE meta (
+  key TEXT PRIMARY KEY,
+  value TEXT NOT NULL
+);
+CREATE TABLE types (
+  id INTEGER PRIMARY KEY,
+  anchor TEXT NOT NULL,
+  name TEXT NOT NULL,
+  full_name TEXT,
+  namespace TEXT,
+  module TEXT,
+  kind TEXT NOT NULL,
+  is_internal INTEGER NOT NULL,
+  interface_ref TEXT,
+  summary TEXT,
+  docname TEXT
+);
+CREATE TABLE type_references (
+  type_id INTEGER NOT NULL REFERENCES types (id),
+  relation TEXT NOT NULL,
+  name TEXT,
+  anchor TEXT
+);
+CREATE TABLE members (
+  id INTEGER PRIMARY KEY,
+  type_id INTEGER NOT NULL REFERENCES types (id),
+  kind TEXT NOT NULL,
+  name TEXT NOT NULL,
+  anchor TEXT,
+  prefix TEXT,
+  type_name TEXT,
+  type_anchor TEXT,
+  summary TEXT,
+  value TEXT,
+  returns TEXT
+);
+CREATE TABLE parameters (
+  member_id INTEGER NOT NULL REFERENCES members (id),
+  position INTEGER NOT NULL,
+  name TEXT,
+  type_name TEXT,
+  type_anchor TEXT,
+  is_ref INTEGER NOT NULL,
+  is_out INTEGER NOT NULL
+);
+CREATE TABLE anchors (
+  anchor TEXT PRIMARY KEY,
+  type_id INTEGER NOT NULL REFERENCES types (id),
+  member_id INTEGER REFERENCES members (id),
+  docname TEXT
+);
+"""
+
+# Created once the rows are in, which is quicker than maintaining them.
+SQLITE_INDICES = """
+CREATE INDEX types_name ON types (name COLLATE NOCASE);
+CREATE INDEX types_namespace ON types (namespace);
+CREATE INDEX type_references_type ON type_references (type_id);
+CREATE INDEX type_references_anchor ON type_references (anchor, relation);
+CREATE INDEX members_type ON members (type_id);
+CREATE INDEX members_name ON members (name COLLATE NOCASE);
+CREATE INDEX parameters_member ON parameters (member_id, position);
+"""
+
+def get_sqlite_key(source, threshold):
+  size, mtime = get_source_stat(source)
+  return json.dumps({"schema": SQLITE_SCHEMA_VERSION, "generator": GENERATOR_VERSION,
+                     "split": threshold, "size": size, "mtime": mtime}, sort_keys=True)
+                     
+def is_sqlite_current(path, key):
+  import sqlite3
+  if not os.path.isfile(path):
+    return False
+  try:
+    connection = sqlite3.connect(path)
+    try:
+      row = connection.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+    finally:
+      connection.close()
+  except sqlite3.Error:
+    return False
+  return row != None and row[0] == key
   
-  result = "\n".join(content)
+def export_sqlite(path, records, key, threshold=None):
+  """
+  Writes the type model to an SQLite database at path, with a row in
+  anchors for every type and member, and the summaries in an FTS5 table
+  if SQLite was built with FTS5.  The database is written next to path
+  and renamed into place, so readers never see it half written.  Members
+  of types with more members than threshold are recorded on their own
+  pages, as they are generated.  Returns the number of types, and whether
+  the summaries could be indexed.
+  """
+  import sqlite3
+  temp_path = path + ".tmp"
+  if os.path.exists(temp_path):
+    os.remove(temp_path)
+  connection = sqlite3.connect(temp_path)
+  try:
+    connection.executescript(SQLITE_SCHEMA)
+    try:
+      connection.execute("CREATE VIRTUAL TABLE summaries USING fts5(anchor UNINDEXED, name, summary)")
+      full_text = True
+    except sqlite3.OperationalError:
+      full_text = False
+    cursor = connection.cursor()
+    count = 0
+    for info in records:
+      count += 1
+      doc_path = get_type_doc_path(info)
+      docname = doc_path[:-len(".rst")] if doc_path != None else None
+      member_docnames = {}
+      if doc_path != None:
+        for name, members, member_path in get_member_pages(info, doc_path, threshold):
+          member_docnames[name] = member_path[:-len(".rst")]
+      cursor.execute(
+        "INSERT INTO types (anchor, name, full_name, namespace, module, kind, is_internal, " +
+        "interface_ref, summary, docname) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (info.anchor, info.name, info.full_name, info.namespace, get_type_module(info), info.kind,
+         int(info.is_internal), info.interface_ref, info.summary, docname))
+      type_id = cursor.lastrowid
+      cursor.execute("INSERT OR IGNORE INTO anchors VALUES (?, ?, NULL, ?)",
+                     (info.anchor, type_id, docname))
+      cursor.executemany("INSERT INTO type_references VALUES (?, ?, ?, ?)",
+                         [(type_id, "inherits", name, anchor) for name, anchor in info.inherits] +
+                         [(type_id, "implements", name, anchor) for name, anchor in info.implements])
+      if full_text and info.summary != None:
+        cursor.execute("INSERT INTO summaries VALUES (?, ?, ?)", (info.anchor, info.name, info.summary))
+      for directive, member, options, get_content in get_members(info):
+        if directive == "method":
+          type_name, type_anchor = member.return_type
+        else:
+          type_name, type_anchor = member.type
+        cursor.execute(
+          "INSERT INTO members (type_id, kind, name, anchor, prefix, type_name, type_anchor, " +
+          "summary, value, returns) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+          (type_id, directive, member.name, member.anchor, dict(options).get("prefix"),
+           type_name, type_anchor, member.summary, getattr(member, "value", None),
+           getattr(member, "returns", None)))
+        member_id = cursor.lastrowid
+        cursor.execute("INSERT OR IGNORE INTO anchors VALUES (?, ?, ?, ?)",
+                       (member.anchor, type_id, member_id,
+                        member_docnames.get(member.name, docname)))
+        if directive == "method":
+          cursor.executemany("INSERT INTO parameters VALUES (?, ?, ?, ?, ?, ?, ?)", [
+            (member_id, position, parameter.name, parameter.type[0], parameter.type[1],
+             int(parameter.is_ref), int(parameter.is_out))
+            for position, parameter in enumerate(member.parameters)])
+        if full_text and member.summary != None:
+          cursor.execute("INSERT INTO summaries VALUES (?, ?, ?)",
+                         (member.anchor, info.name + "." + member.name, member.summary))
+    connection.executescript(SQLITE_INDICES)
+    cursor.executemany("INSERT INTO meta VALUES (?, ?)", [
+      ("schema_version", str(SQLITE_SCHEMA_VERSION)),
+      ("source", key),
+      ("types", str(count)),
+      ("full_text", "1" if full_text else "0"),
+    ])
+    connection.commit()
+  finally:
+    connection.close()
+  if os.path.exists(path):
+    os.remove(path)
+  os.rename(temp_path, path)
+  return count, full_text
+  
+def write_sqlite(app, exception):
+  path = app.config.netxml_sqlite_path
+  if path == None or exception != None or model_source == None:
+    return
+  path = os.path.join(app.outdir, path)
+  threshold = get_split_members(app)
+  key = get_sqlite_key(model_source, threshold)
+  if is_sqlite_current(path, key):
+    app.info(".net api database is up to date")
+    return
+  start = time.time()
+  count, full_text = export_sqlite(path, iter_model_records(model_source), key, threshold)
+  build_metrics.add_time("sqlite_export", time.time() - start)
+  if not full_text:
+    app.warn("SQLite was built without FTS5, so the summaries in " + path + " aren't searchable")
+  app.info("wrote " + str(count) + " .net types to " + path + " in %.2fs" % (time.time() - start))
+  
+def get_search_name(anchor):
+  """
+  Returns the short name of an object, without its namespace, declaring
+  type, parameters or type parameters.
+  """
+  base = anchor.split("(")[0]
+  # Type arguments may be nested and qualified.
+  while True:
+    stripped = re.sub(r"<[^<>]*>", "", base)
+    if stripped == base:
+      break
+    base = stripped
+  return base[base.rfind(".") + 1:]
+  
+# Where words start in a name: at a capital after a lower case letter or a
+# digit, after an underscore, and at the last capital of an acronym, as in
+# IRenderPipeline.
+search_word_start_re = re.compile(r"(?<=[a-z0-9])(?=[A-Z])|(?<=_)(?=[A-Za-z0-9])|(?<=[A-Z])(?=[A-Z][a-z])")
+
+def get_search_shard_keys(mode, anchor, namespace, prefix_length):
+  """
+  Returns the keys of the shards an object is listed in.  By prefix, it is
+  listed under each word of its name, so that a term also finds the names
+  it appears in after their first word.
+  """
+  if mode == 'namespace':
+    return [namespace if namespace else "_"]
+  name = get_search_name(anchor)
+  starts = [0] + [match.start() for match in search_word_start_re.finditer(name)]
+  # This must match DotNetSearch.getPrefix in netxml-search.js.
+  return sorted(set(re.sub(r'[^a-z0-9]', '_', name[start:start + prefix_length].lower())
+                    for start in starts))
+  
+# The static files added to the HTML builder so far.  Before Sphinx 1.8
+# these are kept on the builder class, so python -m netxml watch would add
+# them again each time it builds in the same process.
+static_files = set()
+
+def add_static_file(app, filename):
+  """
+  Adds a script or stylesheet from STATIC_PATH to the HTML pages.
+  """
+  if hasattr(app, 'add_js_file'):
+    # Sphinx 1.8 keeps these on the application instead.
+    if filename.endswith(".css"):
+      app.add_css_file(filename)
+    else:
+      app.add_js_file(filename)
+    return
+  if filename in static_files:
+    return
+  static_files.add(filename)
+  if filename.endswith(".css"):
+    app.add_stylesheet(filename)
+  else:
+    app.add_javascript(filename)
+  
+def setup_static_files(app):
+  """
+  Adds STATIC_PATH, with the stylesheet for .NET API objects, to the
+  static paths of HTML builds.
+  """
+  if app.builder.format != 'html':
+    return
+  if not STATIC_PATH in app.config.html_static_path:
+    app.config.html_static_path.append(STATIC_PATH)
+  
+def setup_search_shards(app):
+  """
+  Prepares HTML builds to move the API objects out of searchindex.js and
+  into shards that the search page loads on demand.
+  """
+  mode = app.config.netxml_search_shards
+  if mode == None or app.builder.format != 'html':
+    return
+  if mode not in ('prefix', 'namespace'):
+    raise ExtensionError("netxml_search_shards must be None, 'prefix' or 'namespace'")
+  
+  # The text of the generated pages is still indexed, but not the object
+  # signatures, which would add every member name to searchindex.js.  The
+  # signatures are taken out while the page is indexed, and put back for
+  # it to be written.
+  index_page = app.builder.index_page
+  def index_page_without_signatures(pagename, doctree, title):
+    if not pagename.endswith(".gen"):
+      index_page(pagename, doctree, title)
+      return
+    signatures = [(signode, nodes.comment()) for signode in doctree.traverse(addnodes.desc_signature)]
+    for signode, placeholder in signatures:
+      signode.replace_self(placeholder)
+    try:
+      index_page(pagename, doctree, title)
+    finally:
+      for signode, placeholder in signatures:
+        placeholder.replace_self(signode)
+  app.builder.index_page = index_page_without_signatures
+  
+def write_search_shards(app, exception):
+  mode = app.config.netxml_search_shards
+  if exception != None or mode == None or app.builder.format != 'html':
+    return
+  prefix_length = app.config.netxml_search_prefix_length
+  # Each shard lists the pages it links to once, and entries refer to them
+  # by index.
+  shards = collections.defaultdict(lambda: ([], {}, []))
+  objects = app.env.get_domain('dotnet').data['objects']
+  for anchor, (docname, objtype, node_id, namespace) in sorted(objects.items()):
+    for key in get_search_shard_keys(mode, anchor, namespace, prefix_length):
+      uris, uri_indexes, entries = shards[key]
+      if not docname in uri_indexes:
+        uri_indexes[docname] = len(uris)
+        uris.append(app.builder.get_target_uri(docname))
+      entries.append([get_search_name(anchor), anchor, objtype, uri_indexes[docname], node_id])
+    
+  directory = os.path.join(app.outdir, SEARCH_SHARD_PATH)
+  if os.path.isdir(directory):
+    for path in glob.glob(os.path.join(directory, "*.js")):
+      os.remove(path)
+  else:
+    os.makedirs(directory)
+  manifest = {"mode": mode, "prefixLength": prefix_length, "shards": {}}
+  for key, (uris, uri_indexes, entries) in shards.items():
+    filename = re.sub(r'[^A-Za-z0-9._-]', '_', key) + ".js"
+    manifest["shards"][key] = filename
+    with open(os.path.join(directory, filename), 'w') as f:
+      f.write("DotNetSearch.addShard(" + json.dumps(key) + ", " +
+              json.dumps(uris, separators=(',', ':')) + ", " +
+              json.dumps(entries, separators=(',', ':')) + ");")
+  with open(os.path.join(directory, "manifest.js"), 'w') as f:
+    f.write("DotNetSearch.setManifest(" + json.dumps(manifest, sort_keys=True) + ");")
+  app.info("wrote " + str(len(objects)) + " .net objects to " + str(len(shards)) + " search shards")
+  
+def run_timed_directive(directive, run):
+  env = directive.state.document.settings.env
+  # dotnet:autotype runs the other directives itself, so only the outermost
+  # directive adds to the total.
+  depth = env.temp_data.get('netxml:directive_depth', 0)
+  env.temp_data['netxml:directive_depth'] = depth + 1
+  start = time.time()
+  try:
+    return run()
+  finally:
+    elapsed = time.time() - start
+    env.temp_data['netxml:directive_depth'] = depth
+    metrics = get_env_metrics(env)
+    timing = metrics["directives"].setdefault(directive.name, [0, 0.0])
+    timing[0] += 1
+    timing[1] += elapsed
+    if depth == 0:
+      metrics["directive_time"] += elapsed
+      
+def write_doc_if_changed(path, result):
   if os.path.exists(path):
     with open(path, 'r') as f:
       old_result = f.read()
   else:
     old_result = None
     
-  if old_result != result:
-    app.info("generating documentation for class... " + elem.get("FullName"))
-    with open(path, 'w') as f:
-      if sys.version_info >= (3, 0):
-        f.write(result)
-      else:
-        f.write(result.encode('utf8'))
+  if old_result == result:
+    return False
+  
+  directory = os.path.dirname(path)
+  if not os.path.isdir(directory):
+    try:
+      os.makedirs(directory)
+    except OSError:
+      # Another generation worker may have created it first.
+      if not os.path.isdir(directory):
+        raise
+  
+  with open(path, 'w') as f:
+    if sys.version_info >= (3, 0):
+      f.write(result)
+    else:
+      f.write(result.encode('utf8'))
+  return True
+  
+def write_type_docs(info, path, threshold, autotype):
+  """
+  Writes the page of a type, and its member pages if it has more members
+  than threshold, returning (path, changed) for each page.
+  """
+  pages = get_member_pages(info, path, threshold)
+  if autotype:
+    written = [(path, write_doc_if_changed(path, generate_autotype_doc(info, pages)))]
+  else:
+    written = [(path, write_doc_if_changed(path, generate_doc(info, pages)))]
+  for name, members, member_path in pages:
+    if autotype:
+      result = generate_autotype_member_doc(info, name, members)
+    else:
+      result = generate_member_doc(info, name, members)
+    written.append((member_path, write_doc_if_changed(member_path, result)))
+  return written
+  
+def record_type_docs(app, full_name, written):
+  for path, changed in written:
+    build_metrics.record_page(path, changed)
+  if any(changed for path, changed in written):
+    app.info("generating documentation for class... " + full_name)
     
-def process_type(app, elem):
-  name = elem.get("Name")
-  module = elem.get("Module")
-  if elem.get("IsPublic") != "True":
-    return
+def generate_doc_at_path(app, info, path):
+  record_type_docs(app, info.full_name, write_type_docs(
+    info, path, get_split_members(app), False))
+    
+def generate_autotype_doc_at_path(app, info, path):
+  record_type_docs(app, info.full_name, write_type_docs(
+    info, path, get_split_members(app), True))
+    
+def get_type_module(info):
+  return normalize_name_to_filename(info.module)
   
-  module_name = normalize_name_to_filename(module)
-  internal = elem.get("IsProtogameInternal") == "True"
+def get_type_doc_path(info):
+  if not info.is_public:
+    return None
+  
+  module_name = get_type_module(info)
       
   path = module_name + "/api"
-  if internal:
+  if info.is_internal:
     path = "_internal/" + path
+      
+  path = path + "/" + normalize_name_to_filename(info.name) + ".gen"
+  return path + ".rst"
+    
+def process_type(app, elem):
+  info = TypeInfo(elem)
+  path = get_type_doc_path(info)
+  if path == None:
+    return
+  generate_doc_at_path(app, info, path)
   
-  if not os.path.isdir(path):
-    os.makedirs(path)
+class GenerationManifest(object):
+  """
+  Records, for every generated page, the hash of the <Type> subtree it was
+  generated from.  Types whose hash is unchanged since the last build are
+  skipped without generating or reading anything, and pages belonging to
+  types that have since disappeared are removed.
+  """
+  
+  def __init__(self, path, version):
+    self.path = path
+    self.version = version
+    self.found = os.path.isfile(path)
+    self.previous = {}
+    self.current = {}
+    self.valid = False
+    self.skipped = 0
+    self.kept_paths = set()
+    # The reason the manifest couldn't be read, if it couldn't.
+    self.error = None
+    if self.found:
+      try:
+        with open(path, 'r') as f:
+          data = json.load(f)
+        if not isinstance(data, dict):
+          raise ValueError("expected an object, not " + type(data).__name__)
+      except ValueError as e:
+        # A build that was interrupted while saving leaves a truncated
+        # manifest.  Every page is outdated then, and stale pages are
+        # found the way they are without a manifest.
+        self.error = e
+        self.found = False
+        return
+      self.previous = data.get("types", {})
+      self.valid = data.get("version") == version
+      
+  def is_current(self, anchor, digest, path, member_paths=()):
+    entry = self.previous.get(anchor)
+    return (self.valid and entry != None and
+            entry["hash"] == digest and entry["path"] == path and
+            entry.get("members", []) == list(member_paths) and
+            all(os.path.isfile(p) for p in [path] + list(member_paths)))
+            
+  def record(self, anchor, digest, path, member_paths=()):
+    entry = {"hash": digest, "path": path}
+    if len(member_paths) > 0:
+      entry["members"] = list(member_paths)
+    self.current[anchor] = entry
+    
+  def get_paths(self, entries):
+    paths = set()
+    for entry in entries:
+      paths.add(entry["path"])
+      paths.update(entry.get("members", []))
+    return paths
+    
+  def keep(self, anchor, path):
+    """
+    Carries over the entry of a type that isn't being generated in this
+    build, so that its page is neither removed nor regenerated later
+    unless the type changes.  Entries of a manifest for another generator
+    version or mode aren't carried over, so the next full build
+    regenerates the page.
+    """
+    entry = self.previous.get(anchor)
+    if self.valid and entry != None:
+      self.current[anchor] = entry
+    self.kept_paths.add(path)
+    
+  def remove_stale(self):
+    if self.found:
+      old_paths = self.get_paths(self.previous.values())
+    else:
+      # No manifest yet, so find whatever an earlier build left behind.
+      old_paths = set(glob.glob("*/api/*.gen.rst") + glob.glob("_internal/*/api/*.gen.rst"))
+    live_paths = self.get_paths(self.current.values()) | self.kept_paths
+    removed = []
+    for path in sorted(old_paths - live_paths):
+      if os.path.isfile(path):
+        os.remove(path)
+        removed.append(path)
+    return removed
+    
+  def save(self):
+    # Only touch the manifest when something has changed.
+    data = json.dumps({"version": self.version, "types": self.current},
+                      indent=1, sort_keys=True)
+    if os.path.isfile(self.path):
+      with open(self.path, 'r') as f:
+        if f.read() == data:
+          return
+    with open(self.path, 'w') as f:
+      f.write(data)
+      
+def iter_type_records(path):
+  """
+  Reads the documented types from the combined XML at path, yielding a
+  TypeInfo for each one.  The digest of each type is taken from its
+  serialized <Type> element, so it doesn't depend on the compression,
+  or on which file of a shard directory the type was read from.
+  """
+  if os.path.isdir(path):
+    for record in merge_shard_records(path, iter_type_records):
+      yield record
+    return
+  with open_xml(path) as f:
+    for elem in iter_types(f):
+      if elem.get("IsPublic") != "True":
+        continue
+      yield TypeInfo(elem, hashlib.sha1(ET.tostring(elem)).hexdigest())
       
-  path = path + "/" + normalize_name_to_filename(name) + ".gen"
-  generate_doc_at_path(app, elem, path + ".rst")
+def iter_outdated_types(records, manifest, store=None, selection=None, threshold=None):
+  """
+  Filters the types down to those whose page needs to be generated,
+  yielding each one with its page path.  If a store is given, every
+  documented type is added to it, including those that are skipped.
+  Types outside the selection, if there is one, are left out entirely.
+  Without a manifest, the pages are known to be up to date, and nothing
+  is yielded.  Types with more members than threshold also have member
+  pages, which must exist for the type to be skipped.
+  """
+  for info in records:
+    build_metrics.count("types")
+    build_metrics.count("members", len(info.fields) + len(info.properties) + len(info.methods))
+    path = get_type_doc_path(info)
+    if selection != None and not selection.includes(info):
+      if manifest != None:
+        manifest.keep(info.anchor, path)
+      exclude_type(info, path)
+      continue
+    if store != None:
+      store[info.anchor] = info
+    type_pages[info.anchor] = (info.name, info.kind, info.namespace, path[:-len(".rst")])
+    type_relations.add(info)
+    if manifest == None:
+      continue
+    member_paths = [member_path for name, members, member_path in
+                    get_member_pages(info, path, threshold)]
+    manifest.record(info.anchor, info.digest, path, member_paths)
+    if manifest.is_current(info.anchor, info.digest, path, member_paths):
+      manifest.skipped += 1
+      continue
+    yield info, path
+  
+class ModuleSelection(object):
+  """
+  The modules chosen with netxml_modules, by the directory names that
+  their pages are generated under.
+  """
+  
+  def __init__(self, modules):
+    self.modules = set(normalize_name_to_filename(module.strip()) for module in modules)
+    self.seen = set()
+    self.excluded = set()
+    
+  def includes(self, info):
+    module = get_type_module(info)
+    self.seen.add(module)
+    if module in self.modules:
+      return True
+    self.excluded.add(module)
+    return False
+    
+  def get_exclude_patterns(self):
+    patterns = []
+    for module in sorted(self.excluded):
+      patterns.append(module + "/api/*")
+      patterns.append("_internal/" + module + "/api/*")
+    return patterns
+    
+def get_module_selection(app):
+  """
+  Returns the modules to build from the NETXML_MODULES environment
+  variable, a comma separated list, or failing that netxml_modules.
+  Returns None if every module is to be built.
+  """
+  modules = os.environ.get('NETXML_MODULES')
+  if modules == None:
+    modules = app.config.netxml_modules
+  if modules == None:
+    return None
+  if not isinstance(modules, (list, tuple)):
+    modules = modules.split(",")
+  modules = [module for module in modules if module.strip() != ""]
+  if len(modules) == 0:
+    return None
+  return ModuleSelection(modules)
+  
+def exclude_type(info, path):
+  build_metrics.count("types_excluded")
+  excluded_docnames.add(path[:-len(".rst")])
+  excluded_labels.add(ws_re.sub(' ', info.anchor.lower()))
+  for member in info.fields + info.properties + info.methods:
+    if member.anchor != None:
+      excluded_labels.add(ws_re.sub(' ', member.anchor.lower()))
+      
+def resolve_excluded_xref(app, env, node, contnode):
+  """
+  Resolves references to types left out by netxml_modules, and to their
+  members and pages, to a placeholder instead of a dangling reference.
+  """
+  role = node.get('refdomain', '') + ":" + node.get('reftype', '')
+  target = node.get('reftarget', '')
+  if role == "std:ref":
+    excluded = target in excluded_labels
+  elif role in ("dotnet:type", "dotnet:method"):
+    excluded = ws_re.sub(' ', target.lower()) in excluded_labels
+  elif role == "std:doc":
+    excluded = docname_join(node.get('refdoc', ''), target) in excluded_docnames
+  else:
+    excluded = False
+  if not excluded:
+    return None
+  build_metrics.count("xrefs_excluded")
+  placeholder = nodes.inline('', '', classes=['dotnet-excluded'])
+  placeholder += contnode
+  return placeholder
+  
+def resolve_external_xref(app, env, node, contnode):
+  """
+  Links references to types outside Protogame, and to their members, to
+  the external documentation in external_types.
+  """
+  role = node.get('refdomain', '') + ":" + node.get('reftype', '')
+  if not role in ("std:ref", "dotnet:type", "dotnet:method"):
+    return None
+  label = ws_re.sub(' ', node.get('reftarget', '').lower())
+  url = external_types.urls.get(label)
+  if url == None:
+    # A member of an external type links to the type.
+    target = label.split("(")[0]
+    if "." in target:
+      url = external_types.urls.get(target[:target.rindex(".")])
+  if url == None and role == "dotnet:type":
+    # Field types give just the name of the type.
+    url = external_types.get_name_url(node.get('reftarget', ''))
+  if url == None:
+    return None
+  build_metrics.count("xrefs_external")
+  reference = nodes.reference('', '', internal=False, refuri=url, classes=['dotnet-external'])
+  reference += contnode
+  return reference
+  
+def iter_external_references(records, table):
+  for info in records:
+    table.add_type(info)
+    yield info
+    
+def load_external_types(app):
+  """
+  Returns the external type URLs given by netxml_external_types, a JSON
+  file mapping type anchors to URLs, which take precedence over the
+  URLs computed from netxml_external_urls.
+  """
+  path = app.config.netxml_external_types
+  if path == None:
+    return {}
+  try:
+    with open(os.path.join(app.confdir, path), 'r') as f:
+      return json.load(f)
+  except (IOError, OSError, ValueError) as e:
+    raise ExtensionError("unable to load netxml_external_types from " + path + ": " + str(e))
+    
+def get_file_digest(path):
+  digest = hashlib.sha1()
+  with open(path, 'rb') as f:
+    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+      digest.update(chunk)
+  return digest.hexdigest()
+  
+def get_source_stat(source):
+  """
+  Returns the size and modification time of the XML at source, or lists
+  of them, one per shard, if source is a shard directory.
+  """
+  if not os.path.isdir(source):
+    stat = os.stat(source)
+    return stat.st_size, stat.st_mtime
+  stats = [(os.path.basename(shard), os.stat(shard)) for shard in get_xml_shards(source)]
+  return [[name, stat.st_size] for name, stat in stats], [stat.st_mtime for name, stat in stats]
+  
+def get_source_digest(source):
+  if not os.path.isdir(source):
+    return get_file_digest(source)
+  digest = hashlib.sha1()
+  for shard in get_xml_shards(source):
+    digest.update((os.path.basename(shard) + " " + get_file_digest(shard) + "\n").encode('utf8'))
+  return digest.hexdigest()
+  
+class ModelCache(object):
+  """
+  Persists the TypeInfo objects read from the combined XML, one pickled
+  record at a time, so later builds can skip parsing the XML.
+  """
+  
+  def __init__(self, path, source):
+    self.path = path
+    self.source = source
+    stat = os.stat(source)
+    self.key = {
+      "version": MODEL_CACHE_VERSION,
+      "size": stat.st_size,
+      "mtime": stat.st_mtime,
+    }
+    
+  def open(self):
+    """
+    Returns the cache file positioned at the first record, or None if
+    there is no cache that is valid for the XML.
+    """
+    if not os.path.isfile(self.path):
+      return None
+    f = open(self.path, 'rb')
+    try:
+      key = pickle.load(f)
+      if (key["version"] == self.key["version"] and key["size"] == self.key["size"] and
+          (key["mtime"] == self.key["mtime"] or key["sha1"] == get_file_digest(self.source))):
+        return f
+    except Exception:
+      pass
+    f.close()
+    return None
+    
+  def iter_records(self, f):
+    with f:
+      while True:
+        record = pickle.load(f)
+        if record == None:
+          return
+        yield record
+        
+  def iter_records_and_save(self, records):
+    key = dict(self.key)
+    key["sha1"] = get_file_digest(self.source)
+    temp_path = self.path + ".tmp"
+    complete = False
+    try:
+      with open(temp_path, 'wb') as f:
+        pickle.dump(key, f, 2)
+        for record in records:
+          pickle.dump(record, f, 2)
+          yield record
+        pickle.dump(None, f, 2)
+      if os.path.exists(self.path):
+        os.remove(self.path)
+      os.rename(temp_path, self.path)
+      complete = True
+    finally:
+      if not complete and os.path.exists(temp_path):
+        os.remove(temp_path)
+  
+def get_shard_cache_path(shard):
+  return os.path.join(MODEL_SHARD_CACHE_PATH, os.path.basename(shard) + ".cache")
+  
+def parse_shard_in_worker(shard):
+  """
+  Runs in a parsing worker process, caching the model of one shard for
+  the parent to read.
+  """
+  try:
+    cache = ModelCache(get_shard_cache_path(shard), shard)
+    for record in cache.iter_records_and_save(iter_type_records(shard)):
+      pass
+    return None
+  except Exception:
+    return traceback.format_exc()
+    
+def merge_shard_records(source, iter_shard, log=None):
+  """
+  Chains the records of every shard in the directory at source, as read
+  by iter_shard.  Types are merged by anchor: if more than one shard
+  documents a type, the first shard's documentation of it is used.
+  """
+  shard_names = {}
+  for shard in get_xml_shards(source):
+    name = os.path.basename(shard)
+    for record in iter_shard(shard):
+      if record.anchor in shard_names:
+        if log != None:
+          log("netxml: " + record.anchor + " is documented in both " + shard_names[record.anchor] +
+              " and " + name + "; using " + shard_names[record.anchor])
+        continue
+      shard_names[record.anchor] = name
+      yield record
+      
+def load_shard_records(app, source, jobs):
+  """
+  Returns the records of the shard directory at source, along with the
+  number of shards parsed.  Only the shards whose cached model is out of
+  date are parsed, concurrently when jobs is greater than one; the rest
+  are read from their caches.
+  """
+  shards = get_xml_shards(source)
+  if not os.path.isdir(MODEL_SHARD_CACHE_PATH):
+    os.makedirs(MODEL_SHARD_CACHE_PATH)
+  outdated = []
+  for shard in shards:
+    cache_file = ModelCache(get_shard_cache_path(shard), shard).open()
+    if cache_file == None:
+      outdated.append(shard)
+    else:
+      cache_file.close()
+  live_paths = set(get_shard_cache_path(shard) for shard in shards)
+  for path in glob.glob(os.path.join(MODEL_SHARD_CACHE_PATH, "*.cache")):
+    if not path in live_paths:
+      os.remove(path)
+  for shard in outdated:
+    app.info("parsing .net xml documentation from " + os.path.basename(shard))
+  if jobs > 1 and len(outdated) > 1:
+    import multiprocessing
+    pool = multiprocessing.Pool(min(jobs, len(outdated)))
+    try:
+      errors = pool.map(parse_shard_in_worker, outdated)
+    finally:
+      pool.terminate()
+      pool.join()
+  else:
+    errors = [parse_shard_in_worker(shard) for shard in outdated]
+  for shard, error in zip(outdated, errors):
+    if error != None:
+      raise ExtensionError("unable to read " + shard + ":\n" + error)
+  return merge_shard_records(source, iter_cached_shard_records, app.warn), len(outdated)
+  
+def iter_cached_shard_records(shard):
+  cache = ModelCache(get_shard_cache_path(shard), shard)
+  cache_file = cache.open()
+  if cache_file == None:
+    raise ExtensionError("the model cache of " + shard + " was modified while reading it")
+  return cache.iter_records(cache_file)
+  
+def iter_model_records(source):
+  """
+  Reads the model loaded from source again, from the model cache unless
+  it has gone missing.
+  """
+  if os.path.isdir(source):
+    return merge_shard_records(source, iter_cached_shard_records)
+  cache = ModelCache(MODEL_CACHE_PATH, source)
+  cache_file = cache.open()
+  if cache_file != None:
+    return cache.iter_records(cache_file)
+  return iter_type_records(source)
+  
+def process_type_in_worker(info, path, threshold):
+  """
+  Runs in a generation worker process.  Nothing is logged from here; the
+  parent reports the result so that output stays in document order.
+  """
+  try:
+    return info.full_name, write_type_docs(info, path, threshold, False), None
+  except Exception:
+    return info.full_name, [], traceback.format_exc()
+  
+def process_types_in_parallel(app, types, jobs):
+  import multiprocessing
+  pool = multiprocessing.Pool(jobs)
+  pending = collections.deque()
+  threshold = get_split_members(app)
+  
+  def complete(limit):
+    while len(pending) > limit:
+      full_name, written, error = pending.popleft().get()
+      if error != None:
+        raise ExtensionError("unable to generate documentation for " + full_name + ":\n" + error)
+      record_type_docs(app, full_name, written)
+  
+  try:
+    for info, path in types:
+      pending.append(pool.apply_async(process_type_in_worker, (info, path, threshold)))
+      # Keep a bounded number of types in flight so memory stays proportional
+      # to the worker count and not to the size of the XML.
+      complete(jobs * 4)
+    complete(0)
+  finally:
+    pool.terminate()
+    pool.join()
+  
+def get_generate_jobs(app):
+  import multiprocessing
+  jobs = app.config.netxml_generate_jobs
+  if jobs == 'auto':
+    # Starting the pool and passing it the pages costs more than it saves
+    # unless there are more than two CPUs.
+    cpus = multiprocessing.cpu_count()
+    return cpus if cpus > 2 else 1
+  return max(int(jobs), 1)
+  
+def get_split_members(app):
+  """
+  Returns netxml_split_members as a number, which it isn't when it's set on
+  the command line.
+  """
+  threshold = app.config.netxml_split_members
+  if threshold == None:
+    return None
+  try:
+    threshold = int(threshold)
+  except (TypeError, ValueError):
+    threshold = -1
+  if threshold < 0:
+    raise ExtensionError("netxml_split_members must be None or a number of members, not " +
+                         repr(app.config.netxml_split_members))
+  return threshold
+  
+def iter_types(source):
+  """
+  Incrementally parses the combined XML documentation, yielding each
+  top-level <Type> element once it has been fully read.  The element is
+  cleared after the caller is done with it, so peak memory depends on the
+  largest single type rather than on the whole document.
+  """
+  root = None
+  depth = 0
+  for event, elem in ET.iterparse(source, events=('start', 'end')):
+    if event == 'start':
+      if root == None:
+        root = elem
+      depth += 1
+      continue
+    depth -= 1
+    if depth == 1 and elem.tag == "Type":
+      # Whether the trailing whitespace has been read yet depends on where the
+      # parser's buffer boundaries fall, so drop it to keep the serialized
+      # element stable between builds.
+      elem.tail = None
+      yield elem
+      elem.clear()
+      root.clear()
+  
+def get_xml_shards(path):
+  """
+  Returns the XML files in the shard directory at path, in the order that
+  they are read.
+  """
+  shards = []
+  for name in sorted(os.listdir(path)):
+    for suffix in netxml_fetch.COMPRESSION_SUFFIXES:
+      if name.endswith('.xml' + suffix) and os.path.isfile(os.path.join(path, name)):
+        shards.append(os.path.join(path, name))
+        break
+  return shards
+  
+def find_xml():
+  """
+  Returns the path of the shard directory if there is one, or otherwise
+  of the combined XML, which may be compressed with gzip or xz, or None
+  if it hasn't been fetched.
+  """
+  if os.path.isdir(XML_SHARD_PATH) and len(get_xml_shards(XML_SHARD_PATH)) > 0:
+    return XML_SHARD_PATH
+  for suffix in netxml_fetch.COMPRESSION_SUFFIXES:
+    if os.path.isfile(XML_PATH + suffix):
+      return XML_PATH + suffix
+  return None
+  
+def open_xml(path):
+  """
+  Opens the combined XML for reading, decompressing it as it is read so
+  that an uncompressed copy never has to be written out.
+  """
+  suffix = netxml_fetch.get_compression_suffix(path)
+  if suffix == '.gz':
+    return gzip.open(path, 'rb')
+  if suffix == '.xz':
+    try:
+      import lzma
+    except ImportError:
+      raise ExtensionError("reading " + path + " requires the lzma module (Python 3.3 or later)")
+    return lzma.open(path, 'rb')
+  return open(path, 'rb')
+  
+def needs_fetch():
+  return find_xml() == None or os.path.isfile(ANCESTOR_MARKER_PATH)
+  
+def get_fetch_settings(config):
+  return {
+    "cache_dir": config.netxml_artifact_cache,
+    "artifact_url": config.netxml_artifact_url,
+    "trigger_url": config.netxml_build_trigger_url,
+  }
+  
+def start_fetch(settings):
+  # Don't block on the build server if we already have an ancestor's XML.
+  return netxml_fetch.BackgroundFetch(XML_PATH, wait=find_xml() == None, **settings)
+  
+def describe_fetch(fetch, waited, timed_out):
+  result = fetch.result
+  return {
+    "commit": fetch.commit,
+    "served_commit": result.served_commit if result != None else None,
+    "source": result.source if result != None else None,
+    "seconds": round((fetch.finished or time.time()) - fetch.started, 3),
+    "waited": round(waited, 3),
+    "timed_out": timed_out,
+    "events": fetch.get_events(),
+  }
+  
+def fetch_xml(app):
+  """
+  Fetches the combined XML for the current commit, waiting for the fetch
+  that setup() started unless the settings have since been overridden.
+  Progress is reported as the fetch goes, and the build gives up after
+  netxml_fetch_timeout seconds.  If the current commit hasn't been built
+  yet, the XML of its nearest built ancestor is used, and the fetch is
+  retried on the next build.
+  """
+  global pending_fetch
+  fetch = pending_fetch
+  pending_fetch = None
+  settings = get_fetch_settings(app.config)
+  if fetch == None or fetch.settings != settings:
+    if fetch != None:
+      fetch.cancel()
+    fetch = start_fetch(settings)
+  have_xml = not fetch.wait
+  timeout = app.config.netxml_fetch_timeout
+  if timeout != None:
+    # Values given with -D are strings.
+    timeout = float(timeout)
+  wait_start = time.time()
+  reported = 0
+  while True:
+    finished = fetch.join(0.5)
+    events = fetch.get_events(reported)
+    for event in events:
+      app.info("fetching .net xml documentation [%.1fs] %s" % (event["elapsed"], event["message"]))
+    reported += len(events)
+    if finished:
+      break
+    if timeout != None and time.time() - fetch.started >= timeout:
+      # The fetch carries on, but mustn't replace the XML while it is read.
+      fetch.cancel()
+      build_metrics.fetch = describe_fetch(fetch, time.time() - wait_start, True)
+      message = "timed out after " + str(timeout) + "s fetching .net xml documentation"
+      if reported > 0:
+        message += " (last: " + fetch.get_events(reported - 1)[0]["message"] + ")"
+      if have_xml:
+        app.warn(message + "; using the existing copy")
+        return
+      raise ExtensionError(message)
+  build_metrics.fetch = describe_fetch(fetch, time.time() - wait_start, False)
+  if fetch.error != None:
+    if have_xml:
+      app.warn("unable to fetch .net xml documentation (" + str(fetch.error) + "); " +
+               "using the existing copy")
+      return
+    if fetch.commit == None:
+      raise ExtensionError("Protogame.combined.xml is missing, and the current commit " + 
+                           "could not be determined to fetch it")
+    raise ExtensionError("unable to fetch .net xml documentation for " + fetch.commit + ": " +
+                         str(fetch.error))
+  result = fetch.result
+  if result == None:
+    if have_xml:
+      app.warn("unable to fetch .net xml documentation; using the existing copy")
+      return
+    raise ExtensionError("unable to fetch .net xml documentation for " + 
+                         "the current commit or any of its ancestors")
+  app.info("fetched .net xml documentation for " + result.served_commit + " from " + result.source +
+           " in %.2fs" % (fetch.finished - fetch.started))
+  if result.is_exact:
+    if os.path.isfile(ANCESTOR_MARKER_PATH):
+      os.remove(ANCESTOR_MARKER_PATH)
+  else:
+    with open(ANCESTOR_MARKER_PATH, 'w') as f:
+      f.write(result.served_commit)
+    app.warn("documentation for " + result.commit + " has not been built yet; " + 
+             "using the documentation from " + result.served_commit)
+  
+def get_generation_version(app):
+  version = str(GENERATOR_VERSION)
+  if app.config.netxml_autotype:
+    version += "-autotype"
+  threshold = get_split_members(app)
+  if threshold != None:
+    version += "-split" + str(threshold)
+  return version
+  
+class GenerationStamp(object):
+  """
+  Records the XML and settings that the pages were last generated with,
+  so that Sphinx builds after python -m netxml generate leave the pages
+  alone, and can run side by side.  Like the model cache, the XML is
+  compared by size and modification time, falling back to its hash.
+  """
+  
+  def __init__(self, path, source, version, selection):
+    self.path = path
+    self.source = source
+    size, mtime = get_source_stat(source)
+    self.data = {
+      "version": version,
+      "modules": sorted(selection.modules) if selection != None else None,
+      "size": size,
+      "mtime": mtime,
+    }
+    
+  def is_current(self):
+    if not os.path.isfile(self.path) or not os.path.isfile(MANIFEST_PATH):
+      return False
+    try:
+      with open(self.path, 'r') as f:
+        stamp = json.load(f)
+    except (IOError, OSError, ValueError):
+      return False
+    for key in ("version", "modules", "size"):
+      if stamp.get(key) != self.data[key]:
+        return False
+    return stamp.get("mtime") == self.data["mtime"] or stamp.get("sha1") == get_source_digest(self.source)
+    
+  def save(self):
+    data = dict(self.data)
+    data["sha1"] = get_source_digest(self.source)
+    with open(self.path, 'w') as f:
+      json.dump(data, f, indent=1, sort_keys=True)
+      
+  def remove(self):
+    if os.path.isfile(self.path):
+      os.remove(self.path)
+  
+def load_types(app, source, selection, generate):
+  """
+  Loads the model from the XML at source, filling in the stores that the
+  directives and handlers use.  If generate is true, the pages of types
+  that changed since the last generation are generated too, and those of
+  types that no longer exist are removed.  This is shared by the Sphinx
+  build and python -m netxml generate.
+  """
+  global model_source, type_pages_digest, type_relations, external_types
+  start = time.time()
+  model_source = source
+  jobs = get_generate_jobs(app)
+  if os.path.isdir(source):
+    app.info("loading .net xml documentation from " + source)
+    records, shards_parsed = load_shard_records(app, source, jobs)
+    build_metrics.count("shards_parsed", shards_parsed)
+    model = "parsed" if shards_parsed > 0 else "cached"
+  else:
+    cache = ModelCache(MODEL_CACHE_PATH, source)
+    cache_file = cache.open()
+    if cache_file != None:
+      app.info("loading .net xml documentation from cache")
+      records = cache.iter_records(cache_file)
+    else:
+      app.info("loading .net xml documentation")
+      records = cache.iter_records_and_save(iter_type_records(cache.source))
+    model = "cached" if cache_file != None else "parsed"
+  autotype = app.config.netxml_autotype
+  type_store.clear()
+  type_pages.clear()
+  type_relations = TypeRelations()
+  excluded_labels.clear()
+  excluded_docnames.clear()
+  manifest = GenerationManifest(MANIFEST_PATH, get_generation_version(app)) if generate else None
+  if manifest != None and manifest.error != None:
+    app.warn("unable to read " + MANIFEST_PATH + " (" + str(manifest.error) + "); regenerating every page")
+  external_types = ExternalTypeTable(app.config.netxml_external_urls)
+  records = iter_external_references(records, external_types)
+  types = iter_outdated_types(records, manifest, type_store if autotype else None, selection,
+                              get_split_members(app))
+  if not generate:
+    # Nothing is yielded without a manifest; this just reads the records.
+    for info, path in types:
+      pass
+  elif autotype:
+    # Pages are only small stubs in this mode, so they are not worth
+    # handing to a worker pool.
+    for info, path in types:
+      generation_start = time.time()
+      generate_autotype_doc_at_path(app, info, path)
+      build_metrics.add_time("generation", time.time() - generation_start)
+  elif jobs > 1:
+    app.info("generating documentation with " + str(jobs) + " workers")
+    # Reading the records overlaps with the workers, so this includes it.
+    generation_start = time.time()
+    process_types_in_parallel(app, types, jobs)
+    build_metrics.add_time("generation", time.time() - generation_start)
+  else:
+    for info, path in types:
+      generation_start = time.time()
+      generate_doc_at_path(app, info, path)
+      build_metrics.add_time("generation", time.time() - generation_start)
+  if generate:
+    for path in manifest.remove_stale():
+      build_metrics.count("pages_removed")
+      app.info("removing documentation for removed class... " + path)
+    manifest.save()
+    build_metrics.count("pages_skipped", manifest.skipped)
+  external_types.build(load_external_types(app))
+  type_pages_digest = hashlib.sha1(json.dumps(sorted(type_pages.items())).encode('utf8')).hexdigest()
+  if selection != None:
+    for module in sorted(selection.modules - selection.seen):
+      app.warn("netxml_modules: no .net types in module '" + module + "' (modules are " +
+               ", ".join(sorted(selection.seen)) + ")")
+    build_metrics.modules = sorted(selection.modules)
+  build_metrics.model = model
+  build_metrics.add_time("load_xml", time.time() - start)
+  if type_display.misses > 0:
+    app.info(type_display.describe_cache())
+  app.info("loaded .net xml documentation (" + str(build_metrics.counters["types"]) + " types, " +
+           (str(build_metrics.counters["pages_skipped"]) + " unchanged, " if generate else "") +
+           model + ") in %.2fs" % (time.time() - start))
   
 def load_xml(app):
-  global dotnet_docs
-  import subprocess, os
+  global build_metrics, loaded_stamp
+  build_metrics = BuildMetrics()
   app.info("current working directory " + os.getcwd())
-  if not os.path.isfile('../Protogame.Docs/Protogame.combined.xml'):
-    app.info("running pre-build...")
-    p = subprocess.Popen(['bash', 'build.sh'], cwd='../Protogame.Docs/_ext')
-    p.wait()
-  app.info("loading .net xml documentation")
-  with open('../Protogame.Docs/Protogame.combined.xml', 'r') as content_file:
-    content = content_file.read()
-  dotnet_docs = ET.fromstring(content)
-  app.info("loaded .net xml documentation")
-  for elem in dotnet_docs.findall("./Type"):
-    process_type(app, elem)
+  if needs_fetch():
+    fetch_start = time.time()
+    fetch_xml(app)
+    build_metrics.add_time("fetch", time.time() - fetch_start)
+  source = find_xml()
+  selection = get_module_selection(app)
+  stamp = GenerationStamp(GENERATION_STAMP_PATH, source, get_generation_version(app), selection)
+  if stamp.is_current():
+    if loaded_stamp == stamp.data:
+      app.info(".net api pages are up to date; using the loaded model")
+    else:
+      app.info(".net api pages are up to date")
+      load_types(app, source, selection, False)
+  else:
+    # If generation fails part way, the pages must be generated again.
+    loaded_stamp = None
+    stamp.remove()
+    load_types(app, source, selection, True)
+    stamp.save()
+  loaded_stamp = stamp.data
+  if selection != None:
+    # The pages of the other modules are kept, but not read.  python -m
+    # netxml watch loads the XML without Sphinx, which excludes them when
+    # it loads the XML again.
+    if hasattr(app.config, 'exclude_patterns'):
+      app.config.exclude_patterns = list(app.config.exclude_patterns) + selection.get_exclude_patterns()
+    app.info("building the .net documentation of " + ", ".join(sorted(selection.modules)) +
+             " only (" + str(build_metrics.counters["types_excluded"]) + " types excluded)")
   
+# The configuration values, as (name, default, rebuild, types), which are
+# also the defaults for python -m netxml generate.
+CONFIG_VALUES = [
+  ('netxml_generate_jobs', 1, 'env', [int, str]),
+  ('netxml_autotype', False, 'env', ()),
+  ('netxml_artifact_url', netxml_fetch.DEFAULT_ARTIFACT_URL, '', ()),
+  ('netxml_build_trigger_url', netxml_fetch.DEFAULT_TRIGGER_URL, '', ()),
+  ('netxml_artifact_cache', None, '', [str]),
+  ('netxml_fetch_timeout', None, '', [int, float, str]),
+  ('netxml_metrics_path', METRICS_PATH, '', [str]),
+  ('netxml_search_shards', None, 'html', [str]),
+  ('netxml_search_prefix_length', 2, 'html', ()),
+  ('netxml_index_page_size', INDEX_PAGE_SIZE, 'html', ()),
+  ('netxml_modules', None, '', [list, str]),
+  ('netxml_external_urls', EXTERNAL_URLS, 'html', ()),
+  ('netxml_external_types', None, 'html', [str]),
+  ('netxml_sqlite_path', None, '', [str]),
+  ('netxml_split_members', None, 'env', [int, str]),
+]
+
+def get_conf_value(app, name):
+  """
+  Returns a configuration value as conf.py or the command line sets it,
+  for use before the configuration values are initialised.
+  """
+  overrides = getattr(app.config, 'overrides', {})
+  if name in overrides:
+    return overrides[name]
+  return getattr(app.config, '_raw_config', {}).get(name)
+
 def setup(app):
+  global pending_fetch
   app.add_domain(DotNetDomain)
   
+  for name, default, rebuild, types in CONFIG_VALUES:
+    app.add_config_value(name, default, rebuild, types)
+  
+  add_static_file(app, 'netxml.css')
+  if get_conf_value(app, 'netxml_search_shards') != None:
+    add_static_file(app, 'netxml-search.js')
+  
   app.connect('builder-inited', load_xml)
+  app.connect('builder-inited', setup_static_files)
+  app.connect('builder-inited', setup_search_shards)
+  app.connect('env-before-read-docs', begin_reading)
+  app.connect('env-get-outdated', find_outdated_api_indices)
+  app.connect('env-purge-doc', purge_env_metrics)
+  app.connect('env-purge-doc', purge_dependencies)
+  app.connect('doctree-read', count_pending_xrefs)
+  app.connect('env-merge-info', merge_env_metrics)
+  app.connect('env-merge-info', merge_dependencies)
+  app.connect('env-get-updated', find_dependent_docs)
+  app.connect('env-updated', end_reading)
+  app.connect('env-updated', create_type_indices)
+  app.connect('missing-reference', resolve_missing_reference)
+  app.connect('build-finished', write_search_shards)
+  app.connect('build-finished', write_sqlite)
+  app.connect('build-finished', write_metrics)
+  
+  if needs_fetch():
+    # The configuration values aren't initialised until every extension has
+    # been set up, so these are read as conf.py sets them; fetch_xml starts
+    # again if they are overridden on the command line.
+    raw_config = getattr(app.config, '_raw_config', {})
+    pending_fetch = start_fetch(get_fetch_settings(CommandLineConfig(dict(
+      (name, raw_config.get(name, default)) for name, default, rebuild, types in CONFIG_VALUES))))
   
-  return {'version': '0.1'}
+  return {
+    'version': '0.1',
+    'parallel_read_safe': True,
+    'parallel_write_safe': True,
+  }
 
+class CommandLineConfig(object):
+  
+  def __init__(self, values):
+    self.__dict__.update(values)
+    
+class CommandLineApp(object):
+  """
+  Stands in for the Sphinx application when the pages are generated from
+  the command line.  Configuration values not given are the defaults.
+  """
+  
+  def __init__(self, values={}, verbose=False):
+    config = dict((name, default) for name, default, rebuild, types in CONFIG_VALUES)
+    config.update(values)
+    self.config = CommandLineConfig(config)
+    self.confdir = os.getcwd()
+    self.verbose = verbose
+    
+  def info(self, message):
+    if self.verbose:
+      sys.stdout.write(message + "\n")
+      
+  def warn(self, message):
+    sys.stderr.write("WARNING: " + message + "\n")
+    
+def read_conf_values(path):
+  """
+  Returns the netxml configuration values set in a Sphinx conf.py.
+  """
+  namespace = {'__file__': os.path.abspath(path)}
+  with open(path, 'rb') as f:
+    code = compile(f.read(), path, 'exec')
+  exec(code, namespace)
+  return dict((name, value) for name, value in namespace.items() if name.startswith('netxml_'))
+  
+def main(argv):
+  import argparse
+  parser = argparse.ArgumentParser(prog='python -m netxml',
+                                   description='Generate the .NET API documentation pages.')
+  commands = parser.add_subparsers(dest='command')
+  generate = commands.add_parser(
+    'generate', help='generate the API pages from the combined XML',
+    description='Generates the API pages the way the Sphinx build would, so that ' +
+                'the builds that follow find them up to date.  Settings not given ' +
+                'are read from conf.py in the output directory.')
+  generate.add_argument('--xml', help='the combined XML or a directory of shards (default: what the Sphinx build uses)')
+  generate.add_argument('--out', default='.', help='the documentation source directory (default: .)')
+  generate.add_argument('--jobs', help="worker processes, or 'auto'")
+  generate.add_argument('--autotype', dest='autotype', action='store_true', default=None,
+                        help='generate dotnet:autotype stubs')
+  generate.add_argument('--no-autotype', dest='autotype', action='store_false',
+                        help='generate full pages')
+  generate.add_argument('--modules', help='comma separated modules to generate')
+  generate.add_argument('--check', action='store_true',
+                        help='only check whether the pages are up to date (exit status 2 if not)')
+  generate.add_argument('--verbose', '-v', action='store_true', help='list every page written')
+  watch = commands.add_parser(
+    'watch', help='rebuild the documentation whenever the XML or the RST changes',
+    description='Keeps the API model loaded, and whenever the combined XML or a ' +
+                'handwritten page changes, regenerates the pages of the types that ' +
+                'changed and runs an incremental Sphinx build in the same process.')
+  watch.add_argument('--out', default='.', help='the documentation source directory (default: .)')
+  watch.add_argument('--builder', '-b', default='html', help='the Sphinx builder (default: html)')
+  watch.add_argument('--build-dir', default='_build', help='the build directory (default: _build)')
+  watch.add_argument('--jobs', '-j', type=int, default=1, help='parallel Sphinx processes')
+  watch.add_argument('--interval', type=float, default=1.0, help='seconds between checks')
+  watch.add_argument('--verbose', '-v', action='store_true', help='show the Sphinx output')
+  args = parser.parse_args(argv)
+  if args.command == 'watch':
+    if not os.path.isdir(args.out):
+      sys.stderr.write("error: " + args.out + " is not a directory\n")
+      return 1
+    os.chdir(args.out)
+    return watch_sources(args.builder, args.build_dir, args.jobs, args.interval, args.verbose)
+  if args.command != 'generate':
+    parser.print_usage()
+    return 1
+  
+  def error(message):
+    sys.stderr.write("error: " + message + "\n")
+    return 1
+    
+  source = os.path.abspath(args.xml) if args.xml != None else None
+  if not os.path.isdir(args.out):
+    return error(args.out + " is not a directory")
+  os.chdir(args.out)
+  values = {}
+  if os.path.isfile('conf.py'):
+    try:
+      values = read_conf_values('conf.py')
+    except Exception as e:
+      return error("unable to read conf.py: " + str(e))
+  if args.jobs != None:
+    values['netxml_generate_jobs'] = args.jobs
+  if args.autotype != None:
+    values['netxml_autotype'] = args.autotype
+  if args.modules != None:
+    values['netxml_modules'] = args.modules
+    os.environ.pop('NETXML_MODULES', None)
+  app = CommandLineApp(values, args.verbose)
+  if source == None:
+    source = find_xml()
+    if source == None:
+      return error("no combined XML found; fetch it with netxml_fetch.py or pass --xml")
+  elif not os.path.exists(source):
+    return error(source + " does not exist")
+  
+  global build_metrics
+  build_metrics = BuildMetrics()
+  selection = get_module_selection(app)
+  stamp = GenerationStamp(GENERATION_STAMP_PATH, source, get_generation_version(app), selection)
+  if args.check:
+    if stamp.is_current():
+      sys.stdout.write("api pages are up to date\n")
+      return 0
+    sys.stdout.write("api pages need to be generated\n")
+    return 2
+  
+  stamp.remove()
+  try:
+    load_types(app, source, selection, True)
+  except (ExtensionError, IOError, OSError, ET.ParseError) as e:
+    return error(str(e))
+  stamp.save()
+  counters = build_metrics.counters
+  summary = (str(counters["types"]) + " types: " + str(counters["pages_written"]) + " pages written, " +
+             str(counters["pages_unchanged"] + counters["pages_skipped"]) + " unchanged, " +
+             str(counters["pages_removed"]) + " removed")
+  if selection != None:
+    summary += ", " + str(counters["types_excluded"]) + " in other modules"
+  sys.stdout.write(summary + " (%.2fs)\n" % (time.time() - build_metrics.start))
+  return 0
+  
+def get_source_mtimes(exclude):
+  """
+  Returns the modification times of conf.py and the handwritten pages in
+  the current directory, leaving out generated pages and the excluded
+  directories.
+  """
+  mtimes = {}
+  for root, dirs, files in os.walk('.'):
+    dirs[:] = [d for d in dirs if not d.startswith('.') and
+               not os.path.abspath(os.path.join(root, d)) in exclude]
+    for name in files:
+      if name == 'conf.py' or (name.endswith('.rst') and not name.endswith('.gen.rst')):
+        path = os.path.join(root, name)
+        try:
+          mtimes[path] = os.path.getmtime(path)
+        except OSError:
+          pass
+  return mtimes
+  
+def get_xml_state():
+  source = find_xml()
+  if source == None:
+    return None
+  return source, get_source_stat(source)
+  
+def build_in_process(builder, build_dir, jobs, verbose):
+  from sphinx.application import Sphinx
+  app = Sphinx('.', '.', os.path.join(build_dir, builder), os.path.join(build_dir, 'doctrees'),
+               builder, status=sys.stdout if verbose else None, parallel=jobs)
+  app.build()
+  return app.statuscode
+  
+def watch_sources(builder, build_dir, jobs, interval, verbose):
+  """
+  Rebuilds the documentation in the current directory whenever the XML
+  or a handwritten page changes, until interrupted.  The model stays
+  loaded between builds, so only a change to the XML loads it again,
+  and then only the pages of the types that changed are rewritten.
+  """
+  app = CommandLineApp(read_conf_values('conf.py') if os.path.isfile('conf.py') else {}, verbose)
+  exclude = set([os.path.abspath(build_dir)])
+  xml_state = None
+  mtimes = None
+  sys.stdout.write("watching " + os.getcwd() + " (press Ctrl+C to stop)\n")
+  try:
+    while True:
+      current_xml = get_xml_state()
+      current_mtimes = get_source_mtimes(exclude)
+      if current_xml == xml_state and current_mtimes == mtimes:
+        time.sleep(interval)
+        continue
+      if xml_state != None and current_xml != xml_state:
+        # Wait for the XML to be completely written.
+        time.sleep(interval)
+        if get_xml_state() != current_xml:
+          continue
+      start = time.time()
+      summary = []
+      try:
+        if current_xml != xml_state:
+          load_xml(app)
+          counters = build_metrics.counters
+          summary.append(str(counters["pages_written"]) + " api pages written, " +
+                         str(counters["pages_removed"]) + " removed")
+          current_xml = get_xml_state()
+        status = build_in_process(builder, build_dir, jobs, verbose)
+        summary.append("build " + ("succeeded" if status == 0 else "failed"))
+      except Exception:
+        traceback.print_exc()
+        summary.append("build failed")
+      xml_state, mtimes = current_xml, current_mtimes
+      sys.stdout.write(time.strftime("%H:%M:%S") + " " + "; ".join(summary) +
+                       " in %.2fs\n" % (time.time() - start))
+      sys.stdout.flush()
+  except KeyboardInterrupt:
+    return 0
+  
+if __name__ == '__main__':
+  # Run from the imported module, so that the model cache holds
+  # netxml.TypeInfo records that Sphinx can load, not __main__ ones.
+  import netxml
+  sys.exit(netxml.main(sys.argv[1:]))
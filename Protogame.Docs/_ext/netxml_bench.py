@@ -0,0 +1,597 @@
+"""
+Benchmarks the .NET API documentation pipeline against synthetic
+Protogame.combined.xml files, so that changes to netxml can be measured at
+API sizes larger than the one we ship today.
+
+The synthetic XML follows the schema written by ProtogameDocsTool, including
+the way it names generic types, generic parameters, arrays and by-ref
+parameters, and can be generated on its own:
+
+  python netxml_bench.py generate --types 2000 --members 20 out.xml
+
+A benchmark run times each phase of the pipeline at several sizes and writes
+the results as JSON.  Given a baseline from an earlier run, it exits with a
+non-zero status if any phase has regressed by more than the threshold:
+
+  python netxml_bench.py run --sizes 100,500,2000 --output bench.json
+  python netxml_bench.py run --sizes 100,500,2000 --baseline bench.json
+
+The Sphinx build is timed with -j 1 and again with --sphinx-jobs processes
+(one per CPU by default), and the speedup of reading and writing is
+reported.  Parallel builds only pay off with more than two CPUs: on a
+single CPU, -j 2 read 500 types at 0.84x and wrote them at 0.74x the speed
+of -j 1.
+"""
+
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from xml.sax.saxutils import escape, quoteattr
+
+MODULES = [
+  'core_api', 'physics', 'network', 'graphics', 'graphics_2d', 'graphics_3d', 'audio',
+  'level', 'math', 'ai', 'pooling', 'sensor', 'monogame.framework',
+]
+
+# (Name, Namespace) of the non-generic types that members refer to.
+SIMPLE_TYPES = [
+  ('Void', 'System'), ('Int32', 'System'), ('Int64', 'System'), ('Single', 'System'),
+  ('Double', 'System'), ('Boolean', 'System'), ('String', 'System'), ('Object', 'System'),
+  ('Byte', 'System'), ('TimeSpan', 'System'), ('Vector2', 'Microsoft.Xna.Framework'),
+  ('Vector3', 'Microsoft.Xna.Framework'), ('Matrix', 'Microsoft.Xna.Framework'),
+  ('Color', 'Microsoft.Xna.Framework'), ('IGameContext', 'Protogame'),
+  ('IUpdateContext', 'Protogame'), ('IRenderContext', 'Protogame'), ('IEntity', 'Protogame'),
+]
+
+# (Name, Namespace, number of type arguments) of the generic types that
+# members refer to.
+GENERIC_TYPES = [
+  ('List', 'System.Collections.Generic', 1), ('IEnumerable', 'System.Collections.Generic', 1),
+  ('Dictionary', 'System.Collections.Generic', 2), ('Func', 'System', 2),
+  ('Action', 'System', 1), ('Nullable', 'System', 1), ('IAssetReference', 'Protogame', 1),
+]
+
+ASSEMBLY_SUFFIX = ', mscorlib, Version=4.0.0.0, Culture=neutral, PublicKeyToken=b77a5c561934e089'
+
+class SyntheticType(object):
+  """
+  A type reference, named the way System.Type names it.
+  """
+
+  def __init__(self, name, namespace, full_name, generic_name):
+    self.name = name
+    self.namespace = namespace
+    # None for types that contain generic parameters, as in .NET.
+    self.full_name = full_name
+    # The name used in anchors, as built by GetGenericName.
+    self.generic_name = generic_name
+
+  @property
+  def anchor(self):
+    return self.namespace + "." + self.generic_name
+
+  def make_array(self):
+    # GetGenericName truncates at the backtick, so arrays of generic types
+    # lose both their arguments and their suffix in anchors.
+    if "`" in self.name:
+      generic_name = self.name[:self.name.index("`")]
+    else:
+      generic_name = self.generic_name + "[]"
+    return SyntheticType(self.name + "[]", self.namespace,
+                         self.full_name + "[]" if self.full_name != None else None,
+                         generic_name)
+
+def make_simple_type(name, namespace):
+  return SyntheticType(name, namespace, namespace + "." + name, name)
+
+def make_generic_parameter(name, namespace):
+  return SyntheticType(name, namespace, None, name)
+
+def make_generic_instance(name, namespace, arguments):
+  clr_name = name + "`" + str(len(arguments))
+  if any(argument.full_name == None for argument in arguments):
+    full_name = None
+  else:
+    full_name = (namespace + "." + clr_name + "[" +
+                 ",".join("[" + argument.full_name + ASSEMBLY_SUFFIX + "]" for argument in arguments) + "]")
+  return SyntheticType(clr_name, namespace, full_name,
+                       name + "<" + ", ".join(argument.name for argument in arguments) + ">")
+
+class CombinedXmlGenerator(object):
+  """
+  Writes a synthetic combined XML with a given number of types, members
+  per type and depth of nested generic type arguments.  The output is
+  deterministic for a given seed.
+  """
+
+  def __init__(self, types, members, generic_depth=3, seed=0):
+    self.types = types
+    self.members = members
+    self.generic_depth = generic_depth
+    self.random = random.Random(seed)
+
+  def pick_type(self, depth, parameters=()):
+    r = self.random.random()
+    if parameters and r < 0.15:
+      return self.random.choice(parameters)
+    if depth > 0 and r < 0.45:
+      name, namespace, count = self.random.choice(GENERIC_TYPES)
+      return make_generic_instance(name, namespace, [
+        self.pick_type(depth - 1, parameters) for i in range(count)])
+    result = make_simple_type(*self.random.choice(SIMPLE_TYPES))
+    if r > 0.9:
+      result = result.make_array()
+    return result
+
+  def pick_interface(self, parameters):
+    if self.random.random() < 0.3:
+      return make_generic_instance('IEnumerable', 'System.Collections.Generic', [
+        self.pick_type(self.generic_depth - 1, parameters)])
+    return make_simple_type('IType' + str(self.random.randrange(self.types)), 'Protogame')
+
+  def get_doc(self, text, indent):
+    """
+    Returns documentation text laid out the way ProtogameDocsTool converts
+    it to ReST, including references to other types.
+    """
+    prefix = " " * indent
+    lines = [text, "See :ref:`Protogame.Type" + str(self.random.randrange(self.types)) + "` for details."]
+    if self.random.random() < 0.1:
+      lines += ["", ".. code-block:: csharp", "", "    var value = " + text.split()[0] + "();"]
+    return "\n" + "\n".join(prefix + line if line else "" for line in lines) + "\n" + prefix[:-2]
+
+  def write(self, path):
+    with open(path, 'wb') as f:
+      f.write(b'<?xml version="1.0" encoding="utf-8"?>\n<Types>\n')
+      for index in range(self.types):
+        f.write(self.get_type_xml(index).encode('utf-8'))
+      f.write(b'</Types>')
+
+  def get_type_xml(self, index):
+    random = self.random
+    namespace = 'Protogame'
+    kind = random.choice(['Class', 'Class', 'Class', 'Interface', 'Interface', 'Struct', 'Enum'])
+    name = ('I' if kind == 'Interface' else '') + 'Type' + str(index)
+    parameters = []
+    if kind != 'Enum' and random.random() < 0.2:
+      parameters = [make_generic_parameter(parameter, namespace)
+                    for parameter in ['T', 'TKey', 'TValue'][:random.randint(1, 2)]]
+    generic_name = name
+    full_name = namespace + '.' + name
+    if parameters:
+      generic_name += "<" + ", ".join(parameter.name for parameter in parameters) + ">"
+      full_name += "`" + str(len(parameters))
+    anchor = namespace + '.' + generic_name
+
+    attributes = [
+      ('Name', generic_name), ('Namespace', namespace), ('FullName', full_name),
+      ('Module', MODULES[index % len(MODULES)]), ('Anchor', anchor),
+      ('IsProtogameInternal', 'True' if random.random() < 0.1 else 'False'),
+    ]
+    if kind == 'Class' and random.random() < 0.3:
+      attributes.append(('InterfaceRef', namespace + '.I' + name))
+    attributes += [
+      ('IsPublic', 'True' if random.random() < 0.95 else 'False'),
+      ('IsAbstract', 'True' if kind == 'Interface' else 'False'), ('Type', kind),
+    ]
+
+    lines = ['  <Type' + get_attributes(attributes) + '>']
+    lines.append('    <Summary>' + escape(self.get_doc("The " + name + " type.", 6)) + '</Summary>')
+    if kind == 'Class':
+      lines.append('    <Inherits' + get_type_attributes(self.pick_type(0)) + ' />')
+    elif kind in ('Struct', 'Enum'):
+      lines.append('    <Inherits' + get_type_attributes(make_simple_type(
+        'ValueType' if kind == 'Struct' else 'Enum', 'System')) + ' />')
+    if kind != 'Enum':
+      for i in range(random.randint(0, 2)):
+        lines.append('    <Implements' + get_type_attributes(self.pick_interface(parameters)) + ' />')
+    for parameter in parameters:
+      lines.append('    <TypeParameter' + get_type_attributes(parameter) + '>' +
+                   escape(self.get_doc("The " + parameter.name + " type parameter.", 6)) + '</TypeParameter>')
+
+    for member in range(self.members):
+      r = random.random()
+      if kind == 'Enum' or r < 0.2:
+        lines.append(self.get_field_xml(namespace, generic_name, member, kind, parameters))
+      elif r < 0.5:
+        lines.append(self.get_property_xml(namespace, generic_name, member, parameters))
+      else:
+        lines.append(self.get_method_xml(namespace, generic_name, member, kind, parameters))
+    lines.append('  </Type>\n')
+    return "\n".join(lines)
+
+  def get_member_access(self, kind):
+    visibility = self.random.choice(['Public', 'Public', 'Public', 'Protected', 'Private'])
+    if kind == 'Interface':
+      visibility = 'Public'
+    return [('IsPublic', str(visibility == 'Public')), ('IsProtected', str(visibility == 'Protected')),
+            ('IsPrivate', str(visibility == 'Private'))]
+
+  def get_field_xml(self, namespace, type_name, member, kind, parameters):
+    name = 'Field' + str(member)
+    field_type = self.pick_type(self.generic_depth, parameters)
+    attributes = ([('Name', name), ('Anchor', namespace + '.' + type_name + '.' + name)] +
+                  self.get_member_access(kind))
+    attributes += get_type_attribute_list(field_type)
+    if kind == 'Enum':
+      attributes.append(('ConstValue', str(member)))
+    result = '    <Field' + get_attributes(attributes) + '>'
+    result += '<Summary>' + escape(self.get_doc("The " + name + " field.", 8)) + '</Summary>'
+    if self.random.random() < 0.3:
+      result += '<Value>' + escape(self.get_doc("The value of " + name + ".", 8)) + '</Value>'
+    return result + '</Field>'
+
+  def get_property_xml(self, namespace, type_name, member, parameters):
+    name = 'Property' + str(member)
+    property_type = self.pick_type(self.generic_depth, parameters)
+    attributes = [('Name', name), ('Anchor', namespace + '.' + type_name + '.' + name),
+                  ('HasGet', 'True'), ('IsGetPublic', 'True'), ('IsGetProtected', 'False'),
+                  ('IsGetPrivate', 'False')]
+    if self.random.random() < 0.5:
+      attributes += [('HasSet', 'True'), ('IsSetPublic', 'True'), ('IsSetProtected', 'False'),
+                     ('IsSetPrivate', 'False')]
+    else:
+      attributes.append(('HasSet', 'False'))
+    attributes += get_type_attribute_list(property_type)
+    result = '    <Property' + get_attributes(attributes) + '>'
+    result += '<Summary>' + escape(self.get_doc("The " + name + " property.", 8)) + '</Summary>'
+    if self.random.random() < 0.3:
+      result += '<Value>' + escape(self.get_doc("The value of " + name + ".", 8)) + '</Value>'
+    return result + '</Property>'
+
+  def get_method_xml(self, namespace, type_name, member, kind, parameters):
+    random = self.random
+    name = 'Method' + str(member)
+    method_parameters = list(parameters)
+    generic_name = name
+    type_parameters = []
+    if random.random() < 0.15:
+      type_parameters = [make_generic_parameter('TResult', namespace)]
+      method_parameters += type_parameters
+      generic_name += '<TResult>'
+    return_type = self.pick_type(self.generic_depth, method_parameters)
+    arguments = []
+    for i in range(random.randint(0, 4)):
+      argument_type = self.pick_type(self.generic_depth, method_parameters)
+      arguments.append(('argument' + str(i), argument_type, random.random() < 0.1))
+    anchor = namespace + '.' + type_name + '.' + generic_name
+    if arguments:
+      anchor += ("(" + ",".join(argument_type.generic_name + ("&" if is_ref else "")
+                                for argument_name, argument_type, is_ref in arguments) + ")")
+
+    attributes = [('Name', generic_name), ('Anchor', anchor)] + self.get_member_access(kind)
+    attributes.append(('IsAbstract', 'True' if kind == 'Interface' else 'False'))
+    attributes += get_type_attribute_list(return_type, 'Return')
+    lines = ['    <Method' + get_attributes(attributes) + '>']
+    lines.append('      <Summary>' + escape(self.get_doc("Performs " + name + ".", 8)) + '</Summary>')
+    if return_type.name != 'Void':
+      lines.append('      <Returns>' + escape(self.get_doc("The result of " + name + ".", 8)) + '</Returns>')
+    for parameter in type_parameters:
+      lines.append('      <TypeParameter' + get_type_attributes(parameter) + '>' +
+                   escape(self.get_doc("The result type.", 8)) + '</TypeParameter>')
+    for argument_name, argument_type, is_ref in arguments:
+      attributes = ([('Name', argument_name)] + get_type_attribute_list(argument_type) +
+                    [('IsRef', str(is_ref)), ('IsOut', 'False')])
+      lines.append('      <Parameter' + get_attributes(attributes) + '>' +
+                   escape(self.get_doc("The " + argument_name + " parameter.", 8)) + '</Parameter>')
+    lines.append('    </Method>')
+    return "\n".join(lines)
+
+def get_attributes(attributes):
+  return "".join(" " + name + "=" + quoteattr(value if value != None else "")
+                 for name, value in attributes)
+
+def get_type_attribute_list(type, prefix=""):
+  return [(prefix + 'TypeName', type.name), (prefix + 'TypeNamespace', type.namespace),
+          (prefix + 'TypeFullName', type.full_name), (prefix + 'TypeAnchor', type.anchor)]
+
+def get_type_attributes(type, prefix=""):
+  return get_attributes(get_type_attribute_list(type, prefix))
+
+CONF_PY = """
+import os
+import sys
+sys.path.insert(0, %r)
+extensions = ['netxml']
+master_doc = 'index'
+html_theme = 'basic'
+netxml_autotype = %r
+netxml_generate_jobs = %r
+"""
+
+INDEX_RST = """
+API
+===
+
+.. dotnet:apiindex::
+"""
+
+def create_project(root, xml_path, autotype, jobs):
+  """
+  Creates a minimal documentation project around a copy of the XML.  The
+  project directory is named like ours, since netxml finds the XML by a
+  path relative to it.
+  """
+  project = os.path.join(root, 'Protogame.Docs')
+  if os.path.isdir(root):
+    shutil.rmtree(root)
+  os.makedirs(project)
+  shutil.copyfile(xml_path, os.path.join(project, 'Protogame.combined.xml'))
+  with open(os.path.join(project, 'conf.py'), 'w') as f:
+    f.write(CONF_PY % (os.path.dirname(os.path.abspath(__file__)), autotype, jobs))
+  with open(os.path.join(project, 'index.rst'), 'w') as f:
+    f.write(INDEX_RST)
+  return project
+
+def reset_netxml_state(netxml):
+  """
+  Drops the state netxml keeps for the whole process, so each phase is
+  timed from cold.
+  """
+  netxml.type_display = netxml.TypeDisplayFormatter()
+  netxml.type_store.clear()
+  netxml.type_pages.clear()
+  netxml.type_relations = netxml.TypeRelations()
+  netxml.loaded_stamp = None
+
+class PhaseTimer(object):
+
+  def __init__(self):
+    self.phases = {}
+
+  def time(self, name, function, *args):
+    start = time.time()
+    result = function(*args)
+    self.phases[name] = time.time() - start
+    return result
+
+def run_extension_phases(timer, root, xml_path, autotype):
+  import netxml
+  project = create_project(root, xml_path, autotype, 1)
+  cwd = os.getcwd()
+  os.chdir(project)
+  try:
+    app = netxml.CommandLineApp({
+      'netxml_autotype': autotype,
+      'netxml_artifact_url': None,
+      'netxml_build_trigger_url': None,
+    })
+
+    reset_netxml_state(netxml)
+    source = netxml.find_xml()
+    records = timer.time('parse', lambda: list(netxml.iter_type_records(source)))
+
+    def generate():
+      for info in records:
+        path = netxml.get_type_doc_path(info)
+        if path != None:
+          netxml.generate_doc_at_path(app, info, path)
+    timer.time('generate', generate)
+
+    # The pages generate() wrote are kept, so the cold load still compares
+    # every page but doesn't rewrite them.
+    reset_netxml_state(netxml)
+    timer.time('load_xml_cold', netxml.load_xml, app)
+    reset_netxml_state(netxml)
+    timer.time('load_xml_warm', netxml.load_xml, app)
+    return len(records)
+  finally:
+    os.chdir(cwd)
+
+def run_sphinx_phases(timer, root, xml_path, autotype, jobs, parallel=1, prefix='sphinx'):
+  """
+  Times a fresh HTML build of the generated pages, run like sphinx-build
+  -j parallel.  The extension loads the XML while the application is
+  created; reading and writing are timed between the Sphinx events that
+  bracket them, and recorded as phases named with prefix.
+  """
+  import netxml
+  from sphinx.application import Sphinx
+  project = create_project(root, xml_path, autotype, jobs)
+  cwd = os.getcwd()
+  os.chdir(project)
+  marks = {}
+
+  def mark(name):
+    # Handlers for env-before-read-docs may return documents to read, so
+    # this must return None.
+    marks.setdefault(name, time.time())
+
+  try:
+    reset_netxml_state(netxml)
+    with open(os.devnull, 'w') as devnull:
+      app = timer.time(prefix + '_init', Sphinx, project, project,
+                       os.path.join(project, '_build', 'html'),
+                       os.path.join(project, '_build', 'doctrees'),
+                       'html', None, None, devnull, True, False, None, 0, parallel)
+      app.connect('env-before-read-docs', lambda app, env, docnames: mark('read'))
+      app.connect('env-updated', lambda app, env: mark('write'))
+      app.connect('build-finished', lambda app, exception: mark('finished'))
+      app.build()
+  finally:
+    os.chdir(cwd)
+  timer.phases[prefix + '_read'] = marks['write'] - marks['read']
+  timer.phases[prefix + '_write'] = marks['finished'] - marks['write']
+
+def get_speedups(phases):
+  """
+  Returns how many times faster the parallel Sphinx build read and wrote
+  than the serial one.
+  """
+  speedups = {}
+  for name in ('read', 'write'):
+    serial = phases.get('sphinx_' + name)
+    parallel = phases.get('sphinx_parallel_' + name)
+    if serial != None and parallel != None and parallel > 0:
+      speedups['sphinx_' + name] = round(serial / parallel, 2)
+  return speedups
+
+def run_benchmark(sizes, members, generic_depth, seed, autotype, jobs, sphinx, sphinx_jobs, repeat,
+                  work_dir, log):
+  """
+  Returns the results of timing every phase at each size, keeping the
+  fastest of repeat runs for each phase.  If sphinx_jobs is more than 1,
+  the Sphinx build is also timed with that many processes, as
+  sphinx_parallel_* phases, and compared with the serial build.
+  """
+  results = []
+  for size in sizes:
+    xml_path = os.path.join(work_dir, 'combined-' + str(size) + '.xml')
+    log("generating synthetic xml with " + str(size) + " types...")
+    CombinedXmlGenerator(size, members, generic_depth, seed).write(xml_path)
+    best = {}
+    for attempt in range(repeat):
+      timer = PhaseTimer()
+      log("timing " + str(size) + " types (run " + str(attempt + 1) + "/" + str(repeat) + ")...")
+      documented = run_extension_phases(timer, os.path.join(work_dir, 'extension'), xml_path, autotype)
+      if sphinx:
+        run_sphinx_phases(timer, os.path.join(work_dir, 'sphinx'), xml_path, autotype, jobs)
+        if sphinx_jobs > 1:
+          run_sphinx_phases(timer, os.path.join(work_dir, 'sphinx'), xml_path, autotype, jobs,
+                            sphinx_jobs, 'sphinx_parallel')
+      for name, elapsed in timer.phases.items():
+        best[name] = min(best.get(name, elapsed), elapsed)
+    speedups = get_speedups(best)
+    for name, speedup in sorted(speedups.items()):
+      log("%s at %d types: %.3fs with -j 1, %.3fs with -j %d (%.2fx)" % (
+        name, size, best[name], best[name.replace('sphinx_', 'sphinx_parallel_')], sphinx_jobs,
+        speedup))
+    results.append({
+      'types': size,
+      'members': members,
+      'generic_depth': generic_depth,
+      'documented_types': documented,
+      'xml_bytes': os.path.getsize(xml_path),
+      'sphinx_jobs': sphinx_jobs if sphinx else None,
+      'phases': best,
+      'speedups': speedups,
+    })
+  return results
+
+def get_result_key(result):
+  return (result['types'], result['members'], result['generic_depth'])
+
+def find_regressions(report, baseline, threshold, min_delta):
+  """
+  Compares phase timings with a baseline report, returning a description
+  of each phase that is slower by more than threshold (a fraction) and by
+  more than min_delta seconds.  Sizes and phases that aren't in both
+  reports are ignored.
+  """
+  baseline_results = dict((get_result_key(result), result) for result in baseline['results'])
+  regressions = []
+  for result in report['results']:
+    previous = baseline_results.get(get_result_key(result))
+    if previous == None:
+      continue
+    for name, elapsed in sorted(result['phases'].items()):
+      before = previous['phases'].get(name)
+      if before == None:
+        continue
+      if elapsed > before * (1 + threshold) and elapsed - before > min_delta:
+        regressions.append("%s at %d types: %.3fs -> %.3fs (%+.0f%%)" % (
+          name, result['types'], before, elapsed, 100.0 * (elapsed - before) / before))
+  return regressions
+
+def get_environment():
+  environment = {'python': platform.python_version(), 'platform': platform.platform()}
+  try:
+    import sphinx
+    environment['sphinx'] = sphinx.__version__
+  except ImportError:
+    pass
+  return environment
+
+def main(argv):
+  import argparse
+  parser = argparse.ArgumentParser(description='Benchmark the .NET API documentation pipeline.')
+  subparsers = parser.add_subparsers(dest='command')
+
+  generate_parser = subparsers.add_parser('generate', help='write a synthetic combined XML')
+  generate_parser.add_argument('out', help='where to write the XML')
+  generate_parser.add_argument('--types', type=int, default=1000, help='number of types')
+
+  run_parser = subparsers.add_parser('run', help='time the pipeline at several sizes')
+  run_parser.add_argument('--sizes', default='100,500,2000',
+                          help='comma separated numbers of types (default: 100,500,2000)')
+  run_parser.add_argument('--repeat', type=int, default=1, help='runs per size; the fastest is kept')
+  run_parser.add_argument('--autotype', action='store_true', help='generate dotnet:autotype pages')
+  run_parser.add_argument('--jobs', default=1, help='netxml_generate_jobs for the Sphinx build')
+  run_parser.add_argument('--sphinx-jobs', default='auto',
+                          help="processes for a second, parallel Sphinx build, as with sphinx-build -j, " +
+                          "or 'auto' for one per CPU; 1 skips it (default: auto).  Only faster with more than 2 CPUs")
+  run_parser.add_argument('--no-sphinx', action='store_true', help='skip the Sphinx build phases')
+  run_parser.add_argument('--output', help='where to write the results as JSON')
+  run_parser.add_argument('--baseline', help='results to compare against')
+  run_parser.add_argument('--threshold', type=float, default=0.25,
+                          help='fractional slowdown that counts as a regression (default: 0.25)')
+  run_parser.add_argument('--min-delta', type=float, default=0.05,
+                          help='ignore slowdowns smaller than this many seconds (default: 0.05)')
+  run_parser.add_argument('--work-dir', help='directory for generated files (default: a temporary one)')
+
+  for subparser in (generate_parser, run_parser):
+    subparser.add_argument('--members', type=int, default=20, help='members per type')
+    subparser.add_argument('--generic-depth', type=int, default=3,
+                           help='maximum nesting of generic type arguments')
+    subparser.add_argument('--seed', type=int, default=0, help='random seed for the generator')
+  args = parser.parse_args(argv)
+
+  def log(message):
+    sys.stderr.write(message + '\n')
+
+  if args.command == 'generate':
+    CombinedXmlGenerator(args.types, args.members, args.generic_depth, args.seed).write(args.out)
+    return 0
+  if args.command != 'run':
+    parser.print_help()
+    return 1
+
+  if args.sphinx_jobs == 'auto':
+    import multiprocessing
+    sphinx_jobs = multiprocessing.cpu_count()
+  else:
+    sphinx_jobs = int(args.sphinx_jobs)
+  work_dir = args.work_dir if args.work_dir != None else tempfile.mkdtemp(prefix='netxml-bench-')
+  if not os.path.isdir(work_dir):
+    os.makedirs(work_dir)
+  try:
+    results = run_benchmark(
+      [int(size) for size in args.sizes.split(',')], args.members, args.generic_depth, args.seed,
+      args.autotype, args.jobs, not args.no_sphinx, sphinx_jobs, args.repeat,
+      os.path.abspath(work_dir), log)
+  finally:
+    if args.work_dir == None:
+      shutil.rmtree(work_dir, ignore_errors=True)
+
+  import netxml
+  report = {
+    'generator_version': netxml.GENERATOR_VERSION,
+    'autotype': args.autotype,
+    'environment': get_environment(),
+    'results': results,
+  }
+  text = json.dumps(report, indent=1, sort_keys=True)
+  if args.output != None:
+    with open(args.output, 'w') as f:
+      f.write(text)
+  else:
+    sys.stdout.write(text + '\n')
+
+  if args.baseline != None:
+    with open(args.baseline, 'r') as f:
+      baseline = json.load(f)
+    regressions = find_regressions(report, baseline, args.threshold, args.min_delta)
+    for regression in regressions:
+      log("regression: " + regression)
+    if regressions:
+      return 1
+    log("no phase regressed by more than %.0f%%" % (100 * args.threshold))
+  return 0
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv[1:]))
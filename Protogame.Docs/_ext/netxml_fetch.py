@@ -0,0 +1,491 @@
+"""
+Fetches Protogame.combined.xml for a commit from the documentation build
+server.  Every artifact fetched is kept in a local content-addressed cache,
+so other branches and workspaces that need the same XML don't download it
+again, and when a commit hasn't been built yet the XML of its nearest built
+ancestor can be used straight away.
+
+This can be run directly to fetch the XML outside of Sphinx:
+
+  python netxml_fetch.py --out ../Protogame.combined.xml [commit]
+"""
+
+import base64
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+try:
+  from urllib.request import Request, urlopen
+  from urllib.error import HTTPError, URLError
+  from http.client import HTTPException
+except ImportError:
+  from urllib2 import Request, urlopen, HTTPError, URLError
+  from httplib import HTTPException
+
+DEFAULT_ARTIFACT_URL = ('https://storage.googleapis.com/protogame-docs/{commit}/' +
+                        'ProtogameDocsTool/bin/Windows/AnyCPU/Debug/Protogame.combined.xml')
+
+DEFAULT_TRIGGER_URL = ('https://jenkins.redpointgames.com.au/buildByToken/buildWithParameters' +
+                       '?job=Protogame-Docs-Build&token=BuildProtogameDocs&Commit={commit}')
+
+# The artifact may be published compressed; it is stored and passed to the
+# docs build as-is, with the suffix matching its content.
+COMPRESSION_SUFFIXES = ('', '.gz', '.xz')
+
+def get_compression_suffix(path):
+  """
+  Returns '.gz' or '.xz' if the file is compressed in that format, going
+  by its magic number rather than its name, or '' if it isn't compressed.
+  """
+  with open(path, 'rb') as f:
+    magic = f.read(6)
+  if magic[:2] == b'\x1f\x8b':
+    return '.gz'
+  if magic == b'\xfd7zXZ\x00':
+    return '.xz'
+  return ''
+
+def get_expected_md5(headers):
+  """
+  Returns the base64 MD5 of the body from the x-goog-hash header that
+  Cloud Storage sends, or None if there isn't one.
+  """
+  # It is sent once for each hash, or once with them separated by commas.
+  if hasattr(headers, 'get_all'):
+    values = headers.get_all('x-goog-hash') or []
+  else:
+    values = headers.getheaders('x-goog-hash')
+  for value in values:
+    for part in value.split(','):
+      part = part.strip()
+      if part.startswith('md5='):
+        return part[4:]
+  return None
+
+class IncompleteArtifactError(IOError):
+  """
+  Raised when a downloaded artifact doesn't have the length or MD5 that
+  the server said it would, so that it is never stored.
+  """
+
+def get_default_cache_dir():
+  path = os.environ.get('PROTOGAME_DOCS_CACHE')
+  if path:
+    return path
+  return os.path.join(os.path.expanduser('~'), '.cache', 'protogame-docs')
+
+def get_head_commit(cwd=None):
+  return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=cwd).decode('ascii').strip()
+
+def get_ancestor_commits(commit, limit=50, cwd=None):
+  """
+  Returns the first-parent ancestors of a commit, nearest first.
+  """
+  try:
+    output = subprocess.check_output(
+      ['git', 'rev-list', '--first-parent', '--max-count=' + str(limit + 1), commit], cwd=cwd)
+  except (OSError, subprocess.CalledProcessError):
+    return []
+  return output.decode('ascii').split()[1:]
+
+class ArtifactCache(object):
+  """
+  Stores artifacts under objects/ by the SHA-1 of their content, and
+  records under commits/ which artifact was served for each commit along
+  with the validators needed for conditional requests.
+  """
+
+  def __init__(self, root):
+    self.root = root
+
+  def get_blob_path(self, sha1):
+    return os.path.join(self.root, 'objects', sha1[:2], sha1[2:])
+
+  def get_ref_path(self, commit):
+    return os.path.join(self.root, 'commits', commit + '.json')
+
+  def get_ref(self, commit):
+    """
+    Returns the cached entry for a commit, or None if there isn't one or
+    its artifact has gone missing.
+    """
+    try:
+      with open(self.get_ref_path(commit), 'r') as f:
+        ref = json.load(f)
+    except (IOError, OSError, ValueError):
+      return None
+    if not os.path.isfile(self.get_blob_path(ref['sha1'])):
+      return None
+    return ref
+
+  def store(self, commit, response, etag=None, last_modified=None, length=None, md5=None):
+    """
+    Streams a response body into the cache and records it against the
+    commit, returning the new entry.  If the body doesn't have the given
+    length or base64 MD5, IncompleteArtifactError is raised and the cache
+    is left as it was.
+    """
+    objects = os.path.join(self.root, 'objects')
+    if not os.path.isdir(objects):
+      os.makedirs(objects)
+    digest = hashlib.sha1()
+    md5_digest = hashlib.md5()
+    size = 0
+    handle, temp_path = tempfile.mkstemp(dir=objects)
+    try:
+      with os.fdopen(handle, 'wb') as f:
+        while True:
+          chunk = response.read(1024 * 1024)
+          if not chunk:
+            break
+          digest.update(chunk)
+          md5_digest.update(chunk)
+          size += len(chunk)
+          f.write(chunk)
+      if length != None and size != length:
+        raise IncompleteArtifactError("received " + str(size) + " of " + str(length) + " bytes")
+      if md5 != None and base64.b64encode(md5_digest.digest()).decode('ascii') != md5:
+        raise IncompleteArtifactError("the MD5 of the download doesn't match x-goog-hash")
+      sha1 = digest.hexdigest()
+      blob_path = self.get_blob_path(sha1)
+      if os.path.isfile(blob_path):
+        os.remove(temp_path)
+      else:
+        if not os.path.isdir(os.path.dirname(blob_path)):
+          os.makedirs(os.path.dirname(blob_path))
+        os.rename(temp_path, blob_path)
+    except:
+      if os.path.exists(temp_path):
+        os.remove(temp_path)
+      raise
+    ref = {'sha1': sha1, 'etag': etag, 'last_modified': last_modified}
+    self.write_ref(commit, ref)
+    return ref
+
+  def write_ref(self, commit, ref):
+    path = self.get_ref_path(commit)
+    if not os.path.isdir(os.path.dirname(path)):
+      os.makedirs(os.path.dirname(path))
+    with open(path + '.tmp', 'w') as f:
+      json.dump(ref, f)
+    if os.path.exists(path):
+      os.remove(path)
+    os.rename(path + '.tmp', path)
+
+class FetchResult(object):
+
+  def __init__(self, commit, served_commit, path, source):
+    # The commit that was asked for.
+    self.commit = commit
+    # The commit whose artifact is being served, which is an ancestor of
+    # the requested commit if that hasn't been built yet.
+    self.served_commit = served_commit
+    # The artifact in the cache.
+    self.path = path
+    # One of 'remote', 'cache' or 'ancestor'.
+    self.source = source
+    # Where fetch_combined_xml copied the artifact to.
+    self.out_path = None
+
+  @property
+  def is_exact(self):
+    return self.commit == self.served_commit
+
+class ArtifactFetcher(object):
+  """
+  Fetches the artifact for a commit through an ArtifactCache.  The URLs
+  are templates with a {commit} placeholder, so that the fetcher can be
+  pointed at a local stand-in server.
+
+  Progress is passed to log as messages, and to progress, if given, as
+  events: dicts with the stage, commit and message, and any details of
+  the stage such as the attempt number or the size downloaded.
+  """
+
+  def __init__(self, cache, artifact_url=DEFAULT_ARTIFACT_URL, trigger_url=DEFAULT_TRIGGER_URL,
+               log=None, timeout=30, poll_interval=15, poll_attempts=20, remote_ancestors=10,
+               progress=None):
+    self.cache = cache
+    self.artifact_url = artifact_url
+    self.trigger_url = trigger_url
+    self.log = log if log != None else (lambda message: None)
+    self.progress = progress
+    self.timeout = timeout
+    self.poll_interval = poll_interval
+    self.poll_attempts = poll_attempts
+    self.remote_ancestors = remote_ancestors
+
+  def fetch(self, commit, ancestors=(), wait=True):
+    """
+    Returns a FetchResult for the commit, or None if no artifact could be
+    found.  If the commit hasn't been built, the nearest ancestor with an
+    artifact is served, and a build of the commit is requested so that it
+    is available next time.  If no ancestor has one either and wait is
+    true, this blocks until the build server produces the artifact.  If
+    the build server can't be reached, only a cached ancestor is served.
+    """
+    try:
+      result = self.fetch_commit(commit)
+    except URLError as e:
+      self.report('offline', commit, "unable to fetch documentation for " + commit +
+                  " (" + str(e.reason) + ")", reason=str(e.reason))
+      result = self.fetch_cached_ancestor(commit, ancestors)
+      if result == None:
+        raise
+      return result
+    if result != None:
+      return result
+
+    self.request_build(commit)
+
+    result = self.fetch_ancestor(commit, ancestors)
+    if result != None:
+      return result
+
+    if not wait:
+      return None
+    for attempt in range(self.poll_attempts):
+      self.report('wait', commit, "waiting for documentation build of " + commit + " (" +
+                  str(attempt + 1) + "/" + str(self.poll_attempts) + ")",
+                  attempt=attempt + 1, attempts=self.poll_attempts)
+      time.sleep(self.poll_interval)
+      result = self.fetch_commit(commit)
+      if result != None:
+        return result
+    waited = self.poll_attempts * self.poll_interval
+    self.report('timeout', commit, "gave up waiting for documentation build of " + commit +
+                " after " + str(waited) + "s", waited=waited)
+    return None
+
+  def report(self, stage, commit, message, **details):
+    self.log(message)
+    if self.progress != None:
+      event = {'stage': stage, 'commit': commit, 'message': message}
+      event.update(details)
+      self.progress(event)
+
+  def fetch_commit(self, commit):
+    """
+    Fetches the artifact for exactly this commit, revalidating any cached
+    copy with a conditional request.  Returns None if the build server has
+    no artifact for the commit.  If a new artifact can't be downloaded in
+    full, the cached copy is served.
+    """
+    ref = self.cache.get_ref(commit)
+    headers = {}
+    if ref != None:
+      if ref.get('etag'):
+        headers['If-None-Match'] = ref['etag']
+      if ref.get('last_modified'):
+        headers['If-Modified-Since'] = ref['last_modified']
+
+    url = self.artifact_url.format(commit=commit)
+    try:
+      response = urlopen(Request(url, headers=headers), timeout=self.timeout)
+    except HTTPError as e:
+      if e.code == 304 and ref != None:
+        return FetchResult(commit, commit, self.cache.get_blob_path(ref['sha1']), 'cache')
+      if ref != None:
+        self.report('revalidate_failed', commit, "unable to revalidate cached documentation for " +
+                    commit + " (HTTP " + str(e.code) + ")", status=e.code)
+        return FetchResult(commit, commit, self.cache.get_blob_path(ref['sha1']), 'cache')
+      if e.code in (403, 404):
+        return None
+      raise
+    except URLError as e:
+      if ref != None:
+        self.report('revalidate_failed', commit, "unable to revalidate cached documentation for " +
+                    commit + " (" + str(e.reason) + ")", reason=str(e.reason))
+        return FetchResult(commit, commit, self.cache.get_blob_path(ref['sha1']), 'cache')
+      raise
+
+    length = response.headers.get('Content-Length')
+    cached = ref
+    try:
+      self.report('download', commit, "downloading documentation for " + commit)
+      ref = self.cache.store(commit, response, response.headers.get('ETag'),
+                             response.headers.get('Last-Modified'),
+                             int(length) if length else None, get_expected_md5(response.headers))
+    except (IOError, OSError, HTTPException) as e:
+      if cached == None:
+        raise
+      self.report('revalidate_failed', commit, "unable to download new documentation for " +
+                  commit + " (" + str(e) + ")", reason=str(e))
+      return FetchResult(commit, commit, self.cache.get_blob_path(cached['sha1']), 'cache')
+    finally:
+      response.close()
+    path = self.cache.get_blob_path(ref['sha1'])
+    self.report('downloaded', commit, "downloaded documentation for " + commit,
+                size=os.path.getsize(path))
+    return FetchResult(commit, commit, path, 'remote')
+
+  def fetch_cached_ancestor(self, commit, ancestors):
+    for ancestor in ancestors:
+      ref = self.cache.get_ref(ancestor)
+      if ref != None:
+        return FetchResult(commit, ancestor, self.cache.get_blob_path(ref['sha1']), 'ancestor')
+    return None
+
+  def fetch_ancestor(self, commit, ancestors):
+    result = self.fetch_cached_ancestor(commit, ancestors)
+    if result != None:
+      return result
+    for ancestor in list(ancestors)[:self.remote_ancestors]:
+      result = self.fetch_commit(ancestor)
+      if result != None:
+        return FetchResult(commit, ancestor, result.path, 'ancestor')
+    return None
+
+  def request_build(self, commit):
+    if self.trigger_url == None:
+      return
+    self.report('request_build', commit, "requesting documentation build of " + commit)
+    try:
+      urlopen(self.trigger_url.format(commit=commit), timeout=self.timeout).close()
+    except (HTTPError, URLError) as e:
+      self.report('request_build_failed', commit, "unable to request documentation build of " +
+                  commit + " (" + str(e) + ")", reason=str(e))
+
+def fetch_artifact(out_path, commit=None, cache_dir=None, log=None, wait=True, **kwargs):
+  """
+  Fetches the combined XML for a commit (HEAD by default) into the cache,
+  returning the FetchResult, or None if nothing could be found.  The
+  ancestors are those of the commit in the repository containing out_path.
+  """
+  repo_dir = os.path.dirname(os.path.abspath(out_path))
+  if commit == None:
+    commit = get_head_commit(repo_dir)
+  cache = ArtifactCache(cache_dir if cache_dir != None else get_default_cache_dir())
+  fetcher = ArtifactFetcher(cache, log=log, **kwargs)
+  return fetcher.fetch(commit, get_ancestor_commits(commit, cwd=repo_dir), wait)
+
+def copy_artifact(result, out_path):
+  """
+  Copies a fetched artifact to out_path.  A compressed artifact is copied
+  to out_path with a .gz or .xz suffix, and any copies of the XML in the
+  other formats are removed.
+  """
+  target = out_path + get_compression_suffix(result.path)
+  shutil.copyfile(result.path, target + '.tmp')
+  for suffix in COMPRESSION_SUFFIXES:
+    if os.path.exists(out_path + suffix):
+      os.remove(out_path + suffix)
+  os.rename(target + '.tmp', target)
+  result.out_path = target
+
+def fetch_combined_xml(out_path, commit=None, cache_dir=None, log=None, wait=True, **kwargs):
+  """
+  Fetches the combined XML for a commit (HEAD by default) and copies it to
+  out_path, returning the FetchResult, or None if nothing could be found.
+  """
+  result = fetch_artifact(out_path, commit, cache_dir, log, wait, **kwargs)
+  if result != None:
+    copy_artifact(result, out_path)
+  return result
+
+class BackgroundFetch(object):
+  """
+  Runs fetch_combined_xml on a thread of its own, so that the caller only
+  waits for the XML once it needs it.  The ArtifactFetcher's progress
+  events are kept in order, each with the seconds elapsed since the fetch
+  started.  Once the thread has finished, either result is set as
+  fetch_combined_xml returned it, or error is set to the exception it
+  raised; commit is None if the commit to fetch couldn't be determined.
+  The artifact is only copied to out_path if the fetch hasn't been
+  cancelled, so a build that stopped waiting can read it safely.
+  """
+
+  def __init__(self, out_path, commit=None, cache_dir=None, wait=True, **kwargs):
+    self.settings = dict(kwargs, cache_dir=cache_dir)
+    self.wait = wait
+    self.commit = commit
+    self.result = None
+    self.error = None
+    self.events = []
+    self.lock = threading.Lock()
+    self.cancelled = False
+    self.copy_lock = threading.Lock()
+    self.started = time.time()
+    self.finished = None
+    self.thread = threading.Thread(target=self.run, args=(out_path, cache_dir, kwargs),
+                                   name='netxml-fetch')
+    # Don't keep the process alive for a fetch nobody is waiting for.
+    self.thread.daemon = True
+    self.thread.start()
+
+  def run(self, out_path, cache_dir, kwargs):
+    try:
+      if self.commit == None:
+        self.commit = get_head_commit(os.path.dirname(os.path.abspath(out_path)))
+      result = fetch_artifact(out_path, self.commit, cache_dir, wait=self.wait,
+                              progress=self.add_event, **kwargs)
+      with self.copy_lock:
+        if result != None and not self.cancelled:
+          copy_artifact(result, out_path)
+        self.result = result
+    except Exception as e:
+      self.error = e
+    self.finished = time.time()
+
+  def add_event(self, event):
+    event['elapsed'] = round(time.time() - self.started, 3)
+    with self.lock:
+      self.events.append(event)
+
+  def get_events(self, start=0):
+    with self.lock:
+      return self.events[start:]
+
+  def cancel(self):
+    """
+    Stops the fetch from copying the artifact to out_path, waiting for it
+    if it has already started to.  The download carries on, so that the
+    artifact is cached for the next build.  Returns whether out_path was
+    written.
+    """
+    with self.copy_lock:
+      self.cancelled = True
+      return self.result != None and self.result.out_path != None
+
+  def join(self, timeout=None):
+    """
+    Waits up to timeout seconds for the fetch, returning whether it has
+    finished.
+    """
+    self.thread.join(timeout)
+    return not self.thread.is_alive()
+
+def main(argv):
+  import argparse
+  parser = argparse.ArgumentParser(description='Fetch Protogame.combined.xml for a commit.')
+  parser.add_argument('commit', nargs='?', help='the commit to fetch (default: HEAD)')
+  parser.add_argument('--out', required=True, help='where to write the XML')
+  parser.add_argument('--cache', help='the artifact cache directory')
+  parser.add_argument('--url', default=DEFAULT_ARTIFACT_URL, help='the artifact URL template')
+  parser.add_argument('--trigger-url', default=DEFAULT_TRIGGER_URL, help='the build trigger URL template')
+  parser.add_argument('--no-trigger', action='store_true', help='do not request builds')
+  parser.add_argument('--no-wait', action='store_true', help='do not wait for builds to finish')
+  args = parser.parse_args(argv)
+
+  def log(message):
+    sys.stderr.write(message + '\n')
+
+  result = fetch_combined_xml(
+    args.out, args.commit, args.cache, log, not args.no_wait,
+    artifact_url=args.url, trigger_url=None if args.no_trigger else args.trigger_url)
+  if result == None:
+    log("no documentation is available")
+    return 1
+  log("fetched documentation for " + result.served_commit + " from " + result.source +
+      " to " + result.out_path)
+  return 0 if result.is_exact else 2
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,185 @@
+/*
+ * Searches the .NET API objects written by netxml when netxml_search_shards
+ * is set.  The objects are split into shards by name prefix or namespace,
+ * and the search page only downloads the shards that can match the query.
+ * Matches are listed above Sphinx's own search results.
+ */
+var DotNetSearch = {
+
+  manifest: null,
+  shards: {},
+  pending: 0,
+  terms: [],
+
+  init: function() {
+    var results = $('#search-results');
+    var query = $.getQueryParameters().q;
+    if (!results.length || !query || !query[0]) {
+      return;
+    }
+    this.terms = $.grep(query[0].toLowerCase().split(/\s+/), function(term) {
+      return term.length > 0;
+    });
+    if (!this.terms.length) {
+      return;
+    }
+    this.output = $('<div class="dotnet-search"/>').prependTo(results);
+    this.loadScript('manifest.js');
+  },
+
+  loadScript: function(filename) {
+    var script = document.createElement('script');
+    script.type = 'text/javascript';
+    script.src = DOCUMENTATION_OPTIONS.URL_ROOT + '_static/dotnet-search/' + filename;
+    document.getElementsByTagName('head')[0].appendChild(script);
+  },
+
+  // The short name of an object or query term, as get_search_name in
+  // netxml.py computes it.
+  getName: function(text) {
+    var base = text.split('(')[0];
+    // Type arguments may be nested and qualified.
+    var stripped = base.replace(/<[^<>]*>/g, '');
+    while (stripped !== base) {
+      base = stripped;
+      stripped = base.replace(/<[^<>]*>/g, '');
+    }
+    return base.substring(base.lastIndexOf('.') + 1);
+  },
+
+  // Must match get_search_shard_keys in netxml.py.
+  getPrefix: function(name) {
+    return name.substring(0, this.manifest.prefixLength).toLowerCase().replace(/[^a-z0-9]/g, '_');
+  },
+
+  isShardNeeded: function(key, term) {
+    if (this.manifest.mode === 'prefix') {
+      var prefix = this.getPrefix(this.getName(term));
+      if (prefix.length === this.manifest.prefixLength) {
+        return key === prefix;
+      }
+      return key.indexOf(prefix) === 0;
+    }
+    // Unqualified terms may be in any namespace.
+    return term.indexOf('.') < 0 || term.indexOf(key.toLowerCase() + '.') === 0;
+  },
+
+  setManifest: function(manifest) {
+    var self = this;
+    var needed = [];
+    self.manifest = manifest;
+    $.each(manifest.shards, function(key, filename) {
+      for (var i = 0; i < self.terms.length; i++) {
+        if (self.isShardNeeded(key, self.terms[i])) {
+          needed.push(filename);
+          return;
+        }
+      }
+    });
+    self.pending = needed.length;
+    if (!needed.length) {
+      self.display();
+    }
+    $.each(needed, function(i, filename) {
+      self.loadScript(filename);
+    });
+  },
+
+  // Entries are [name, anchor, object type, index into uris, node id].
+  addShard: function(key, uris, entries) {
+    $.each(entries, function(i, entry) {
+      entry[3] = uris[entry[3]] + '#' + entry[4];
+    });
+    this.shards[key] = entries;
+    this.pending--;
+    if (this.pending === 0) {
+      this.display();
+    }
+  },
+
+  matches: function(entry, term) {
+    if (term.indexOf('.') >= 0) {
+      return entry[1].toLowerCase().indexOf(term) >= 0;
+    }
+    if (this.manifest.mode !== 'prefix') {
+      return entry[0].toLowerCase().indexOf(term) >= 0;
+    }
+    // Prefix shards hold the names with a word starting like the term.
+    var words = this.getWords(entry[0]);
+    for (var i = 0; i < words.length; i++) {
+      if (words[i].indexOf(term) === 0) {
+        return true;
+      }
+    }
+    return false;
+  },
+
+  // The name from the start of each of its words on, lower-cased.  Words
+  // start where search_word_start_re in netxml.py finds them.
+  getWords: function(name) {
+    var words = [name.toLowerCase()];
+    for (var i = 1; i < name.length; i++) {
+      var previous = name.charAt(i - 1);
+      var current = name.charAt(i);
+      if ((/[a-z0-9]/.test(previous) && /[A-Z]/.test(current)) ||
+          (previous === '_' && /[A-Za-z0-9]/.test(current)) ||
+          (/[A-Z]/.test(previous) && /[A-Z]/.test(current) && /[a-z]/.test(name.charAt(i + 1)))) {
+        words.push(name.substring(i).toLowerCase());
+      }
+    }
+    return words;
+  },
+
+  display: function() {
+    var self = this;
+    var types = {'class': 0, 'struct': 0, 'interface': 0, 'enum': 0};
+    var results = [];
+    // By prefix, an object is in the shard of each word of its name.
+    var seen = {};
+    $.each(self.shards, function(key, entries) {
+      $.each(entries, function(i, entry) {
+        if (seen.hasOwnProperty(entry[1])) {
+          return;
+        }
+        for (var j = 0; j < self.terms.length; j++) {
+          if (self.matches(entry, self.terms[j])) {
+            seen[entry[1]] = true;
+            results.push(entry);
+            return;
+          }
+        }
+      });
+    });
+    if (!results.length) {
+      return;
+    }
+    results.sort(function(a, b) {
+      var ta = a[2] in types ? 0 : 1;
+      var tb = b[2] in types ? 0 : 1;
+      if (ta !== tb) {
+        return ta - tb;
+      }
+      if (a[0].length !== b[0].length) {
+        return a[0].length - b[0].length;
+      }
+      return a[1] < b[1] ? -1 : (a[1] > b[1] ? 1 : 0);
+    });
+
+    var list = $('<ul class="search"/>');
+    $.each(results.slice(0, 100), function(i, entry) {
+      var item = $('<li/>');
+      item.append($('<a/>').attr('href', DOCUMENTATION_OPTIONS.URL_ROOT + entry[3]).text(entry[1]));
+      item.append($('<span/>').text(' (' + entry[2].replace(/^n/, '') + ')'));
+      list.append(item);
+    });
+    self.output.append($('<h2/>').text('API Reference'));
+    if (results.length > 100) {
+      self.output.append($('<p/>').text('Showing 100 of ' + results.length + ' matching API objects.'));
+    }
+    self.output.append(list);
+  }
+};
+
+$(document).ready(function() {
+  DotNetSearch.init();
+});
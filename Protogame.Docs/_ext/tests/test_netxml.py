@@ -0,0 +1,568 @@
+"""
+Tests for the netxml extension.  Run from Protogame.Docs/_ext with:
+
+  python -m unittest discover tests
+"""
+
+import glob
+import io
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import netxml
+import netxml_bench
+import netxml_fetch
+
+def make_type(name, anchor, implements=(), inherits=()):
+  elem = ET.Element("Type", {
+    "Name": name, "Namespace": "Protogame", "FullName": anchor, "Module": "core_api",
+    "Anchor": anchor, "IsProtogameInternal": "False", "IsPublic": "True", "Type": "Class",
+  })
+  for tag, references in (("Implements", implements), ("Inherits", inherits)):
+    for reference in references:
+      ET.SubElement(elem, tag, {"TypeName": reference.split(".")[-1], "TypeAnchor": reference})
+  return netxml.TypeInfo(elem, "digest")
+
+class TypeRelationsTest(unittest.TestCase):
+  
+  def test_closed_generic_is_listed_under_open_generic(self):
+    relations = netxml.TypeRelations()
+    relations.add(make_type("IntFoo", "Protogame.IntFoo", implements=["Protogame.IFoo<Int32>"]))
+    relations.add(make_type("PairFoo", "Protogame.PairFoo",
+                            implements=["Protogame.IPair<Int32, List<String>>"]))
+    derived, implementations = relations.get("Protogame.IFoo<T>")
+    self.assertEqual([("IntFoo", "Protogame.IntFoo", False)], implementations)
+    derived, implementations = relations.get("Protogame.IPair<T, TKey>")
+    self.assertEqual([("PairFoo", "Protogame.PairFoo", False)], implementations)
+    derived, implementations = relations.get("Protogame.IPair<T>")
+    self.assertEqual([], implementations)
+    
+  def test_open_generic_anchor(self):
+    self.assertEqual("Protogame.IFoo", netxml.get_open_generic_anchor("Protogame.IFoo"))
+    self.assertEqual("Protogame.IFoo`2",
+                     netxml.get_open_generic_anchor("Protogame.IFoo<Dictionary<Int32, String>, T>"))
+    
+class ExternalTypeTableTest(unittest.TestCase):
+  
+  def get_url(self, anchor):
+    return netxml.ExternalTypeTable(netxml.EXTERNAL_URLS).get_url(anchor)
+  
+  def test_generic_arity(self):
+    self.assertEqual("https://docs.microsoft.com/dotnet/api/system.collections.generic.list-1",
+                     self.get_url("System.Collections.Generic.List<Int32>"))
+    self.assertEqual("https://docs.microsoft.com/dotnet/api/system.collections.generic.dictionary-2",
+                     self.get_url("System.Collections.Generic.Dictionary<IEntity, Action`1>"))
+    self.assertEqual("https://docs.microsoft.com/dotnet/api/system.func-2",
+                     self.get_url("System.Func<Int64, IEnumerable`1>[]"))
+    self.assertEqual("https://docs.microsoft.com/dotnet/api/system.collections.generic.ienumerable-1",
+                     self.get_url("System.Collections.Generic.IEnumerable`1"))
+    self.assertEqual("http://www.monogame.net/documentation/?page=T_Microsoft_Xna_Framework_Vector2",
+                     self.get_url("Microsoft.Xna.Framework.Vector2&"))
+    
+class GenerationManifestTest(unittest.TestCase):
+  
+  def setUp(self):
+    self.cwd = os.getcwd()
+    self.root = tempfile.mkdtemp(prefix='netxml-test-')
+    self.xml_path = os.path.join(self.root, 'Protogame.combined.xml')
+    self.out = os.path.join(self.root, 'docs')
+    os.mkdir(self.out)
+    netxml_bench.CombinedXmlGenerator(60, 3).write(self.xml_path)
+    
+  def tearDown(self):
+    os.chdir(self.cwd)
+    shutil.rmtree(self.root)
+    
+  def generate(self, *args):
+    netxml_bench.reset_netxml_state(netxml)
+    self.assertEqual(0, netxml.main(['generate', '--xml', self.xml_path, '--out', self.out,
+                                     '--jobs', '1'] + list(args)))
+    
+  def test_module_build_after_mode_change_regenerates_other_modules_later(self):
+    self.generate('--autotype')
+    self.generate('--no-autotype', '--modules', 'physics')
+    self.generate('--no-autotype')
+    pages = glob.glob(os.path.join(self.out, '*', 'api', '*.gen.rst'))
+    self.assertTrue(len(pages) > 0)
+    for path in pages:
+      with open(path, 'r') as f:
+        self.assertNotIn('dotnet:autotype', f.read(), path)
+
+  def test_truncated_manifest_regenerates_every_page(self):
+    self.generate()
+    manifest_path = os.path.join(self.out, netxml.MANIFEST_PATH)
+    with open(manifest_path, 'r') as f:
+      data = f.read()
+    with open(manifest_path, 'w') as f:
+      f.write(data[:len(data) // 2])
+    stderr = sys.stderr
+    sys.stderr = output = io.StringIO() if sys.version_info[0] >= 3 else io.BytesIO()
+    try:
+      self.generate()
+    finally:
+      sys.stderr = stderr
+    self.assertIn('regenerating every page', output.getvalue())
+    self.assertEqual(0, netxml.build_metrics.counters['pages_skipped'])
+    with open(manifest_path, 'r') as f:
+      self.assertEqual(data, f.read())
+        
+class GenerateTest(unittest.TestCase):
+  
+  def setUp(self):
+    self.cwd = os.getcwd()
+    self.root = tempfile.mkdtemp(prefix='netxml-test-')
+    self.xml_path = os.path.join(self.root, 'Protogame.combined.xml')
+    netxml_bench.CombinedXmlGenerator(60, 3).write(self.xml_path)
+    
+  def tearDown(self):
+    os.chdir(self.cwd)
+    shutil.rmtree(self.root)
+    
+  def make_out(self, name, conf=None):
+    out = os.path.join(self.root, name)
+    os.mkdir(out)
+    if conf != None:
+      with open(os.path.join(out, 'conf.py'), 'w') as f:
+        f.write(conf)
+    return out
+    
+  def generate(self, out, *args, **kwargs):
+    netxml_bench.reset_netxml_state(netxml)
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout = sys.stderr = io.StringIO() if sys.version_info[0] >= 3 else io.BytesIO()
+    try:
+      return netxml.main(['generate', '--xml', kwargs.get('xml', self.xml_path), '--out', out] +
+                         list(args))
+    finally:
+      sys.stdout, sys.stderr = stdout, stderr
+      os.chdir(self.cwd)
+      
+  def read_pages(self, out):
+    pages = {}
+    for root, dirs, files in os.walk(out):
+      for name in files:
+        if name.endswith('.gen.rst') or name == netxml.MANIFEST_PATH:
+          path = os.path.join(root, name)
+          with open(path, 'rb') as f:
+            pages[os.path.relpath(path, out)] = f.read()
+    return pages
+    
+  def test_pooled_output_matches_serial(self):
+    serial = self.make_out('serial')
+    pooled = self.make_out('pooled')
+    self.assertEqual(0, self.generate(serial, '--jobs', '1'))
+    self.assertEqual(0, self.generate(pooled, '--jobs', '3'))
+    pages = self.read_pages(serial)
+    self.assertTrue(len(pages) > 50)
+    self.assertEqual(pages, self.read_pages(pooled))
+    
+  def test_compressed_xml_gives_same_model(self):
+    import gzip
+    import pickle
+    with open(self.xml_path, 'rb') as f:
+      data = f.read()
+    paths = [self.xml_path + '.gz']
+    with gzip.open(paths[0], 'wb') as f:
+      f.write(data)
+    try:
+      import lzma
+      paths.append(self.xml_path + '.xz')
+      with lzma.open(paths[1], 'wb') as f:
+        f.write(data)
+    except ImportError:
+      pass
+    model = [pickle.dumps(info, 2) for info in netxml.iter_type_records(self.xml_path)]
+    self.assertTrue(len(model) > 50)
+    plain = self.make_out('plain')
+    self.assertEqual(0, self.generate(plain, '--jobs', '1'))
+    pages = self.read_pages(plain)
+    for path in paths:
+      self.assertEqual(model, [pickle.dumps(info, 2) for info in netxml.iter_type_records(path)], path)
+      out = self.make_out('from' + os.path.splitext(path)[1])
+      self.assertEqual(0, self.generate(out, '--jobs', '1', xml=path))
+      self.assertEqual(pages, self.read_pages(out), path)
+      
+  def test_check_exit_codes(self):
+    out = self.make_out('docs')
+    self.assertEqual(2, self.generate(out, '--check'))
+    self.assertEqual(0, self.generate(out, '--jobs', '1'))
+    self.assertEqual(0, self.generate(out, '--check'))
+    self.assertEqual(2, self.generate(out, '--check', '--modules', 'physics'))
+    netxml_bench.CombinedXmlGenerator(61, 3).write(self.xml_path)
+    self.assertEqual(2, self.generate(out, '--check'))
+    self.assertEqual(1, self.generate(out, '--check', xml=os.path.join(self.root, 'missing.xml')))
+    
+  def test_split_member_pages(self):
+    out = self.make_out('docs', "netxml_split_members = 2\n")
+    self.assertEqual(0, self.generate(out, '--jobs', '1'))
+    for info in netxml.iter_type_records(self.xml_path):
+      path = netxml.get_type_doc_path(info)
+      if path == None:
+        continue
+      names = [member[1].name for member in netxml.get_members(info)]
+      base = path[:-len('.gen.rst')]
+      member_pages = glob.glob(os.path.join(out, base + '-*.gen.rst'))
+      if len(names) <= 2:
+        self.assertEqual([], member_pages, path)
+        continue
+      expected = set(os.path.join(out, base + '-' + netxml.normalize_name_to_filename(name) + '.gen.rst')
+                     for name in names)
+      self.assertEqual(expected, set(member_pages), path)
+      with open(os.path.join(out, path), 'r') as f:
+        self.assertIn('dotnet-members', f.read())
+        
+class GetMemberPagesTest(unittest.TestCase):
+  
+  def make_info(self, *names):
+    elem = ET.Element("Type", {
+      "Name": "Sample", "Namespace": "Protogame", "FullName": "Protogame.Sample",
+      "Module": "core_api", "Anchor": "Protogame.Sample", "IsProtogameInternal": "False",
+      "IsPublic": "True", "Type": "Class",
+    })
+    for name in names:
+      ET.SubElement(elem, "Field", {
+        "Name": name, "Anchor": "Protogame.Sample." + name, "IsPublic": "True",
+        "TypeName": "Int32", "TypeAnchor": "System.Int32",
+      })
+    return netxml.TypeInfo(elem, "digest")
+    
+  def test_thresholds(self):
+    info = self.make_info("A", "B", "C")
+    path = "core_api/api/Protogame.Sample.gen.rst"
+    self.assertEqual([], netxml.get_member_pages(info, path, None))
+    self.assertEqual([], netxml.get_member_pages(info, path, 3))
+    self.assertEqual(3, len(netxml.get_member_pages(info, path, 2)))
+    self.assertEqual(3, len(netxml.get_member_pages(info, path, 0)))
+    
+  def test_names_differing_in_case_are_numbered(self):
+    info = self.make_info("Value", "value", "VALUE", "Other")
+    pages = netxml.get_member_pages(info, "core_api/api/Protogame.Sample.gen.rst", 1)
+    self.assertEqual([
+      ("Value", "core_api/api/Protogame.Sample-value.gen.rst"),
+      ("value", "core_api/api/Protogame.Sample-value_2.gen.rst"),
+      ("VALUE", "core_api/api/Protogame.Sample-value_3.gen.rst"),
+      ("Other", "core_api/api/Protogame.Sample-other.gen.rst"),
+    ], [(name, path) for name, members, path in pages])
+    
+class ModelCacheTest(unittest.TestCase):
+  
+  def setUp(self):
+    self.root = tempfile.mkdtemp(prefix='netxml-test-')
+    self.xml_path = os.path.join(self.root, 'combined.xml')
+    self.cache_path = os.path.join(self.root, 'model.cache')
+    
+  def tearDown(self):
+    shutil.rmtree(self.root)
+    
+  def load(self):
+    """
+    Returns the anchors read through the cache, and whether they came
+    from it.
+    """
+    cache = netxml.ModelCache(self.cache_path, self.xml_path)
+    f = cache.open()
+    if f != None:
+      return [info.anchor for info in cache.iter_records(f)], True
+    records = cache.iter_records_and_save(netxml.iter_type_records(self.xml_path))
+    return [info.anchor for info in records], False
+    
+  def test_invalidated_when_xml_changes(self):
+    netxml_bench.CombinedXmlGenerator(20, 2).write(self.xml_path)
+    anchors, cached = self.load()
+    self.assertFalse(cached)
+    self.assertEqual((anchors, True), self.load())
+    # Touching the XML without changing it keeps the cache.
+    stat = os.stat(self.xml_path)
+    os.utime(self.xml_path, (stat.st_atime, stat.st_mtime + 10))
+    self.assertEqual((anchors, True), self.load())
+    netxml_bench.CombinedXmlGenerator(25, 2).write(self.xml_path)
+    new_anchors, cached = self.load()
+    self.assertFalse(cached)
+    self.assertTrue(len(new_anchors) > len(anchors))
+    self.assertEqual((new_anchors, True), self.load())
+    
+class ExportSqliteTest(unittest.TestCase):
+  
+  def setUp(self):
+    self.root = tempfile.mkdtemp(prefix='netxml-test-')
+    self.xml_path = os.path.join(self.root, 'combined.xml')
+    netxml_bench.CombinedXmlGenerator(40, 3).write(self.xml_path)
+    
+  def tearDown(self):
+    shutil.rmtree(self.root)
+    
+  def test_tables_are_filled(self):
+    import sqlite3
+    records = list(netxml.iter_type_records(self.xml_path))
+    path = os.path.join(self.root, 'api.sqlite')
+    count, full_text = netxml.export_sqlite(path, iter(records), 'key', 2)
+    self.assertEqual(len(records), count)
+    members = sum(len(netxml.get_members(info)) for info in records)
+    connection = sqlite3.connect(path)
+    try:
+      def query(sql, *args):
+        return connection.execute(sql, args).fetchall()
+      self.assertEqual([(count,)], query("SELECT COUNT(*) FROM types"))
+      self.assertEqual([(members,)], query("SELECT COUNT(*) FROM members"))
+      self.assertTrue(query("SELECT COUNT(*) FROM parameters")[0][0] > 0)
+      self.assertTrue(query("SELECT COUNT(*) FROM type_references")[0][0] > 0)
+      self.assertEqual([('key',)], query("SELECT value FROM meta WHERE key = 'source'"))
+      self.assertTrue(netxml.is_sqlite_current(path, 'key'))
+      self.assertFalse(netxml.is_sqlite_current(path, 'other'))
+      # Members of split types are on their own pages.
+      split = [row for row in query("SELECT docname FROM anchors WHERE member_id IS NOT NULL")
+               if '-' in row[0].split('/')[-1]]
+      self.assertTrue(len(split) > 0)
+      if not full_text:
+        self.skipTest("SQLite was built without FTS5")
+      summaries = (sum(1 for info in records if info.summary != None) +
+                   sum(1 for info in records for member in netxml.get_members(info)
+                       if member[1].summary != None))
+      self.assertEqual([(summaries,)], query("SELECT COUNT(*) FROM summaries"))
+      self.assertTrue(len(query("SELECT anchor FROM summaries WHERE summaries MATCH 'details'")) > 0)
+    finally:
+      connection.close()
+      
+class ConfigTest(unittest.TestCase):
+  
+  def make_app(self, **values):
+    app = netxml.CommandLineApp(values)
+    app.builder = netxml.CommandLineConfig({'format': 'html'})
+    app.config.html_static_path = []
+    return app
+  
+  def test_split_members_from_command_line(self):
+    self.assertEqual(None, netxml.get_split_members(self.make_app()))
+    self.assertEqual(10, netxml.get_split_members(self.make_app(netxml_split_members='10')))
+    for value in ('ten', '-1'):
+      self.assertRaises(netxml.ExtensionError, netxml.get_split_members,
+                        self.make_app(netxml_split_members=value))
+      
+  def test_static_path_added_once(self):
+    app = self.make_app()
+    netxml.setup_static_files(app)
+    netxml.setup_static_files(app)
+    self.assertEqual([netxml.STATIC_PATH], app.config.html_static_path)
+
+  def test_auto_jobs_serial_on_two_cpus(self):
+    import multiprocessing
+    cpu_count = multiprocessing.cpu_count
+    try:
+      for cpus, jobs in ((1, 1), (2, 1), (4, 4)):
+        multiprocessing.cpu_count = lambda: cpus
+        self.assertEqual(jobs, netxml.get_generate_jobs(self.make_app(netxml_generate_jobs='auto')))
+    finally:
+      multiprocessing.cpu_count = cpu_count
+    
+class WatchTest(unittest.TestCase):
+  
+  def setUp(self):
+    self.cwd = os.getcwd()
+    self.root = tempfile.mkdtemp(prefix='netxml-test-')
+    xml_path = os.path.join(self.root, 'combined.xml')
+    netxml_bench.CombinedXmlGenerator(30, 2).write(xml_path)
+    self.project = netxml_bench.create_project(os.path.join(self.root, 'project'), xml_path, False, 1)
+    
+  def tearDown(self):
+    os.chdir(self.cwd)
+    shutil.rmtree(self.root)
+    
+  def test_watch_cycle_with_module_selection(self):
+    with open(os.path.join(self.project, 'conf.py'), 'a') as f:
+      f.write("\nnetxml_modules = 'physics'\n")
+    netxml_bench.reset_netxml_state(netxml)
+    # The first time watch waits for a change, it is stopped.
+    stdout, stderr, sleep = sys.stdout, sys.stderr, netxml.time.sleep
+    sys.stdout = output = io.StringIO() if sys.version_info[0] >= 3 else io.BytesIO()
+    sys.stderr = io.StringIO() if sys.version_info[0] >= 3 else io.BytesIO()
+    def stop(seconds):
+      raise KeyboardInterrupt()
+    netxml.time.sleep = stop
+    try:
+      self.assertEqual(0, netxml.main(['watch', '--out', self.project, '-b', 'html']))
+    finally:
+      sys.stdout, sys.stderr, netxml.time.sleep = stdout, stderr, sleep
+    self.assertIn("build succeeded", output.getvalue())
+    html = os.path.join(self.project, '_build', 'html')
+    self.assertTrue(glob.glob(os.path.join(html, 'physics', 'api', '*.gen.html')))
+    self.assertEqual([], glob.glob(os.path.join(html, 'core_api', 'api', '*.gen.html')))
+    
+class FetchXmlTest(unittest.TestCase):
+  
+  def setUp(self):
+    self.cwd = os.getcwd()
+    self.root = tempfile.mkdtemp(prefix='netxml-test-')
+    os.mkdir(os.path.join(self.root, 'Protogame.Docs'))
+    os.chdir(os.path.join(self.root, 'Protogame.Docs'))
+    # Nothing listens on the port once the socket is closed.
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    url = 'http://127.0.0.1:' + str(listener.getsockname()[1]) + '/artifact/{commit}'
+    listener.close()
+    self.app = netxml.CommandLineApp({
+      'netxml_artifact_url': url, 'netxml_build_trigger_url': None,
+      'netxml_artifact_cache': os.path.join(self.root, 'cache')})
+    self.warnings = []
+    self.app.warn = self.warnings.append
+    netxml.build_metrics = netxml.BuildMetrics()
+    
+  def tearDown(self):
+    netxml.pending_fetch = None
+    os.chdir(self.cwd)
+    shutil.rmtree(self.root)
+    
+  def start_fetch(self, have_xml):
+    netxml.pending_fetch = netxml_fetch.BackgroundFetch(
+      netxml.XML_PATH, 'c1', wait=not have_xml, **netxml.get_fetch_settings(self.app.config))
+    
+  def test_offline_with_ancestor_xml_uses_it(self):
+    for path in (netxml.XML_PATH, netxml.ANCESTOR_MARKER_PATH):
+      with open(path, 'w') as f:
+        f.write('<Types />')
+    self.start_fetch(True)
+    netxml.fetch_xml(self.app)
+    self.assertEqual(1, len(self.warnings))
+    self.assertIn("using the existing copy", self.warnings[0])
+    with open(netxml.XML_PATH) as f:
+      self.assertEqual('<Types />', f.read())
+      
+  def test_offline_without_xml_fails_readably(self):
+    self.start_fetch(False)
+    try:
+      netxml.fetch_xml(self.app)
+    except netxml.ExtensionError as e:
+      self.assertIn("unable to fetch .net xml documentation for c1", str(e))
+    else:
+      self.fail("ExtensionError not raised")
+      
+class SphinxBuildTest(unittest.TestCase):
+  
+  def setUp(self):
+    self.cwd = os.getcwd()
+    self.root = tempfile.mkdtemp(prefix='netxml-test-')
+    xml_path = os.path.join(self.root, 'combined.xml')
+    netxml_bench.CombinedXmlGenerator(30, 2).write(xml_path)
+    self.project = netxml_bench.create_project(os.path.join(self.root, 'project'), xml_path, False, 1)
+    netxml_bench.reset_netxml_state(netxml)
+    
+  def tearDown(self):
+    os.chdir(self.cwd)
+    shutil.rmtree(self.root)
+    
+  def build(self, builder, overrides={}):
+    from sphinx.application import Sphinx
+    os.chdir(self.project)
+    out = os.path.join('_build', builder)
+    warnings = io.StringIO() if sys.version_info[0] >= 3 else io.BytesIO()
+    app = Sphinx('.', '.', out, os.path.join(out, '.doctrees'), builder, dict(overrides),
+                 status=None, warning=warnings)
+    app.build()
+    self.assertEqual(0, app.statuscode)
+    return os.path.join(self.project, out)
+    
+  def test_latex_includes_type_pages(self):
+    out = self.build('latex')
+    with open(glob.glob(os.path.join(out, '*.tex'))[0], 'rb') as f:
+      tex = f.read().decode('utf-8')
+    self.assertIn('Protogame.Type1', tex)
+    self.assertTrue(tex.count('fulllineitems') > 30)
+    
+  def test_search_shards_keep_page_text(self):
+    from sphinx.util import jsdump
+    out = self.build('html', {'netxml_search_shards': 'prefix'})
+    with open(os.path.join(out, 'searchindex.js')) as f:
+      text = f.read()
+    index = jsdump.loads(text[text.index('(') + 1:text.rindex(')')])
+    self.assertTrue(any(docname.endswith('.gen') for docname in index['docnames']))
+    self.assertEqual({}, index['objects'])
+    # IType7 is in the shard of each word of its name.
+    for key in ('it', 'ty'):
+      with open(os.path.join(out, netxml.SEARCH_SHARD_PATH, key + '.js')) as f:
+        self.assertIn('"Protogame.IType7"', f.read())
+    with open(os.path.join(out, 'search.html')) as f:
+      self.assertIn('netxml-search.js', f.read())
+      
+  def test_roles_resolve_through_intersphinx(self):
+    from sphinx.util.inventory import InventoryFile
+    out = self.build('html')
+    with open(os.path.join(out, 'objects.inv'), 'rb') as f:
+      inventory = InventoryFile.load(f, out, os.path.join)
+    method = sorted(anchor for anchor in inventory['dotnet:method']
+                    if anchor.startswith('Protogame.IType7.'))[0]
+    
+    # Another project, documenting other types, links to these.
+    xml_path = os.path.join(self.root, 'other.xml')
+    netxml_bench.CombinedXmlGenerator(2, 1).write(xml_path)
+    self.project = netxml_bench.create_project(os.path.join(self.root, 'other'), xml_path, False, 1)
+    with open(os.path.join(self.project, 'conf.py'), 'a') as f:
+      f.write("extensions.append('sphinx.ext.intersphinx')\n" +
+              "intersphinx_mapping = {'protogame': (%r, None)}\n" % out)
+    with open(os.path.join(self.project, 'index.rst'), 'w') as f:
+      f.write("API\n===\n\nSee :dotnet:type:`Protogame.IType7` and :dotnet:method:`" + method + "`.\n")
+    netxml_bench.reset_netxml_state(netxml)
+    with open(os.path.join(self.build('html'), 'index.html')) as f:
+      html = f.read()
+    self.assertIn(inventory['dotnet:interface']['Protogame.IType7'][2], html)
+    self.assertIn(inventory['dotnet:method'][method][2], html)
+    
+class SearchShardKeyTest(unittest.TestCase):
+  
+  def test_keys_by_word(self):
+    for anchor, keys in [
+        ("Protogame.IRenderPipeline", ['ir', 'pi', 're']),
+        ("Protogame.HTTPServer", ['ht', 'se']),
+        ("Protogame.CoreGame<T>.ConfigureRenderPipeline(IRenderPipeline)", ['co', 'pi', 're']),
+        ("Protogame.Foo.op_Implicit(Foo)", ['im', 'op']),
+        ("Protogame.Vector2D", ['d', 've'])]:
+      self.assertEqual(keys, netxml.get_search_shard_keys('prefix', anchor, 'Protogame', 2))
+    self.assertEqual(['Protogame'], netxml.get_search_shard_keys(
+      'namespace', "Protogame.IRenderPipeline", 'Protogame', 2))
+    
+class FakeEnv(object):
+  
+  def __init__(self):
+    self.domaindata = {}
+    self.docname = 'index'
+    
+class DotNetDomainTest(unittest.TestCase):
+  
+  def setUp(self):
+    self.env = FakeEnv()
+    self.domain = netxml.DotNetDomain(self.env)
+    
+  def test_find_object_sees_objects_after_purge_and_merge(self):
+    self.domain.note_object("Protogame.IFoo", "interface", "Protogame.IFoo", "Protogame")
+    self.assertEqual("Protogame.IFoo", self.domain.find_object("protogame.ifoo")[0])
+    # The object moves to another document in a parallel read, keeping the
+    # same number of objects.
+    self.domain.clear_doc('index')
+    self.domain.merge_domaindata(['other'], {'objects': {
+      "Protogame.IBar": ('other', "interface", "Protogame.IBar", "Protogame"),
+    }})
+    self.assertEqual(None, self.domain.find_object("protogame.ifoo"))
+    self.assertEqual("Protogame.IBar", self.domain.find_object("protogame.ibar")[0])
+    self.env.docname = 'third'
+    self.domain.note_object("Protogame.IBaz", "interface", "Protogame.IBaz", "Protogame")
+    self.assertEqual("Protogame.IBaz", self.domain.find_object("protogame.ibaz")[0])
+    
+class NodeIdTest(unittest.TestCase):
+  
+  def test_node_ids_are_sanitized_and_unique(self):
+    ids = {}
+    for anchor, expected in [
+        ("Protogame.IPair<T, TKey>", "dotnet-protogame-ipair-t-tkey"),
+        ("Protogame.Foo.Bar(IFoo`1&)", "dotnet-protogame-foo-bar-ifoo-1"),
+        ("Protogame.Foo.Bar(Int32)", "dotnet-protogame-foo-bar-int32"),
+        ("Protogame.Foo.Bar(Int32[])", "dotnet-protogame-foo-bar-int32-2")]:
+      node_id = netxml.get_node_id(anchor, ids)
+      self.assertEqual(expected, node_id)
+      ids[node_id] = None
+      
+if __name__ == '__main__':
+  unittest.main()
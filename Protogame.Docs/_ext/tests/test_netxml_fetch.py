@@ -0,0 +1,240 @@
+"""
+Tests for netxml_fetch against a stand-in for the documentation build
+server on localhost.  Run from Protogame.Docs/_ext with:
+
+  python -m unittest discover tests
+"""
+
+import base64
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+try:
+  from http.server import HTTPServer, BaseHTTPRequestHandler
+except ImportError:
+  from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import netxml_fetch
+
+class Artifact(object):
+
+  def __init__(self, body, etag, truncate=None, md5=None, delay=0):
+    self.body = body
+    self.etag = etag
+    # Seconds to wait before responding.
+    self.delay = delay
+    # Only this many bytes of the body are sent, with the full length.
+    self.truncate = truncate
+    # The x-goog-hash MD5 to send instead of the body's.
+    self.md5 = md5
+
+class StandInServer(object):
+  """
+  Serves /artifact/<commit> from the artifacts dict, honouring
+  If-None-Match, and records every request made to it.
+  """
+
+  def __init__(self):
+    self.artifacts = {}
+    self.requests = []
+    server = self
+
+    class Handler(BaseHTTPRequestHandler):
+
+      def do_GET(self):
+        server.requests.append((self.path, self.headers.get('If-None-Match')))
+        if self.path.startswith('/trigger/'):
+          self.send_response(200)
+          self.send_header('Content-Length', '0')
+          self.end_headers()
+          return
+        artifact = server.artifacts.get(self.path[len('/artifact/'):])
+        if artifact == None:
+          self.send_error(404)
+          return
+        time.sleep(artifact.delay)
+        if self.headers.get('If-None-Match') == artifact.etag:
+          self.send_response(304)
+          self.end_headers()
+          return
+        md5 = artifact.md5
+        if md5 == None:
+          md5 = base64.b64encode(hashlib.md5(artifact.body).digest()).decode('ascii')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(artifact.body)))
+        self.send_header('ETag', artifact.etag)
+        self.send_header('x-goog-hash', 'crc32c=AAAAAA==')
+        self.send_header('x-goog-hash', 'md5=' + md5)
+        self.end_headers()
+        self.wfile.write(artifact.body[:artifact.truncate])
+
+      def log_message(self, format, *args):
+        pass
+
+    self.httpd = HTTPServer(('127.0.0.1', 0), Handler)
+    self.url = 'http://127.0.0.1:' + str(self.httpd.server_port)
+    self.thread = threading.Thread(target=self.httpd.serve_forever, args=(0.05,))
+    self.thread.daemon = True
+    self.thread.start()
+
+  def close(self):
+    self.httpd.shutdown()
+    self.httpd.server_close()
+
+class FetchTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.server = StandInServer()
+    self.root = tempfile.mkdtemp(prefix='netxml-fetch-test-')
+    self.cache = netxml_fetch.ArtifactCache(os.path.join(self.root, 'cache'))
+    self.events = []
+    self.fetcher = netxml_fetch.ArtifactFetcher(
+      self.cache, self.server.url + '/artifact/{commit}', self.server.url + '/trigger/{commit}',
+      timeout=5, poll_interval=0.01, poll_attempts=3, progress=self.events.append)
+
+  def tearDown(self):
+    self.server.close()
+    shutil.rmtree(self.root)
+
+  def read(self, path):
+    with open(path, 'rb') as f:
+      return f.read()
+
+  def get_stages(self):
+    return [event['stage'] for event in self.events]
+
+class ArtifactFetcherTest(FetchTestCase):
+
+  def test_revalidation_reuses_cache(self):
+    self.server.artifacts['c1'] = Artifact(b'<Types />', '"v1"')
+    first = self.fetcher.fetch('c1')
+    self.assertEqual('remote', first.source)
+    second = self.fetcher.fetch('c1')
+    self.assertEqual('cache', second.source)
+    self.assertEqual(first.path, second.path)
+    self.assertEqual(b'<Types />', self.read(second.path))
+    self.assertEqual([('/artifact/c1', None), ('/artifact/c1', '"v1"')], self.server.requests)
+    self.assertEqual(['download', 'downloaded'], self.get_stages())
+
+  def test_changed_artifact_replaces_cache(self):
+    self.server.artifacts['c1'] = Artifact(b'<Types />', '"v1"')
+    self.fetcher.fetch('c1')
+    self.server.artifacts['c1'] = Artifact(b'<Types><Type /></Types>', '"v2"')
+    result = self.fetcher.fetch('c1')
+    self.assertEqual('remote', result.source)
+    self.assertEqual(b'<Types><Type /></Types>', self.read(result.path))
+
+  def test_falls_back_to_ancestor(self):
+    self.server.artifacts['a2'] = Artifact(b'<Types />', '"a2"')
+    result = self.fetcher.fetch('c1', ['a1', 'a2'])
+    self.assertEqual('ancestor', result.source)
+    self.assertEqual('a2', result.served_commit)
+    self.assertFalse(result.is_exact)
+    self.assertIn(('/trigger/c1', None), self.server.requests)
+
+    # The ancestor is now cached, so it is served without asking for it.
+    del self.server.requests[:]
+    result = self.fetcher.fetch('c2', ['a2'])
+    self.assertEqual('ancestor', result.source)
+    self.assertEqual('a2', result.served_commit)
+    self.assertEqual(['/artifact/c2', '/trigger/c2'], [path for path, etag in self.server.requests])
+
+  def test_poll_timeout(self):
+    self.assertEqual(None, self.fetcher.fetch('c1'))
+    self.assertEqual(['request_build', 'wait', 'wait', 'wait', 'timeout'], self.get_stages())
+    self.assertEqual(4, self.server.requests.count(('/artifact/c1', None)))
+
+  def test_offline_serves_cached_ancestor(self):
+    self.server.artifacts['a1'] = Artifact(b'<Types />', '"a1"')
+    self.fetcher.fetch('a1')
+    self.server.close()
+    result = self.fetcher.fetch('c1', ['a1'])
+    self.assertEqual('ancestor', result.source)
+    self.assertEqual('a1', result.served_commit)
+    self.assertEqual(b'<Types />', self.read(result.path))
+    self.assertIn('offline', self.get_stages())
+
+  def test_offline_without_cached_ancestor(self):
+    self.server.close()
+    self.assertRaises(netxml_fetch.URLError, self.fetcher.fetch, 'c1', ['a1'])
+
+  def test_no_wait(self):
+    self.assertEqual(None, self.fetcher.fetch('c1', wait=False))
+    self.assertNotIn('wait', self.get_stages())
+
+  def assert_cache_unchanged(self, result, body):
+    self.assertEqual('cache', result.source)
+    self.assertEqual(body, self.read(result.path))
+    self.assertEqual('"v1"', self.cache.get_ref('c1')['etag'])
+    objects = os.path.join(self.cache.root, 'objects')
+    # Only the original blob remains, with no partial download beside it.
+    self.assertEqual(1, sum(len(files) for path, dirs, files in os.walk(objects)))
+    self.assertIn('revalidate_failed', self.get_stages())
+
+  def test_partial_download_keeps_cached_file(self):
+    self.server.artifacts['c1'] = Artifact(b'<Types />', '"v1"')
+    self.fetcher.fetch('c1')
+    self.server.artifacts['c1'] = Artifact(b'<Types><Type /></Types>', '"v2"', truncate=10)
+    self.assert_cache_unchanged(self.fetcher.fetch('c1'), b'<Types />')
+
+  def test_corrupt_download_keeps_cached_file(self):
+    self.server.artifacts['c1'] = Artifact(b'<Types />', '"v1"')
+    self.fetcher.fetch('c1')
+    self.server.artifacts['c1'] = Artifact(b'<Types><Type /></Types>', '"v2"',
+                                           md5=base64.b64encode(b'0' * 16).decode('ascii'))
+    self.assert_cache_unchanged(self.fetcher.fetch('c1'), b'<Types />')
+
+  def test_partial_download_without_cache_stores_nothing(self):
+    self.server.artifacts['c1'] = Artifact(b'<Types><Type /></Types>', '"v1"', truncate=10)
+    self.assertRaises(netxml_fetch.IncompleteArtifactError, self.fetcher.fetch, 'c1')
+    self.assertEqual(None, self.cache.get_ref('c1'))
+    objects = os.path.join(self.cache.root, 'objects')
+    self.assertEqual(0, sum(len(files) for path, dirs, files in os.walk(objects)))
+
+  def test_fetch_combined_xml_copies_artifact(self):
+    self.server.artifacts['c1'] = Artifact(b'<Types />', '"v1"')
+    out_path = os.path.join(self.root, 'Protogame.combined.xml')
+    result = netxml_fetch.fetch_combined_xml(
+      out_path, 'c1', self.cache.root, artifact_url=self.server.url + '/artifact/{commit}',
+      trigger_url=None)
+    self.assertEqual(out_path, result.out_path)
+    self.assertEqual(b'<Types />', self.read(out_path))
+
+class BackgroundFetchTest(FetchTestCase):
+
+  def start(self):
+    self.out_path = os.path.join(self.root, 'Protogame.combined.xml')
+    return netxml_fetch.BackgroundFetch(
+      self.out_path, 'c1', self.cache.root, artifact_url=self.server.url + '/artifact/{commit}',
+      trigger_url=None)
+
+  def test_copies_artifact(self):
+    self.server.artifacts['c1'] = Artifact(b'<Types />', '"v1"')
+    fetch = self.start()
+    self.assertTrue(fetch.join(5))
+    self.assertEqual(None, fetch.error)
+    self.assertTrue(fetch.cancel())
+    self.assertEqual(b'<Types />', self.read(self.out_path))
+
+  def test_cancelled_fetch_leaves_out_path(self):
+    self.server.artifacts['c1'] = Artifact(b'<Types />', '"v1"', delay=0.3)
+    with open(os.path.join(self.root, 'Protogame.combined.xml'), 'wb') as f:
+      f.write(b'<Types><Type /></Types>')
+    fetch = self.start()
+    self.assertFalse(fetch.cancel())
+    self.assertTrue(fetch.join(5))
+    self.assertEqual(None, fetch.error)
+    self.assertEqual(b'<Types><Type /></Types>', self.read(self.out_path))
+    # The artifact is still cached for the next build.
+    self.assertEqual('remote', fetch.result.source)
+    self.assertEqual(b'<Types />', self.read(fetch.result.path))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -271,3 +271,41 @@ texinfo_documents = [
 #texinfo_no_detailmenu = False
 
 autodoc_mock_imports = []
+
+# -- Options for the .NET API documentation (netxml) ----------------------
+
+# Number of worker processes used to generate the API pages from
+# Protogame.combined.xml.  Use 1 to generate serially, or 'auto' to use one
+# worker per CPU when there are more than two, and generate serially
+# otherwise, since the pool is slower than that on one or two CPUs.
+netxml_generate_jobs = 'auto'
+
+# If true, generated API pages are short stubs using the dotnet:autotype
+# directive, which builds each type's description directly from the loaded
+# XML instead of from generated RST.
+netxml_autotype = True
+
+# Split the search data for API objects into shards by the first two letters
+# of the words in their names ('prefix') or by namespace ('namespace'), which
+# the search page loads on demand, instead of putting it all in
+# searchindex.js.  The objects are then listed above Sphinx's own results,
+# which only search the text of the API pages.
+netxml_search_shards = 'prefix'
+
+# Only generate and read the API pages of these modules, given by their
+# directory names, e.g. ['physics'].  The NETXML_MODULES environment
+# variable (NETXML_MODULES=physics,network) overrides this.  References to
+# types in other modules are rendered as plain text.
+netxml_modules = None
+
+# Export the .NET type model to an SQLite database at this path, relative to
+# the output directory, for tools that look up the API.  It has indexed
+# types, members, parameters and anchors tables, and an FTS5 table over
+# the summaries, e.g.
+#   SELECT anchor FROM summaries WHERE summaries MATCH 'render pass'
+netxml_sqlite_path = None
+
+# Give each member of types with more than this many members a page of its
+# own, with overloads sharing a page, and list them in tables with their
+# summaries on the type's page.  None keeps every member on its type's page.
+netxml_split_members = None
@@ -29,6 +29,21 @@ namespace ProtogameDocsTool
 
             var outputPath = Path.Combine(currentLocation, "Protogame.combined.xml");
 
+            // Each assembly is also written on its own, so that the documentation
+            // build only has to read again the assemblies that have changed.  The
+            // shards are numbered so that they sort in the order of this list.
+            // Build\UpdateDocs.ps1 copies them to Protogame.Docs\Protogame.combined.d,
+            // where the documentation build reads them.
+            var shardPath = Path.Combine(currentLocation, "Protogame.combined.d");
+            Directory.CreateDirectory(shardPath);
+
+            // Shards of assemblies that have since been removed or renumbered would
+            // otherwise still be read.
+            foreach (var oldShard in Directory.GetFiles(shardPath, "*.xml"))
+            {
+                File.Delete(oldShard);
+            }
+
             var forceRef = typeof(Protogame.DefaultCollision).Assembly;
 
             var output = new XmlDocument();
@@ -52,11 +67,22 @@ namespace ProtogameDocsTool
                 var documentation = new XmlDocument();
                 documentation.Load(documentationPath);
 
+                var shard = new XmlDocument();
+                var shardTypesElem = shard.CreateElement("Types");
+                shard.AppendChild(shardTypesElem);
+
                 CombineDocumentationWithAssembly(
                     assembly,
                     documentation,
-                    typesElem,
+                    shardTypesElem,
                     entry.SupportsModules);
+
+                shard.Save(Path.Combine(shardPath, string.Format("{0:D2}-{1}.xml", toProcess.IndexOf(entry), entry.AssemblyFile)));
+
+                foreach (XmlNode node in shardTypesElem.ChildNodes)
+                {
+                    typesElem.AppendChild(output.ImportNode(node, true));
+                }
             }
 
             output.Save(outputPath);